@@ -0,0 +1,348 @@
+
+import asyncio
+import logging
+import socket
+from collections.abc import AsyncIterator
+
+from MilightController.AsyncSession import AsyncSession
+from MilightController.Device import Device
+from MilightController.DeviceCache import DeviceCache
+from MilightController.DeviceIndex import DeviceIndex
+from MilightController.Metrics import Metrics
+from MilightController.MilightController import MilightController
+from MilightController.PacketCapture import PacketCapture
+from MilightController.Payload import Payload
+from MilightController.RateLimiter import RateLimiter
+from MilightController.SequenceSpace import SequenceSpace
+from MilightController.Zone import Zone
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+# The `DiscoveryProtocol` class passes every datagram received on the discovery socket to a callback,
+# together with the address it was sent from.
+class DiscoveryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, on_message) -> None:
+        self.on_message = on_message
+
+    def datagram_received(self, data: bytes, address: tuple[str, int]) -> None:
+        self.on_message((data, address))
+
+
+# The `AsyncMilightController` class is the asyncio counterpart of `MilightController`. Discovery and
+# commands never block the event loop, so a single loop can drive many wifi-bridges at once.
+class AsyncMilightController:
+    def __init__(
+        self,
+        port: int = 48899,
+        address: str = "255.255.255.255",
+        timeout: int = 3000,
+        session_lifetime: int = 60000,
+        retries: int = 3,
+        pacing: bool = True,
+        cache: str = None,
+        capture: PacketCapture = None,
+        metrics: Metrics = None,
+    ) -> None:
+        '''The function initializes attributes of the asynchronous controller. The parameters have the
+        same meaning as in `MilightController`.
+
+        Parameters
+        ----------
+        port : int, optional
+            The `port` parameter is the port number used for the discovery broadcast.
+        address : str, optional
+            The `address` parameter is the network address the discovery request is sent to.
+        timeout : int, optional
+            The `timeout` parameter is the duration in milliseconds to wait for responses of the
+        devices.
+        session_lifetime : int, optional
+            The `session_lifetime` parameter is the duration in milliseconds for which a session ID is
+        reused before a new handshake is made.
+        retries : int, optional
+            The `retries` parameter is the number of times an unacknowledged command is retransmitted
+        before it is given up.
+        pacing : bool, optional
+            The `pacing` parameter enables the `RateLimiter` of every bridge, shared with all other
+        controllers in the process.
+        cache : str, optional
+            The `cache` parameter is the path of a JSON file the discovered devices are persisted to, see
+        `DeviceCache`.
+        capture : PacketCapture, optional
+            The `capture` parameter is a `PacketCapture` all packets exchanged with the wifi-bridges are
+        written to.
+        metrics : Metrics, optional
+            The `metrics` parameter is a `Metrics` the latencies and packet losses of every bridge are
+        recorded in.
+
+        '''
+        self.port: int = port
+        self.host: str = address
+        self.timeout: int = timeout
+        self.session_lifetime: int = session_lifetime
+        self.retries: int = retries
+        self.pacing: bool = pacing
+        self.capture: PacketCapture = capture
+        self.metrics: Metrics = metrics
+        self.discovery_message_v6: bytes = (
+            b"\x48\x46\x2D\x41\x31\x31\x41\x53\x53\x49\x53\x54\x48\x52\x45\x41\x44"
+        )
+        # Discovered devices in the order they answered
+        self.disco_results: list[Device] = []
+        # Discovered devices keyed by MAC address and indexed by IP address
+        self.devices: DeviceIndex = DeviceIndex()
+        self.cache: DeviceCache = None if cache is None else DeviceCache(cache)
+        self.sessions: dict[tuple[str, int], AsyncSession] = {}
+
+    async def __aenter__(self) -> "AsyncMilightController":
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        self.close()
+
+    async def discover(self, expected: int = None, use_cache: bool = False) -> list[Device]:
+        '''The `discover` function sends a discover request multiple times and collects the responses
+        for the duration of the timeout without blocking the event loop.
+
+        Parameters
+        ----------
+        expected : int, optional
+            The `expected` parameter is the number of devices to look for. Discovery returns as soon as
+        that many devices have answered.
+        use_cache : bool, optional
+            The `use_cache` parameter makes `discover` return the devices stored in the `DeviceCache` of
+        the controller without sending a discover request, if the cache is not empty.
+
+        Returns
+        -------
+            A list of `Device` records describing the discovered devices. If no devices are discovered,
+        `None` is returned.
+
+        '''
+        if use_cache and self.cache is not None and self.cache.devices:
+            return self.cache.values()
+
+        devices: list[Device] = [device async for device in self.discover_iter(expected)]
+        logger.info("Discovered %d devices", len(devices))
+
+        if devices:
+            return devices
+        else:
+            return None
+
+    async def discover_iter(self, expected: int = None) -> AsyncIterator[Device]:
+        '''The asynchronous generator `discover_iter` sends a discover request and yields every device as
+        soon as it answers, once per MAC address. See `MilightController.discover_iter`.
+
+        Parameters
+        ----------
+        expected : int, optional
+            The `expected` parameter is the number of devices to look for. The generator stops as soon as
+        that many devices have answered, otherwise it stops when the timeout expires.
+
+        Returns
+        -------
+            An asynchronous iterator over the `Device` records of the discovered devices.
+
+        '''
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        messages: asyncio.Queue = asyncio.Queue()
+
+        discoverer: socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        discoverer.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        discoverer.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        discoverer.bind(("0.0.0.0", self.port))
+
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: DiscoveryProtocol(messages.put_nowait), sock=discoverer
+        )
+
+        found: dict[str, Device] = {}
+        started: float = loop.time()
+        try:
+            discoverer_attempts: int = 3
+            logger.debug("Sending discover request up to %d times", discoverer_attempts)
+
+            deadline: float = loop.time() + self.timeout / 1000
+            next_request: float = 0.0
+            while True:
+                # The request is repeated until the first device answers
+                now: float = loop.time()
+                if discoverer_attempts and not found and now >= next_request:
+                    transport.sendto(self.discovery_message_v6, (self.host, self.port))
+                    if self.capture is not None:
+                        self.capture.write(self.discovery_message_v6, ("0.0.0.0", self.port), (self.host, self.port))
+                    discoverer_attempts -= 1
+                    next_request = now + 0.2
+                    deadline = max(deadline, now + self.timeout / 1000)
+
+                remaining: float = deadline - now
+                if remaining <= 0:
+                    break
+                if discoverer_attempts and not found:
+                    remaining = min(remaining, next_request - now)
+
+                try:
+                    data, address = await asyncio.wait_for(messages.get(), max(remaining, 0.001))
+                except asyncio.TimeoutError:
+                    continue
+                if self.capture is not None:
+                    self.capture.write(data, address, ("0.0.0.0", self.port))
+
+                device: Device = MilightController.parse_device(data)
+                if device is None or device["mac"] in found:
+                    continue
+
+                found[device["mac"]] = device
+                self.__add_result(device)
+                if self.metrics is not None:
+                    self.metrics.set_mac(device["ip"], device["mac"])
+                    self.metrics.observe("discovery_response_seconds", device["ip"], loop.time() - started)
+                if self.cache is not None:
+                    self.cache.update(device)
+                yield device
+
+                if expected is not None and len(found) >= expected:
+                    break
+        finally:
+            transport.close()
+            if self.cache is not None and found:
+                self.cache.save()
+
+    async def get_session(self, device: dict) -> AsyncSession:
+        '''The function `get_session` returns the cached session of a device, opening a new datagram
+        endpoint if the device has not been contacted yet.
+
+        Parameters
+        ----------
+        device : dict
+            The `device` parameter is a dictionary containing information about the device. It should have
+        the keys "ip" and "port".
+
+        Returns
+        -------
+            The `AsyncSession` bound to the device.
+
+        '''
+        address: tuple[str, int] = Device.address_of(device)
+        session: AsyncSession = self.sessions.get(address)
+        if session is None:
+            limiter: RateLimiter = RateLimiter.for_bridge(address) if self.pacing else None
+            _, session = await asyncio.get_running_loop().create_datagram_endpoint(
+                lambda: AsyncSession(
+                    address, self.timeout, self.session_lifetime, self.retries, limiter, self.capture, self.metrics
+                ),
+                family=socket.AF_INET,
+            )
+            # Another task may have opened a session for the same device in the meantime
+            existing: AsyncSession = self.sessions.setdefault(address, session)
+            if existing is not session:
+                session.close()
+                session = existing
+        return session
+
+    async def send(self, device: dict, command: str | bytes, zone: Zone = Zone.ALL) -> str:
+        '''The function `send` sends a command to a device and waits for its acknowledgment.
+
+        Parameters
+        ----------
+        device : dict
+            The `device` parameter is a dictionary containing information about the device. It should have
+        the keys "ip" and "port".
+        command : str | bytes
+            The `command` parameter is a string generated by one of the `Commands` methods or a `Payload`
+        generated by one of the `Payloads` methods.
+        zone : Zone
+            The `zone` parameter is the `Zone` the command is addressed to.
+
+        Returns
+        -------
+            The response received from the device in hexadecimal format.
+
+        '''
+        session: AsyncSession = await self.get_session(device)
+
+        try:
+            return await self.__transmit(session, command, zone)
+        except asyncio.TimeoutError:
+            # The bridge stopped acknowledging, the session ID has most likely expired
+            session.invalidate()
+            try:
+                return await self.__transmit(session, command, zone)
+            except asyncio.TimeoutError:
+                if self.metrics is not None:
+                    self.metrics.increment("timeouts_total", session.address[0])
+                raise
+
+    async def send_many(self, device: dict, commands: list[tuple[str | bytes, Zone]], window: int = 16) -> list[str]:
+        '''The function `send_many` sends a batch of commands to a device, keeping up to `window` of
+        them in flight at once.
+
+        Parameters
+        ----------
+        device : dict
+            The `device` parameter is a dictionary containing information about the device. It should have
+        the keys "ip" and "port".
+        commands : list[tuple[str | bytes, Zone]]
+            The `commands` parameter is a list of `(command, zone)` tuples, sent in the order they are
+        listed.
+        window : int, optional
+            The `window` parameter is the maximum number of commands sent but not yet acknowledged at
+        any time. It is limited to 256, the number of sequence numbers of a bridge, which are shared by
+        all tasks sending to it.
+
+        Returns
+        -------
+            A list with one entry per command, in the order of `commands`. Each entry is the response of
+        the bridge in hexadecimal format, or `None` if the command was not acknowledged in time.
+
+        '''
+        session: AsyncSession = await self.get_session(device)
+        window = max(1, min(window, SequenceSpace.SIZE))
+
+        responses: list[str] = await self.__pipeline(session, commands, window)
+
+        if commands and not any(responses):
+            # The bridge stopped acknowledging, the session ID has most likely expired
+            session.invalidate()
+            responses = await self.__pipeline(session, commands, window)
+
+        return responses
+
+    def close(self) -> None:
+        '''The function `close` closes the transports of all cached sessions.
+
+        '''
+        for session in self.sessions.values():
+            session.close()
+        self.sessions.clear()
+
+    async def __transmit(self, session: AsyncSession, command: str | bytes, zone: Zone) -> str:
+        await session.ensure()
+        return await session.send(self.__build_packet(session, command, zone))
+
+    async def __pipeline(self, session: AsyncSession, commands: list[tuple[str | bytes, Zone]], window: int) -> list[str]:
+        await session.ensure()
+        packets: list[bytes] = [self.__build_packet(session, command, zone) for command, zone in commands]
+        slots: asyncio.Semaphore = asyncio.Semaphore(window)
+
+        async def send(packet: bytes) -> str:
+            async with slots:
+                try:
+                    return await session.send(packet)
+                except asyncio.TimeoutError:
+                    return None
+
+        return await asyncio.gather(*(send(packet) for packet in packets))
+
+    def __build_packet(self, session: AsyncSession, command: str | bytes, zone: Zone) -> bytes:
+        # The sequence number is assigned by the session once the packet is sent
+        return bytes(session.packet.fill(0, Payload.parse(command), zone))
+
+    def __add_result(self, device: Device) -> None:
+        # A device answering with another IP address replaces its previous entry
+        previous: Device = self.devices.add(device)
+        if previous in self.disco_results:
+            self.disco_results[self.disco_results.index(previous)] = device
+        else:
+            self.disco_results.append(device)
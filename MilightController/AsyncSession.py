@@ -0,0 +1,271 @@
+
+import asyncio
+import logging
+import time
+
+from MilightController.Metrics import Metrics
+from MilightController.Packet import Packet
+from MilightController.PacketCapture import PacketCapture
+from MilightController.RateLimiter import RateLimiter
+from MilightController.RttEstimator import RttEstimator
+from MilightController.SequenceSpace import SequenceSpace
+from MilightController.Session import Session
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+# The `AsyncSession` class is the asyncio counterpart of `Session`. It is a datagram protocol bound to
+# a single wifi-bridge, which resolves pending futures as session responses and acknowledgments arrive.
+# Like `Session`, it uses `__slots__`.
+class AsyncSession(asyncio.DatagramProtocol):
+    __slots__ = (
+        "address", "timeout", "lifetime", "retries", "limiter", "capture", "metrics", "rtt", "wb1", "wb2",
+        "established_at", "packet", "transport", "sequences", "released", "session_response", "handshake",
+    )
+    def __init__(
+        self,
+        address: tuple[str, int],
+        timeout: int = 3000,
+        lifetime: int = 60000,
+        retries: int = 3,
+        limiter: RateLimiter = None,
+        capture: PacketCapture = None,
+        metrics: Metrics = None,
+    ) -> None:
+        '''The function initializes an asynchronous session bound to a single wifi-bridge.
+
+        Parameters
+        ----------
+        address : tuple[str, int]
+            The `address` parameter is a tuple of the IP address and port number of the wifi-bridge the
+        session belongs to.
+        timeout : int, optional
+            The `timeout` parameter is the longest duration in milliseconds the session waits for the
+        bridge to answer before a request is retransmitted.
+        lifetime : int, optional
+            The `lifetime` parameter is the duration in milliseconds after which the session ID is
+        considered expired and a new handshake is made before the next command.
+        retries : int, optional
+            The `retries` parameter is the number of times a lost request is retransmitted before it is
+        given up.
+        limiter : RateLimiter, optional
+            The `limiter` parameter is the `RateLimiter` pacing the packets sent to the bridge, `None`
+        sends packets as fast as possible.
+        capture : PacketCapture, optional
+            The `capture` parameter is the `PacketCapture` every packet exchanged with the bridge is
+        written to, `None` disables capturing.
+        metrics : Metrics, optional
+            The `metrics` parameter is the `Metrics` the handshakes and commands of the session are
+        recorded in, `None` disables recording.
+
+        '''
+        self.address: tuple[str, int] = address
+        self.timeout: int = timeout
+        self.lifetime: int = lifetime
+        self.retries: int = retries
+        self.limiter: RateLimiter = limiter
+        self.capture: PacketCapture = capture
+        self.metrics: Metrics = metrics
+        self.rtt: RttEstimator = RttEstimator(min(1.0, timeout / 1000), maximum=timeout / 1000)
+        self.wb1: str = None
+        self.wb2: str = None
+        self.established_at: float = None
+        self.packet: Packet = Packet()
+        self.transport: asyncio.DatagramTransport = None
+        # The futures of the packets in flight are the owners of their sequence numbers
+        self.sequences: SequenceSpace = SequenceSpace()
+        self.released: asyncio.Event = asyncio.Event()
+        self.session_response: asyncio.Future = None
+        self.handshake: asyncio.Lock = asyncio.Lock()
+
+    def connection_made(self, transport: asyncio.DatagramTransport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, _) -> None:
+        if self.capture is not None:
+            self.record(data, False)
+
+        if Session.is_session_response(data):
+            if self.session_response is not None and not self.session_response.done():
+                self.session_response.set_result(data)
+
+        # Acknowledgment: 88 00 00 00 03 00 {SequenceNumber} 00
+        elif data[:1] == b"\x88" and len(data) > 6:
+            future: asyncio.Future = self.sequences.owner(data[6])
+            if future is not None and not future.done():
+                future.set_result(data)
+
+    def connection_lost(self, exc: Exception) -> None:
+        for future in self.sequences.owners():
+            if not future.done():
+                future.set_exception(exc or ConnectionError("Session closed"))
+
+    def is_valid(self) -> bool:
+        '''The function `is_valid` checks whether the session ID is known and has not expired yet.
+
+        Returns
+        -------
+            `True` if the session can be used to send commands, `False` otherwise.
+
+        '''
+        if self.established_at is None:
+            return False
+        return (time.monotonic() - self.established_at) * 1000 < self.lifetime
+
+    async def establish(self) -> tuple[str, str]:
+        '''The function `establish` requests a new session ID from the wifi-bridge and stores it in
+        the session.
+
+        Returns
+        -------
+            A tuple containing the `wb1` and `wb2` values extracted from the response of the bridge.
+
+        '''
+        self.session_response = asyncio.get_running_loop().create_future()
+        started: float = time.monotonic()
+        try:
+            data: bytes = await self.__request(Session.SESSION_REQUEST, self.session_response)
+        except asyncio.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.increment("timeouts_total", self.address[0])
+            raise
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Got response: %s", data.hex(" "))
+
+        # Extract WB1 and WB2 from the response
+        self.wb1 = "%02x" % data[19]
+        self.wb2 = "%02x" % data[20]
+        self.packet.set_session(data[19], data[20])
+        self.established_at = time.monotonic()
+        if self.metrics is not None:
+            self.metrics.observe("session_establish_seconds", self.address[0], self.established_at - started)
+        return (self.wb1, self.wb2)
+
+    async def ensure(self) -> tuple[str, str]:
+        '''The function `ensure` returns the current session ID, making a new handshake only if the
+        session has not been established yet or has expired. Concurrent callers share one handshake.
+
+        Returns
+        -------
+            A tuple containing the `wb1` and `wb2` values of a valid session.
+
+        '''
+        async with self.handshake:
+            if not self.is_valid():
+                return await self.establish()
+            return (self.wb1, self.wb2)
+
+    async def send(self, packet: bytes) -> str:
+        '''The function `send` sends a command packet and waits for its acknowledgment.
+
+        Parameters
+        ----------
+        packet : bytes
+            The `packet` parameter is a complete command packet, f.e. filled into the `Packet` template of
+        the session. Its sequence number at index 8 is replaced by a free sequence number of the bridge,
+        which is used to match the acknowledgment.
+
+        Returns
+        -------
+            The acknowledgment of the bridge in hexadecimal format. `asyncio.TimeoutError` is raised if
+        the packet is not acknowledged within the retry budget.
+
+        '''
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        sequence_number: int = self.sequences.reserve(future, block=False)
+        while sequence_number is None:
+            # All sequence numbers of the bridge are in flight
+            self.released.clear()
+            await self.released.wait()
+            sequence_number = self.sequences.reserve(future, block=False)
+        packet = packet[:8] + bytes((sequence_number,)) + packet[9:]
+
+        started: float = time.monotonic()
+        if self.metrics is not None:
+            self.metrics.increment("commands_total", self.address[0])
+
+        try:
+            response: bytes = await self.__request(packet, future)
+        except asyncio.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.increment("drops_total", self.address[0])
+            raise
+        finally:
+            self.sequences.release(sequence_number)
+            self.released.set()
+
+        if self.metrics is not None:
+            self.metrics.increment("acks_total", self.address[0])
+            self.metrics.observe("command_latency_seconds", self.address[0], time.monotonic() - started)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Received response: %s", response.hex(" "))
+        return response.hex()
+
+    async def __request(self, data: bytes, future: asyncio.Future) -> bytes:
+        '''This method sends `data` and waits for `future` to be resolved by an incoming datagram,
+        retransmitting with the adaptive timeout of the session up to `retries` times.
+
+        '''
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+
+        for attempt in range(self.retries + 1):
+            if attempt and self.metrics is not None:
+                self.metrics.increment("retransmissions_total", self.address[0])
+            if self.limiter is not None:
+                delay: float = self.limiter.reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self.transport.sendto(data, self.address)
+            sent: float = loop.time()
+            if self.capture is not None:
+                self.record(data, True)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Sent request: %s", data.hex(" "))
+
+            try:
+                response: bytes = await asyncio.wait_for(asyncio.shield(future), self.rtt.rto)
+            except asyncio.TimeoutError:
+                self.rtt.backoff()
+                if self.limiter is not None:
+                    self.limiter.on_loss()
+                continue
+
+            # Only unambiguous round trips are sampled (Karn's algorithm)
+            if attempt == 0:
+                self.rtt.sample(loop.time() - sent)
+                if self.limiter is not None:
+                    self.limiter.on_ack()
+            elif self.rtt.srtt is not None and loop.time() - sent >= self.rtt.srtt / 2:
+                # The retransmission itself was acknowledged, not the late original
+                self.rtt.restore()
+            return response
+
+        future.cancel()
+        raise asyncio.TimeoutError(f"No response from {self.address[0]}:{self.address[1]}")
+
+    def record(self, data: bytes, outgoing: bool) -> None:
+        '''The function `record` writes a packet exchanged with the bridge to the `PacketCapture` of the
+        session, see `Session.record`.
+
+        '''
+        local: tuple[str, int] = ("0.0.0.0", self.transport.get_extra_info("socket").getsockname()[1])
+        if outgoing:
+            self.capture.write(data, local, self.address)
+        else:
+            self.capture.write(data, self.address, local)
+
+    def invalidate(self) -> None:
+        '''The function `invalidate` forgets the session ID, forcing a new handshake before the next
+        command. It is used when the bridge stops acknowledging commands.
+
+        '''
+        self.established_at = None
+
+    def close(self) -> None:
+        '''The function `close` closes the transport of the session.
+
+        '''
+        self.invalidate()
+        if self.transport is not None:
+            self.transport.close()
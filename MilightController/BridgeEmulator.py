@@ -0,0 +1,347 @@
+
+import asyncio
+import random
+import socket
+import threading
+
+from MilightController.Device import Device
+from MilightController.MilightController import MilightController
+from MilightController.Packet import Packet
+from MilightController.RateLimiter import RateLimiter
+from MilightController.Session import Session
+from MilightController.Zone import Zone
+
+
+# The `DiscoveryResponder` class answers the discovery broadcast on behalf of a `BridgeEmulator`.
+class DiscoveryResponder(asyncio.DatagramProtocol):
+    def __init__(self, emulator: "BridgeEmulator") -> None:
+        self.emulator: BridgeEmulator = emulator
+        self.transport: asyncio.DatagramTransport = None
+
+    def connection_made(self, transport: asyncio.DatagramTransport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, address: tuple[str, int]) -> None:
+        if data == BridgeEmulator.DISCOVERY_REQUEST:
+            self.emulator.reply(self.transport, self.emulator.discovery_response, address)
+
+
+# The `BridgeEmulator` class is a stand-in for a v6 wifi-bridge on the local machine, so that the
+# controllers can be load tested and benchmarked without hardware. It answers discovery requests,
+# hands out session IDs, validates and acknowledges command packets and keeps the state of the lamps
+# of every zone. Like real lamps, lamps that are off ignore every command but being turned on, so the
+# order of commands matters. Latency, jitter, packet loss and the rate limit of a real bridge can be
+# simulated. All emulators of the process share a single event loop thread, so many of them can run
+# at once.
+class BridgeEmulator(asyncio.DatagramProtocol):
+    DISCOVERY_REQUEST: bytes = b"HF-A11ASSISTHREAD"
+
+    __loop: asyncio.AbstractEventLoop = None
+    __loop_lock: threading.Lock = threading.Lock()
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 5987,
+        discovery_port: int = None,
+        mac: str = "ACCF23F57AD4",
+        name: str = "HF-LPB100",
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        loss: float = 0.0,
+        rate: float = None,
+        burst: float = 1.0,
+        seed: int = None,
+    ) -> None:
+        '''The function initializes an emulated wifi-bridge. It does not listen until `start` or
+        `serve` is called.
+
+        Parameters
+        ----------
+        host : str, optional
+            The `host` parameter is the IP address the emulator listens on and reports in discovery
+        responses.
+        port : int, optional
+            The `port` parameter is the port number commands are received on. 0 picks a free port, see
+        `device`.
+        discovery_port : int, optional
+            The `discovery_port` parameter is the port number discovery requests are answered on, f.e.
+        48899. `None` disables discovery, so that many emulators can run side by side.
+        mac : str, optional
+            The `mac` parameter is the MAC address of the bridge as 12 hexadecimal digits.
+        name : str, optional
+            The `name` parameter is the name reported in discovery responses.
+        latency : float, optional
+            The `latency` parameter is the delay in seconds before every response is sent.
+        jitter : float, optional
+            The `jitter` parameter is the maximum random deviation in seconds from `latency`.
+        loss : float, optional
+            The `loss` parameter is the probability between 0 and 1 that a received packet is dropped.
+        rate : float, optional
+            The `rate` parameter is the maximum number of packets per second the bridge handles. Packets
+        arriving faster are dropped, like a real bridge does. `None` handles every packet.
+        burst : float, optional
+            The `burst` parameter is the number of packets accepted back to back when `rate` is set.
+        seed : int, optional
+            The `seed` parameter seeds the random generator of the loss, jitter and session IDs.
+
+        '''
+        self.host: str = host
+        self.port: int = port
+        self.discovery_port: int = discovery_port
+        self.mac: str = mac
+        self.name: str = name
+        self.latency: float = latency
+        self.jitter: float = jitter
+        self.loss: float = loss
+        self.random: random.Random = random.Random(seed)
+        self.limiter: RateLimiter = None
+        if rate is not None:
+            self.limiter = RateLimiter(rate, burst, min_rate=rate, max_rate=rate)
+
+        self.wb1: int = self.random.randrange(256)
+        self.wb2: int = self.random.randrange(256)
+        self.discovery_response: bytes = f"{host},{mac},{name}".encode("ascii")
+        self.session_response: bytes = (
+            b"\x28\x00\x00\x00\x11\x00\x02" + bytes.fromhex(mac)
+            + b"\x69\xF0\x3C\x23\x00\x01" + bytes((self.wb1, self.wb2, 0x00))
+        )
+
+        self.zones: dict[Zone, dict] = {zone: self.__initial_state() for zone in Zone if zone is not Zone.ALL}
+        self.bridge_lamp: dict = self.__initial_state()
+        self.stats: dict[str, int] = {
+            "received": 0,
+            "sessions": 0,
+            "acknowledged": 0,
+            "lost": 0,
+            "rate_limited": 0,
+            "bad_checksum": 0,
+            "bad_session": 0,
+            "malformed": 0,
+        }
+        self.loop: asyncio.AbstractEventLoop = None
+        self.transport: asyncio.DatagramTransport = None
+        self.discovery_transport: asyncio.DatagramTransport = None
+
+    def __enter__(self) -> "BridgeEmulator":
+        return self.start()
+
+    def __exit__(self, *_) -> None:
+        self.stop()
+
+    @property
+    def device(self) -> Device:
+        '''The property `device` describes the emulator the same way `MilightController.discover` describes
+        a real bridge, with the port it actually listens on.
+
+        '''
+        return MilightController.parse_device(self.discovery_response).replace(port=self.port)
+
+    async def serve(self) -> "BridgeEmulator":
+        '''The function `serve` starts listening on the event loop it is awaited in.
+
+        Returns
+        -------
+            The emulator itself.
+
+        '''
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        self.loop = loop
+        self.transport, _ = await loop.create_datagram_endpoint(
+            lambda: self, local_addr=(self.host, self.port), family=socket.AF_INET
+        )
+        self.port = self.transport.get_extra_info("sockname")[1]
+
+        if self.discovery_port is not None:
+            discoverer: socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            discoverer.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if hasattr(socket, "SO_REUSEPORT"):
+                discoverer.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            discoverer.bind(("0.0.0.0", self.discovery_port))
+            self.discovery_transport, _ = await loop.create_datagram_endpoint(
+                lambda: DiscoveryResponder(self), sock=discoverer
+            )
+        return self
+
+    def start(self) -> "BridgeEmulator":
+        '''The function `start` starts listening on the event loop thread shared by all emulators, for
+        use from synchronous code.
+
+        Returns
+        -------
+            The emulator itself.
+
+        '''
+        asyncio.run_coroutine_threadsafe(self.serve(), self.__get_loop()).result()
+        return self
+
+    def stop(self) -> None:
+        '''The function `stop` closes the sockets of the emulator.
+
+        '''
+        for transport in (self.transport, self.discovery_transport):
+            if transport is not None:
+                self.loop.call_soon_threadsafe(transport.close)
+        self.transport = None
+        self.discovery_transport = None
+
+    def reply(self, transport: asyncio.DatagramTransport, data: bytes, address: tuple[str, int]) -> None:
+        '''The function `reply` sends a response after the simulated latency.
+
+        Parameters
+        ----------
+        transport : asyncio.DatagramTransport
+            The `transport` parameter is the transport the response is sent with.
+        data : bytes
+            The `data` parameter is the response.
+        address : tuple[str, int]
+            The `address` parameter is the address the response is sent to.
+
+        '''
+        delay: float = self.latency
+        if self.jitter:
+            delay = max(0.0, delay + self.random.uniform(-self.jitter, self.jitter))
+
+        if delay > 0:
+            self.loop.call_later(delay, transport.sendto, data, address)
+        else:
+            transport.sendto(data, address)
+
+    def datagram_received(self, data: bytes, address: tuple[str, int]) -> None:
+        self.stats["received"] += 1
+
+        if self.loss and self.random.random() < self.loss:
+            self.stats["lost"] += 1
+            return
+        if self.limiter is not None and self.limiter.try_acquire() > 0:
+            self.stats["rate_limited"] += 1
+            return
+
+        # Session request: 20 00 00 00 16 ...
+        if data[:5] == Session.SESSION_REQUEST[:5]:
+            self.stats["sessions"] += 1
+            self.reply(self.transport, self.session_response, address)
+            return
+
+        # Command: 80 00 00 00 11 {WB1} {WB2} 00 {SequenceNumber} 00 {COMMAND} {ZONE NUMBER} 00 {Checksum}
+        if len(data) != Packet.LENGTH or data[:5] != Packet.HEADER:
+            self.stats["malformed"] += 1
+            return
+        if data[21] != Packet.checksum(data):
+            self.stats["bad_checksum"] += 1
+            return
+        if data[5] != self.wb1 or data[6] != self.wb2:
+            self.stats["bad_session"] += 1
+            return
+
+        self.apply(data[10:19], data[19])
+        self.stats["acknowledged"] += 1
+        # Acknowledgment: 88 00 00 00 03 00 {SequenceNumber} 00
+        self.reply(self.transport, bytes((0x88, 0x00, 0x00, 0x00, 0x03, 0x00, data[8], 0x00)), address)
+
+    def apply(self, payload: bytes, zone: int) -> None:
+        '''The function `apply` updates the emulated lamps with a command.
+
+        Parameters
+        ----------
+        payload : bytes
+            The `payload` parameter is the 9 byte command.
+        zone : int
+            The `zone` parameter is the zone number of the packet, 0 for all zones.
+
+        '''
+        if payload[0] in (0x3D, 0x3E):
+            linked: bool = payload[0] == 0x3D
+            for state in self.__targets(zone):
+                state["linked"] = linked
+            return
+        if payload[0] != 0x31:
+            return
+
+        # Commands for the lamp built into the bridge
+        if payload[3] == 0x00:
+            self.__apply_bridge_lamp(payload[4], payload[5])
+            return
+
+        for state in self.__targets(zone):
+            self.__apply_lamp(state, payload[4], payload[5])
+
+    def __targets(self, zone: int) -> list[dict]:
+        if zone == 0:
+            return list(self.zones.values())
+        state: dict = self.zones.get(Zone(f"{zone:02d}")) if 1 <= zone <= 4 else None
+        return [] if state is None else [state]
+
+    @staticmethod
+    def __apply_lamp(state: dict, function: int, value: int) -> None:
+        if not state["on"] and not (function == 0x04 and value in (0x01, 0x05)):
+            return
+        if function == 0x01:
+            state["color"] = value
+            state["white"] = False
+        elif function == 0x02:
+            state["saturation"] = 100 - value
+        elif function == 0x03:
+            state["brightness"] = value
+        elif function == 0x04:
+            if value == 0x01:
+                state["on"] = True
+                state["night"] = False
+            elif value == 0x02:
+                state["on"] = False
+            elif value == 0x03:
+                state["speed"] += 1
+            elif value == 0x04:
+                state["speed"] -= 1
+            elif value == 0x05:
+                state["on"] = True
+                state["night"] = True
+        elif function == 0x05:
+            state["kelvin"] = value
+            state["white"] = True
+        elif function == 0x06:
+            state["mode"] = value
+
+    def __apply_bridge_lamp(self, function: int, value: int) -> None:
+        state: dict = self.bridge_lamp
+        if function == 0x01:
+            state["color"] = value
+            state["white"] = False
+        elif function == 0x02:
+            state["brightness"] = value
+        elif function == 0x03:
+            if value == 0x01:
+                state["speed"] -= 1
+            elif value == 0x02:
+                state["speed"] += 1
+            elif value == 0x03:
+                state["on"] = True
+            elif value == 0x04:
+                state["on"] = False
+            elif value == 0x05:
+                state["white"] = True
+        elif function == 0x04:
+            state["mode"] = value
+
+    @staticmethod
+    def __initial_state() -> dict:
+        return {
+            "on": False,
+            "night": False,
+            "white": False,
+            "color": None,
+            "saturation": None,
+            "brightness": None,
+            "kelvin": None,
+            "mode": None,
+            "speed": 0,
+            "linked": False,
+        }
+
+    @classmethod
+    def __get_loop(cls) -> asyncio.AbstractEventLoop:
+        with cls.__loop_lock:
+            if cls.__loop is None:
+                cls.__loop = asyncio.new_event_loop()
+                threading.Thread(target=cls.__loop.run_forever, name="BridgeEmulator", daemon=True).start()
+            return cls.__loop
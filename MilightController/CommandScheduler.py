@@ -0,0 +1,244 @@
+
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from MilightController.Device import Device
+from MilightController.MilightController import MilightController
+from MilightController.Payload import Payload
+from MilightController.Zone import Zone
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+# The `CommandScheduler` class sits in front of `MilightController.send_command` and sends commands to
+# every bridge at a fixed rate. Pending commands that are superseded by a newer command of the same kind
+# for the same zone are replaced, so a bridge always converges on the newest state instead of replaying
+# stale values, and the queue of every bridge stays bounded. Like `Daemon.coalesce`, a command is never
+# moved past another command to the same zone, so the final state of the lamps does not change.
+class CommandScheduler:
+    # Commands changing a value relatively (or pairing lamps) are never coalesced
+    __RELATIVE: frozenset[bytes] = frozenset(
+        (
+            b"\x31\x00\x00\x08\x04\x03",
+            b"\x31\x00\x00\x08\x04\x04",
+            b"\x31\x00\x00\x00\x03\x01",
+            b"\x31\x00\x00\x00\x03\x02",
+        )
+    )
+
+    def __init__(self, controller: MilightController, rate: float = 10.0, max_pending: int = 64) -> None:
+        '''The function initializes the scheduler. A sender thread is started for every bridge on its first
+        command.
+
+        Parameters
+        ----------
+        controller : MilightController
+            The `controller` parameter is the controller used to send the commands.
+        rate : float, optional
+            The `rate` parameter is the maximum number of commands per second sent to a single bridge.
+        max_pending : int, optional
+            The `max_pending` parameter is the maximum number of commands waiting for a single bridge.
+        When it is exceeded, the oldest pending command is dropped, unless it changes a value relatively.
+
+        '''
+        self.controller: MilightController = controller
+        self.rate: float = rate
+        self.max_pending: int = max_pending
+        self.closed: bool = False
+        self.bridges: dict[tuple[str, int], dict] = {}
+        self.lock: threading.Lock = threading.Lock()
+        self.counter: itertools.count = itertools.count()
+
+    def __enter__(self) -> "CommandScheduler":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    @staticmethod
+    def command_class(payload: bytes) -> bytes:
+        '''The static function `command_class` returns the kind of a command, f.e. "brightness" or
+        "color", as the leading bytes of its payload. Commands of the same kind supersede each other.
+
+        Parameters
+        ----------
+        payload : bytes
+            The `payload` parameter is the 9 byte payload of the command.
+
+        Returns
+        -------
+            The bytes identifying the kind of the command, or `None` if the command changes a value
+        relatively and must never be dropped.
+
+        '''
+        if payload[0] != 0x31 or payload[:6] in CommandScheduler.__RELATIVE:
+            return None
+        return payload[:5]
+
+    def submit(self, device: dict, command: str | bytes, zone: Zone = Zone.ALL) -> None:
+        '''The function `submit` queues a command for a device, replacing any pending command of the same
+        kind for the same zone. It returns immediately.
+
+        Parameters
+        ----------
+        device : dict
+            The `device` parameter is a dictionary containing information about the device. It should have
+        the keys "ip" and "port".
+        command : str | bytes
+            The `command` parameter is a command generated by `Commands` or `Payloads`.
+        zone : Zone, optional
+            The `zone` parameter is the `Zone` the command is addressed to. A command for `Zone.ALL` also
+        replaces pending commands of the same kind for the individual zones.
+
+        A pending command is only replaced if no command to the same zone, or to `Zone.ALL`, was queued
+        after it, otherwise the new command is queued behind it. Because of that, no command is moved past
+        a command it could interfere with, f.e. a brightness change past turning the lamps off.
+
+        '''
+        payload: Payload = Payload.parse(command)
+        kind: bytes = self.command_class(payload)
+        bridge: dict = self.__get_bridge(device)
+
+        with bridge["condition"]:
+            if self.closed:
+                raise RuntimeError("CommandScheduler is closed")
+
+            pending: OrderedDict = bridge["pending"]
+            # Pending commands which a newer command of the same kind for the same zone can still replace
+            latest: dict[tuple[Zone, bytes], int] = bridge["latest"]
+
+            key: int = None
+            if kind is not None:
+                # The pending command keeps its place, so that it is not moved past any other command
+                key = latest.get((zone, kind))
+                if key is not None:
+                    pending[key] = (payload, zone, kind)
+                if zone is Zone.ALL:
+                    for single_zone in Zone:
+                        if single_zone is not Zone.ALL and (single_zone, kind) in latest:
+                            del pending[latest.pop((single_zone, kind))]
+
+            # Commands to an overlapping zone can no longer be moved past this one
+            for other_zone, other_kind in list(latest):
+                if (other_zone is zone or Zone.ALL in (other_zone, zone)) and latest[(other_zone, other_kind)] != key:
+                    del latest[(other_zone, other_kind)]
+
+            if key is None:
+                key = next(self.counter)
+                pending[key] = (payload, zone, kind)
+                if kind is not None:
+                    latest[(zone, kind)] = key
+
+            # Commands changing a value relatively are never dropped
+            while len(pending) > self.max_pending:
+                oldest: int = next((candidate for candidate, entry in pending.items() if entry[2] is not None), None)
+                if oldest is None:
+                    break
+                del pending[oldest]
+                for replaceable, pending_key in list(latest.items()):
+                    if pending_key == oldest:
+                        del latest[replaceable]
+
+            bridge["condition"].notify()
+
+    def flush(self, timeout: float = None) -> bool:
+        '''The function `flush` waits until all pending commands have been sent.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The `timeout` parameter is the maximum number of seconds to wait, `None` waits forever.
+
+        Returns
+        -------
+            `True` if all commands were sent, `False` if the timeout expired first.
+
+        '''
+        deadline: float = None if timeout is None else time.monotonic() + timeout
+        for bridge in list(self.bridges.values()):
+            with bridge["condition"]:
+                remaining: float = None if deadline is None else max(0, deadline - time.monotonic())
+                idle: bool = bridge["condition"].wait_for(
+                    lambda: not bridge["pending"] and not bridge["busy"], remaining
+                )
+                if not idle:
+                    return False
+        return True
+
+    def close(self) -> None:
+        '''The function `close` sends the remaining pending commands and stops the sender threads. The
+        controller itself is left open.
+
+        '''
+        with self.lock:
+            self.closed = True
+            bridges: list[dict] = list(self.bridges.values())
+        for bridge in bridges:
+            with bridge["condition"]:
+                bridge["condition"].notify()
+        for bridge in bridges:
+            bridge["thread"].join()
+
+    def __get_bridge(self, device: dict) -> dict:
+        address: tuple[str, int] = Device.address_of(device)
+        bridge: dict = self.bridges.get(address)
+        if bridge is not None:
+            return bridge
+
+        with self.lock:
+            bridge = self.bridges.get(address)
+            if bridge is None:
+                if self.closed:
+                    raise RuntimeError("CommandScheduler is closed")
+                bridge = {
+                    "device": device,
+                    "pending": OrderedDict(),
+                    "latest": {},
+                    "condition": threading.Condition(),
+                    "busy": False,
+                    "next_send": 0.0,
+                    "thread": None,
+                }
+                bridge["thread"] = threading.Thread(
+                    target=self.__run, args=(bridge,), name=f"CommandScheduler-{address[0]}", daemon=True
+                )
+                bridge["thread"].start()
+                self.bridges[address] = bridge
+        return bridge
+
+    def __run(self, bridge: dict) -> None:
+        condition: threading.Condition = bridge["condition"]
+        pending: OrderedDict = bridge["pending"]
+
+        while True:
+            with condition:
+                # Wait for the next send slot before picking a command, so that commands superseded in
+                # the meantime are never sent
+                while True:
+                    if not pending:
+                        if self.closed:
+                            return
+                        condition.wait()
+                        continue
+                    delay: float = bridge["next_send"] - time.monotonic()
+                    if delay <= 0:
+                        break
+                    condition.wait(delay)
+
+                key, (payload, zone, kind) = pending.popitem(last=False)
+                if kind is not None and bridge["latest"].get((zone, kind)) == key:
+                    del bridge["latest"][(zone, kind)]
+                bridge["busy"] = True
+
+            try:
+                self.controller.send_command(bridge["device"], payload, zone)
+            except Exception as error:
+                logger.warning("Failed to send command to %s: %s", bridge["device"].get("ip"), error)
+
+            with condition:
+                bridge["busy"] = False
+                bridge["next_send"] = time.monotonic() + 1 / self.rate
+                condition.notify_all()
@@ -1,7 +1,10 @@
 
+from MilightController.Payloads import Payloads
+
 # The `Commands` class in Python provides static methods for generating commands to control various
 # lighting settings, including turning lights on/off, setting colors, adjusting brightness, and
-# changing modes for a smart lighting system.
+# changing modes for a smart lighting system. The strings are the spaced hex representation of the
+# binary payloads generated by `Payloads`, which should be preferred where performance matters.
 class Commands:
     @staticmethod
     def light_on():
@@ -13,7 +16,7 @@ class Commands:
             "31 00 00 08 04 01 00 00 00".
         
         '''
-        return "31 00 00 08 04 01 00 00 00"
+        return str(Payloads.light_on())
 
     @staticmethod
     def light_off():
@@ -25,7 +28,7 @@ class Commands:
             "31 00 00 08 04 02 00 00 00".
         
         '''
-        return "31 00 00 08 04 02 00 00 00"
+        return str(Payloads.light_off())
 
     @staticmethod
     def night_light_on():
@@ -37,7 +40,7 @@ class Commands:
             "31 00 00 08 04 05 00 00 00".
         
         '''
-        return "31 00 00 08 04 05 00 00 00"
+        return str(Payloads.night_light_on())
 
     @staticmethod
     def white_light_on():
@@ -49,7 +52,7 @@ class Commands:
            "31 00 00 08 05 64 00 00 00".
         
         '''
-        return "31 00 00 08 05 64 00 00 00"
+        return str(Payloads.white_light_on())
 
     @staticmethod
     def set_color(color: str):
@@ -73,8 +76,7 @@ class Commands:
             "31 00 00 08 01 {color} {color} {color} {color}"
         
         '''
-        color = Commands.__hex_to_hue(color)
-        return "31 00 00 08 01 {} {} {} {}".format(color, color, color, color)
+        return str(Payloads.set_color(color))
 
     @staticmethod
     def saturation(saturation: int):
@@ -93,11 +95,7 @@ class Commands:
             "31 00 00 08 02 {saturation} 00 00 00"
         
         '''
-        # Ensure percent is within [0, 100] range
-        saturation = max(0, min(100, saturation))
-        saturation = 100 - saturation
-        saturation = Commands.__percentage_to_hex(saturation)
-        return "31 00 00 08 02 {} 00 00 00".format(saturation)
+        return str(Payloads.saturation(saturation))
 
     @staticmethod
     def brightness(brightness: int):
@@ -117,10 +115,7 @@ class Commands:
             "31 00 00 08 03 {brightness} 00 00 00"
         
         '''
-        # Ensure percent is within [0, 100] range
-        brightness = max(0, min(100, brightness))
-        brightness = Commands.__percentage_to_hex(brightness)
-        return "31 00 00 08 03 {} 00 00 00".format(brightness)
+        return str(Payloads.brightness(brightness))
 
     @staticmethod
     def kelvin(temp: int):
@@ -139,8 +134,7 @@ class Commands:
             "31 00 00 08 05 {temp} 00 00 00"
         
         '''
-        temp = Commands.__KV_to_hex(temp)
-        return "31 00 00 08 05 {} 00 00 00".format(temp)
+        return str(Payloads.kelvin(temp))
 
     @staticmethod
     def mode_number(mode_number):
@@ -159,7 +153,7 @@ class Commands:
             "31 00 00 08 06 {mode} 00 00 00".
         
         '''
-        return "31 00 00 08 06 {} 00 00 00".format(format(mode_number, '02X'))
+        return str(Payloads.mode_number(mode_number))
 
     @staticmethod
     def mode_speed_decrease():
@@ -171,7 +165,7 @@ class Commands:
             "31 00 00 08 04 04 00 00 00".
         
         '''
-        return "31 00 00 08 04 04 00 00 00"
+        return str(Payloads.mode_speed_decrease())
 
     @staticmethod
     def mode_speed_increase():
@@ -183,7 +177,7 @@ class Commands:
             "31 00 00 08 04 03 00 00 00".
         
         '''
-        return "31 00 00 08 04 03 00 00 00"
+        return str(Payloads.mode_speed_increase())
 
     # ! check functionality
     @staticmethod
@@ -196,7 +190,7 @@ class Commands:
             "3D 00 00 08 00 00 00 00 00".
         
         '''
-        return "3D 00 00 08 00 00 00 00 00"
+        return str(Payloads.link())
 
     # ! check functionality
     @staticmethod
@@ -209,7 +203,7 @@ class Commands:
             "3E 00 00 08 00 00 00 00 00".
         
         '''
-        return "3E 00 00 08 00 00 00 00 00"
+        return str(Payloads.unlink())
 
     @staticmethod
     def wifi_bridge_lamp_on():
@@ -221,7 +215,7 @@ class Commands:
             "31 00 00 00 03 03 00 00 00".
         
         '''
-        return "31 00 00 00 03 03 00 00 00"
+        return str(Payloads.wifi_bridge_lamp_on())
 
     @staticmethod
     def wifi_bridge_lamp_off():
@@ -233,7 +227,7 @@ class Commands:
             "31 00 00 00 03 04 00 00 00".
         
         '''
-        return "31 00 00 00 03 04 00 00 00"
+        return str(Payloads.wifi_bridge_lamp_off())
 
     @staticmethod
     def wifi_bridge_mode_number(mode_number):
@@ -252,7 +246,7 @@ class Commands:
             "31 00 00 00 04 {mode} 00 00 00"
         
         '''
-        return "31 00 00 00 04 {} 00 00 00".format(format(mode_number, '02X'))
+        return str(Payloads.wifi_bridge_mode_number(mode_number))
 
     @staticmethod
     def wifi_bridge_mode_speed_decrease():
@@ -264,7 +258,7 @@ class Commands:
             "31 00 00 00 03 01 00 00 00"
         
         '''
-        return "31 00 00 00 03 01 00 00 00"
+        return str(Payloads.wifi_bridge_mode_speed_decrease())
 
     @staticmethod
     def wifi_bridge_mode_speed_increase():
@@ -276,7 +270,7 @@ class Commands:
             "31 00 00 00 03 02 00 00 00"
         
         '''
-        return "31 00 00 00 03 02 00 00 00"
+        return str(Payloads.wifi_bridge_mode_speed_increase())
 
     @staticmethod
     def wifi_bridge_set_color(color):
@@ -300,8 +294,7 @@ class Commands:
             "31 00 00 00 01 {color} {color} {color} {color}"
         
         '''
-        color = Commands.__hex_to_hue(color)
-        return "31 00 00 00 01 {} {} {} {}".format(color, color, color, color)
+        return str(Payloads.wifi_bridge_set_color(color))
 
     @staticmethod
     def wifi_bridge_set_color_to_white():
@@ -313,7 +306,7 @@ class Commands:
             "31 00 00 00 03 05 00 00 00"
         
         '''
-        return "31 00 00 00 03 05 00 00 00"
+        return str(Payloads.wifi_bridge_set_color_to_white())
 
     @staticmethod
     def wifi_bridge_brightness(brightness: int):
@@ -335,95 +328,4 @@ class Commands:
         where {brightness} is the converted hexadecimal value of the input brightness parameter.
         
         '''
-        brightness = max(0, min(100, brightness))
-        brightness = Commands.__percentage_to_hex(brightness)
-        return "31 00 00 00 02 {} 00 00 00".format(brightness)
-    
-    @staticmethod
-    def __hex_to_hue(hex_color: str):
-        '''This static method converts a hexadecimal color code to its corresponding hue value in
-        the range 00-FF.
-        
-        Parameters
-        ----------
-        hex_color : str
-            The `hex_to_hue` method takes a hexadecimal color code as input and converts it to a hue value
-        in the range of 00-FF. It ignores any spaces and "#" at the start.
-        
-        Returns
-        -------
-            String containing a hue value in the range of 00-FF.
-        
-        '''
-        # Convert hex color to RGB
-        hex_color = hex_color.strip("#").replace(" ", "")
-        red = int(hex_color[0:2], 16)
-        green = int(hex_color[2:4], 16)
-        blue = int(hex_color[4:6], 16)
-        
-        # Convert RGB to HSL
-        r = red / 255
-        g = green / 255
-        b = blue / 255
-        
-        max_val = max(r, g, b)
-        min_val = min(r, g, b)
-        
-        delta = max_val - min_val
-        
-        if delta == 0:
-            hue = 0
-        elif max_val == r:
-            hue = ((g - b) / delta) % 6
-        elif max_val == g:
-            hue = ((b - r) / delta) + 2
-        else:
-            hue = ((r - g) / delta) + 4
-        
-        hue *= 60
-        
-        # Convert hue to range 00-FF
-        hue = int(hue / 360 * 255)
-        
-        return format(hue, '02X')
-
-    @staticmethod
-    def __KV_to_hex(KV):
-        '''The static function __KV_to_hex converts a Kelvin value to a hexadecimal representation.
-        
-        Parameters
-        ----------
-        KV
-            KV represents a Kelvin value, typically used in lighting to indicate the color temperature of a
-        light source. The function `__KV_to_hex` takes a Kelvin value as input, converts it to a
-        hexadecimal value based on a message range, and returns the hexadecimal representation.
-        
-        Returns
-        -------
-            String containing a hexadecimal representation of the input KV value after converting it to
-        a percentage based on a range of 2700 to 6500.
-        
-        '''
-        hex_value = int((KV - 2700) / (6500 - 2700) * 100)
-        return format(hex_value, '02X')
-    
-    @staticmethod
-    def __percentage_to_hex(percent):
-        '''The static method `__percentage_to_hex` converts a percentage value to a hexadecimal
-        representation.
-        
-        Parameters
-        ----------
-        percent
-            The `__percentage_to_hex` method takes a percentage value as input and converts it to a
-        hexadecimal value. The `percent` parameter represents the percentage value that you want to
-        convert to hexadecimal.
-        
-        Returns
-        -------
-            String containing hex representation of percentage passed.
-        
-        '''
-        hex_value = int(percent / 100 * 100)
-        
-        return format(hex_value, '02X')
\ No newline at end of file
+        return str(Payloads.wifi_bridge_brightness(brightness))
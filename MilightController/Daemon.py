@@ -0,0 +1,419 @@
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from MilightController.Device import Device
+from MilightController.MilightController import MilightController
+from MilightController.Payload import Payload
+from MilightController.Payloads import Payloads
+from MilightController.Zone import Zone
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+# The `DaemonHandler` class serves a single client connection of a `Daemon`. Every line received is a
+# JSON request and is answered with a single JSON line.
+class DaemonHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response: dict = self.server.daemon.handle(json.loads(line))
+            except Exception as error:
+                response = {"ok": False, "error": str(error)}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+# The `DaemonServer` class is the threaded Unix socket server of a `Daemon`.
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads: bool = True
+    # Many clients connect at once when they are started together, f.e. by cron
+    request_queue_size: int = 128
+
+
+# The `DaemonHTTPServer` class is the threaded HTTP server of a `Daemon`.
+class DaemonHTTPServer(ThreadingHTTPServer):
+    daemon_threads: bool = True
+    request_queue_size: int = 128
+
+
+# The `DaemonHTTPHandler` class serves the HTTP JSON API of a `Daemon`. The path names the operation
+# and the JSON body holds the rest of the request, f.e. `POST /send` with `{"commands": [...]}`.
+# Operations must be posted with `Content-Type: application/json`, which a web page cannot send to
+# another site without the consent of the daemon, so visited pages cannot control the lamps. Only
+# `GET /ping` and `GET /metrics`, in the Prometheus text format, are served without a body.
+class DaemonHTTPHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path == "/ping":
+            self.__handle({})
+        elif self.path == "/metrics":
+            metrics = self.server.daemon.controller.metrics
+            if metrics is None:
+                self.__respond(404, {"ok": False, "error": "The daemon records no metrics"})
+            else:
+                self.__respond(200, metrics.export_prometheus(), "text/plain; version=0.0.4")
+        else:
+            self.__respond(405, {"ok": False, "error": f"Use POST for {self.path}"}, allow="POST")
+
+    def do_POST(self) -> None:
+        content_type: str = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            self.__respond(415, {"ok": False, "error": "The body must be sent as application/json"})
+            return
+        try:
+            length: int = int(self.headers.get("Content-Length", 0))
+            request: dict = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("the body must be a JSON object")
+        except ValueError as error:
+            self.__respond(400, {"ok": False, "error": f"Invalid request: {error}"})
+            return
+        self.__handle(request)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug("%s " + format, self.address_string(), *args)
+
+    def __handle(self, request: dict) -> None:
+        try:
+            response: dict = self.server.daemon.handle({**request, "op": self.path.strip("/")})
+        except Exception as error:
+            response = {"ok": False, "error": str(error)}
+        self.__respond(200 if response.get("ok") else 400, response)
+
+    def __respond(self, status: int, body, content_type: str = "application/json", allow: str = None) -> None:
+        data: bytes = (body if isinstance(body, str) else json.dumps(body)).encode("utf-8")
+        self.send_response(status)
+        if allow is not None:
+            self.send_header("Allow", allow)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+# The `Daemon` class keeps a `MilightController` and its sessions alive in a long-running process and
+# accepts commands from other processes over a Unix socket and, optionally, an HTTP JSON API. Short
+# lived clients like the command line interface skip discovery and handshakes, and processes sharing
+# bridges no longer fight over their sequence numbers. Requests are JSON objects with an "op" key:
+#
+#   {"op": "ping"}
+#   {"op": "discover", "expected": 1}
+#   {"op": "send", "commands": [{"ip": "192.168.0.10", "port": 5987, "payload": "31 00 ...", "zone": "01"}]}
+#   {"op": "shutdown"}
+#
+# Every bridge is driven by a single sender thread. Commands of all clients queued while it is busy
+# are coalesced into its next batch, which is pipelined with `MilightController.send_commands`.
+class Daemon:
+    SOCKET: str = os.path.join(
+        tempfile.gettempdir(), f"MilightController-{os.getuid() if hasattr(os, 'getuid') else 0}.sock"
+    )
+    # Commands whose effects add up when repeated, they are never merged when coalescing
+    REPEATABLE: frozenset[Payload] = frozenset((
+        Payloads.mode_speed_decrease(),
+        Payloads.mode_speed_increase(),
+        Payloads.link(),
+        Payloads.unlink(),
+        Payloads.wifi_bridge_mode_speed_decrease(),
+        Payloads.wifi_bridge_mode_speed_increase(),
+    ))
+
+    def __init__(
+        self,
+        controller: MilightController = None,
+        path: str = SOCKET,
+        window: int = 16,
+        http: tuple[str, int] = None,
+    ) -> None:
+        '''The function initializes the daemon without listening yet.
+
+        Parameters
+        ----------
+        controller : MilightController, optional
+            The `controller` parameter is the controller owning the sessions. A new one is created if it
+        is not given.
+        path : str, optional
+            The `path` parameter is the path of the Unix socket the daemon listens on, `None` disables
+        the Unix socket.
+        window : int, optional
+            The `window` parameter is the maximum number of commands in flight per bridge.
+        http : tuple[str, int], optional
+            The `http` parameter is the `(host, port)` address the HTTP JSON API listens on, `None`
+        disables it. The API has no authentication, so it should only listen on trusted interfaces.
+
+        '''
+        self.controller: MilightController = controller or MilightController()
+        self.path: str = path
+        self.window: int = window
+        self.http: tuple[str, int] = http
+        self.servers: list[socketserver.BaseServer] = []
+        self.stopped: threading.Event = threading.Event()
+        self.bridges: dict[tuple[str, int], dict] = {}
+        self.bridges_lock: threading.Lock = threading.Lock()
+
+    def serve_forever(self) -> None:
+        '''The function `serve_forever` listens on the Unix socket and the HTTP address and serves
+        clients until `shutdown` is called or a client requests it. Commands already queued are sent
+        before it returns.
+
+        '''
+        if self.path is not None and os.path.exists(self.path):
+            if self.is_running(self.path):
+                raise RuntimeError(f"A daemon is already listening on {self.path}")
+            os.unlink(self.path)
+
+        try:
+            if self.path is not None:
+                unix_server: DaemonServer = DaemonServer(self.path, DaemonHandler)
+                os.chmod(self.path, 0o600)
+                self.__start(unix_server)
+                logger.info("Listening on %s", self.path)
+            if self.http is not None:
+                http_server: DaemonHTTPServer = DaemonHTTPServer(self.http, DaemonHTTPHandler)
+                self.__start(http_server)
+                logger.info("Listening on http://%s:%d", *http_server.server_address[:2])
+            self.stopped.wait()
+        finally:
+            self.stopped.set()
+            for server in self.servers:
+                server.shutdown()
+                server.server_close()
+            self.servers.clear()
+            if self.path is not None and os.path.exists(self.path):
+                os.unlink(self.path)
+            self.__stop_bridges()
+            self.controller.close()
+
+    def shutdown(self) -> None:
+        '''The function `shutdown` stops `serve_forever`, it can be called from any thread.
+
+        '''
+        self.stopped.set()
+
+    def handle(self, request: dict) -> dict:
+        '''The function `handle` executes a single request.
+
+        Parameters
+        ----------
+        request : dict
+            The `request` parameter is the decoded JSON request.
+
+        Returns
+        -------
+            The response, with "ok" set to `False` and an "error" message if the request failed.
+
+        '''
+        operation: str = request.get("op")
+
+        if operation == "ping":
+            return {"ok": True, "sessions": len(self.controller.sessions), "bridges": len(self.bridges)}
+
+        if operation == "discover":
+            devices: list[Device] = self.controller.discover(request.get("expected"), request.get("use_cache", False))
+            return {"ok": True, "devices": [device.to_dict() for device in devices or []]}
+
+        if operation == "send":
+            return {"ok": True, "responses": self.send(request.get("commands", []))}
+
+        if operation == "shutdown":
+            self.shutdown()
+            return {"ok": True}
+
+        return {"ok": False, "error": f"Unknown operation: {operation}"}
+
+    def send(self, commands: list[dict]) -> list[str]:
+        '''The function `send` queues commands to one or more bridges and waits until they are sent. The
+        commands are merged with those of other clients into the next batch of every bridge.
+
+        Parameters
+        ----------
+        commands : list[dict]
+            The `commands` parameter is a list of commands with the keys "ip", "port", "payload" (in
+        hexadecimal format) and "zone" (the value of a `Zone`).
+
+        Returns
+        -------
+            The response of the bridge to every command in hexadecimal format, or `None` for commands that
+        were not acknowledged or whose bridge could not be reached, in the order of `commands`.
+
+        '''
+        groups: dict[tuple[str, int], list[int]] = {}
+        for index, command in enumerate(commands):
+            groups.setdefault((command["ip"], command.get("port", 5987)), []).append(index)
+
+        futures: list[tuple[list[int], Future]] = []
+        for address, indexes in groups.items():
+            batch: list[tuple[Payload, Zone]] = [
+                (Payload.parse(commands[index]["payload"]), Zone(commands[index].get("zone", Zone.ALL.value)))
+                for index in indexes
+            ]
+            futures.append((indexes, self.__submit(address, batch)))
+
+        responses: list[str] = [None] * len(commands)
+        for indexes, future in futures:
+            for index, response in zip(indexes, future.result()):
+                responses[index] = response
+        return responses
+
+    @staticmethod
+    def coalesce(commands: list[tuple[Payload, Zone]]) -> tuple[list[tuple[Payload, Zone]], list[int]]:
+        '''The static function `coalesce` drops commands that are sent again later in the same batch,
+        f.e. the same state requested by several clients. A command is only dropped if no other command to
+        the same zone, or to `Zone.ALL`, was queued between it and its next copy. Because of that, no
+        command is moved past a command it could interfere with, and the final state of the lamps does
+        not change. `REPEATABLE` commands are all kept.
+
+        Parameters
+        ----------
+        commands : list[tuple[Payload, Zone]]
+            The `commands` parameter is a list of `(payload, zone)` tuples in the order they were queued.
+
+        Returns
+        -------
+            A tuple of the commands to send, and for every command of `commands` the index of the command
+        sent in its place.
+
+        '''
+        # Index of the copy every command is replaced by, itself if it is sent
+        successors: list[int] = list(range(len(commands)))
+        # Latest copy of every command which a later copy can still replace
+        latest: dict[tuple[Payload, Zone], int] = {}
+        for index, command in enumerate(commands):
+            if command in latest:
+                successors[latest[command]] = index
+            # Commands to an overlapping zone can no longer be moved past this one
+            zone: Zone = command[1]
+            for other in list(latest):
+                if other != command and (other[1] is zone or Zone.ALL in (other[1], zone)):
+                    del latest[other]
+            if command[0] not in Daemon.REPEATABLE:
+                latest[command] = index
+
+        kept: list[tuple[Payload, Zone]] = []
+        kept_at: dict[int, int] = {}
+        for index, command in enumerate(commands):
+            if successors[index] == index:
+                kept_at[index] = len(kept)
+                kept.append(command)
+
+        # Replacements chain forward, so they are resolved from the end
+        for index in range(len(commands) - 1, -1, -1):
+            successors[index] = successors[successors[index]]
+        return kept, [kept_at[successor] for successor in successors]
+
+    @staticmethod
+    def request(message: dict, path: str = SOCKET, timeout: float = 30.0) -> dict:
+        '''The static function `request` sends a request to a running daemon and waits for its response.
+
+        Parameters
+        ----------
+        message : dict
+            The `message` parameter is the request, see `Daemon`.
+        path : str, optional
+            The `path` parameter is the path of the Unix socket of the daemon.
+        timeout : float, optional
+            The `timeout` parameter is the number of seconds to wait for the response.
+
+        Returns
+        -------
+            The decoded response. `OSError` is raised if no daemon is listening.
+
+        '''
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(path)
+            client.sendall(json.dumps(message).encode("utf-8") + b"\n")
+            with client.makefile("rb") as reader:
+                line: bytes = reader.readline()
+        if not line:
+            raise ConnectionError("The daemon closed the connection")
+        return json.loads(line)
+
+    @staticmethod
+    def is_running(path: str = SOCKET) -> bool:
+        '''The static function `is_running` checks whether a daemon is listening on a Unix socket.
+
+        '''
+        if not hasattr(socket, "AF_UNIX") or not os.path.exists(path):
+            return False
+        try:
+            return Daemon.request({"op": "ping"}, path, timeout=1.0).get("ok", False)
+        except (OSError, ValueError):
+            return False
+
+    def __start(self, server: socketserver.BaseServer) -> None:
+        server.daemon = self
+        threading.Thread(target=server.serve_forever, name="MilightController-daemon", daemon=True).start()
+        self.servers.append(server)
+
+    def __submit(self, address: tuple[str, int], commands: list[tuple[Payload, Zone]]) -> Future:
+        future: Future = Future()
+        with self.bridges_lock:
+            if self.stopped.is_set():
+                raise RuntimeError("The daemon is shutting down")
+            bridge: dict = self.bridges.get(address)
+            if bridge is None:
+                bridge = {"device": Device(*address), "pending": [], "condition": threading.Condition()}
+                bridge["thread"] = threading.Thread(
+                    target=self.__run_bridge, args=(bridge,), name=f"MilightController-{address[0]}", daemon=True
+                )
+                self.bridges[address] = bridge
+                bridge["thread"].start()
+
+            with bridge["condition"]:
+                bridge["pending"].append((commands, future))
+                bridge["condition"].notify()
+        return future
+
+    def __run_bridge(self, bridge: dict) -> None:
+        # The only thread sending to the bridge, so its session is never used concurrently
+        condition: threading.Condition = bridge["condition"]
+        address: tuple[str, int] = bridge["device"].address
+        while True:
+            with condition:
+                while not bridge["pending"] and not self.stopped.is_set():
+                    condition.wait()
+                if not bridge["pending"]:
+                    return
+                submissions: list[tuple[list, Future]] = bridge["pending"]
+                bridge["pending"] = []
+
+            queued: list[tuple[Payload, Zone]] = [command for commands, _ in submissions for command in commands]
+            batch, positions = self.coalesce(queued)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Sending %d commands of %d requests to %s:%d, %d coalesced",
+                    len(batch), len(submissions), *address, len(queued) - len(batch),
+                )
+
+            try:
+                responses: list[str] = self.controller.send_commands(bridge["device"], batch, self.window)
+            except OSError as error:
+                # An unreachable bridge fails its own commands only
+                logger.warning("Could not send to %s:%d: %s", *address, error)
+                responses = [None] * len(batch)
+            except Exception as error:
+                for _, future in submissions:
+                    future.set_exception(error)
+                continue
+
+            offset: int = 0
+            for commands, future in submissions:
+                future.set_result([responses[position] for position in positions[offset:offset + len(commands)]])
+                offset += len(commands)
+
+    def __stop_bridges(self) -> None:
+        with self.bridges_lock:
+            bridges: list[dict] = list(self.bridges.values())
+        for bridge in bridges:
+            with bridge["condition"]:
+                bridge["condition"].notify()
+            bridge["thread"].join()
@@ -0,0 +1,124 @@
+from collections.abc import Iterator, Mapping
+
+
+# The `Device` class describes a wifi-bridge, as returned by `discover`. Devices are immutable records
+# with `__slots__`, so thousands of them stay small, and their `(ip, port)` address is computed once
+# instead of on every command. A device is a read-only mapping, so code written for the dictionaries
+# devices used to be keeps working, f.e. `device["ip"]`, `device.get("port")` or `dict(device)`.
+class Device(Mapping):
+    __slots__ = ("ip", "port", "mac", "name", "type", "address")
+    KEYS: tuple[str, ...] = ("ip", "port", "mac", "name", "type")
+
+    def __init__(self, ip: str, port: int = 5987, mac: str = None, name: str = "", type: str = "v6") -> None:
+        '''The function initializes a device.
+
+        Parameters
+        ----------
+        ip : str
+            The `ip` parameter is the IP address of the wifi-bridge.
+        port : int, optional
+            The `port` parameter is the port number the wifi-bridge listens on.
+        mac : str, optional
+            The `mac` parameter is the MAC address of the wifi-bridge, f.e. "AC:CF:23:00:00:01".
+        name : str, optional
+            The `name` parameter is the name the wifi-bridge reports in its discovery response.
+        type : str, optional
+            The `type` parameter is the protocol version of the wifi-bridge.
+
+        '''
+        object.__setattr__(self, "ip", ip)
+        object.__setattr__(self, "port", port)
+        object.__setattr__(self, "mac", mac)
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "type", type)
+        object.__setattr__(self, "address", (ip, port))
+
+    @classmethod
+    def from_dict(cls, device: Mapping) -> "Device":
+        '''The class function `from_dict` converts a dictionary describing a device, f.e. read from a JSON
+        file, into a `Device`. Devices are returned unchanged.
+
+        Parameters
+        ----------
+        device : Mapping
+            The `device` parameter is a mapping with at least the key "ip".
+
+        Returns
+        -------
+            The `Device`.
+
+        '''
+        if isinstance(device, Device):
+            return device
+        return cls(**{key: device[key] for key in cls.KEYS if key in device})
+
+    @staticmethod
+    def address_of(device: Mapping) -> tuple[str, int]:
+        '''The static function `address_of` returns the `(ip, port)` address of a device, taking the
+        precomputed tuple of a `Device` and building it for plain dictionaries.
+
+        Parameters
+        ----------
+        device : Mapping
+            The `device` parameter is a `Device` or a dictionary with the keys "ip" and "port".
+
+        Returns
+        -------
+            A tuple of the IP address and port number of the device.
+
+        '''
+        if type(device) is Device:
+            return device.address
+        return (device.get("ip"), device.get("port"))
+
+    def replace(self, **changes) -> "Device":
+        '''The function `replace` returns a copy of the device with some fields changed.
+
+        Parameters
+        ----------
+        **changes
+            The fields to change, f.e. `port=5988`.
+
+        Returns
+        -------
+            The new `Device`.
+
+        '''
+        return Device(**{**self.to_dict(), **changes})
+
+    def to_dict(self) -> dict:
+        '''The function `to_dict` returns the device as a plain dictionary, f.e. to write it as JSON.
+
+        '''
+        return {key: getattr(self, key) for key in self.KEYS}
+
+    def __getitem__(self, key: str) -> object:
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError(f"Device is immutable, use replace to change {name}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"Device is immutable, cannot delete {name}")
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Device):
+            return all(getattr(self, key) == getattr(other, key) for key in self.KEYS)
+        return Mapping.__eq__(self, other)
+
+    def __hash__(self) -> int:
+        return hash(self.address)
+
+    def __reduce__(self) -> tuple:
+        return (Device, tuple(getattr(self, key) for key in self.KEYS))
+
+    def __repr__(self) -> str:
+        return f"Device(ip={self.ip!r}, port={self.port!r}, mac={self.mac!r}, name={self.name!r}, type={self.type!r})"
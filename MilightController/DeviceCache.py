@@ -0,0 +1,95 @@
+
+import json
+import os
+import threading
+
+from MilightController.Device import Device
+from MilightController.DeviceIndex import DeviceIndex
+
+
+# The `DeviceCache` class persists the discovered wifi-bridges to a JSON file, keyed by their MAC
+# address. A service can load the devices on start and send commands right away instead of waiting for
+# a discovery to finish.
+class DeviceCache:
+    def __init__(self, path: str) -> None:
+        '''The function initializes the cache and loads the devices stored in the file, if it exists.
+
+        Parameters
+        ----------
+        path : str
+            The `path` parameter is the path of the JSON file the devices are stored in.
+
+        '''
+        self.path: str = path
+        self.lock: threading.Lock = threading.Lock()
+        self.devices: DeviceIndex = self.load()
+
+    def load(self) -> DeviceIndex:
+        '''The function `load` reads the devices stored in the cache file.
+
+        Returns
+        -------
+            A `DeviceIndex` of the stored devices. An empty index is returned if the file does not exist or
+        cannot be read.
+
+        '''
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                devices: list[dict] = json.load(file)
+        except (OSError, ValueError):
+            return DeviceIndex()
+        index: DeviceIndex = DeviceIndex()
+        for device in devices:
+            if isinstance(device, dict) and "mac" in device and "ip" in device:
+                index.add(Device.from_dict(device))
+        return index
+
+    def save(self) -> None:
+        '''The function `save` writes the devices to the cache file. The file is replaced atomically, so
+        a crash while saving never leaves a truncated cache behind.
+
+        '''
+        with self.lock:
+            devices: list[dict] = [device.to_dict() for device in self.devices.values()]
+            temporary: str = f"{self.path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as file:
+                json.dump(devices, file, indent=2)
+            os.replace(temporary, self.path)
+
+    def update(self, device: Device) -> bool:
+        '''The function `update` adds a device to the cache or replaces the stored entry with the same MAC
+        address, f.e. after the bridge got a new IP address. The file is not written, see `save`.
+
+        Parameters
+        ----------
+        device : Device
+            The `device` parameter is the device, as returned by `discover`. A dictionary is converted
+        with `Device.from_dict`.
+
+        Returns
+        -------
+            `True` if the device is new or has changed, `False` otherwise.
+
+        '''
+        device = Device.from_dict(device)
+        with self.lock:
+            if self.devices.get(device.mac) == device:
+                return False
+            self.devices.add(device)
+            return True
+
+    def find(self, key: str) -> Device:
+        '''The function `find` looks a cached device up by its MAC or IP address, see `DeviceIndex.find`.
+
+        '''
+        return self.devices.find(key)
+
+    def values(self) -> list[Device]:
+        '''The function `values` returns the cached devices.
+
+        Returns
+        -------
+            A list of the cached `Device` records.
+
+        '''
+        return list(self.devices.values())
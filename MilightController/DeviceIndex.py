@@ -0,0 +1,59 @@
+import threading
+
+from MilightController.Device import Device
+
+
+# The `DeviceIndex` class holds the discovered wifi-bridges keyed by their MAC address and keeps a
+# second index keyed by IP address, so a bridge can be looked up by either without scanning every
+# device. Devices must be added with `add` to keep both indexes in sync.
+class DeviceIndex(dict):
+    def __init__(self) -> None:
+        '''The function initializes an empty index.
+
+        '''
+        super().__init__()
+        self.by_ip: dict[str, Device] = {}
+        self.lock: threading.Lock = threading.Lock()
+
+    def add(self, device: Device) -> Device:
+        '''The function `add` adds a device or replaces the device with the same MAC address, f.e. after
+        the bridge got a new IP address.
+
+        Parameters
+        ----------
+        device : Device
+            The `device` parameter is the device, a dictionary is converted with `Device.from_dict`.
+
+        Returns
+        -------
+            The device that was replaced, or `None` if no device had the same MAC address.
+
+        '''
+        device = Device.from_dict(device)
+        with self.lock:
+            previous: Device = self.get(device.mac)
+            if previous is not None and self.by_ip.get(previous.ip) is previous:
+                del self.by_ip[previous.ip]
+            self[device.mac] = device
+            self.by_ip[device.ip] = device
+        return previous
+
+    def find(self, key: str) -> Device:
+        '''The function `find` looks a device up by its MAC or IP address.
+
+        Parameters
+        ----------
+        key : str
+            The `key` parameter is the MAC address, f.e. "AC:CF:23:00:00:01", or the IP address.
+
+        Returns
+        -------
+            The `Device`, or `None` if no device has that address.
+
+        '''
+        device: Device = self.get(key)
+        if device is None:
+            device = self.by_ip.get(key)
+        if device is None and isinstance(key, str):
+            device = self.get(key.upper())
+        return device
@@ -0,0 +1,201 @@
+import socket
+import threading
+import time
+from collections import deque
+
+from MilightController.Metrics import Metrics
+from MilightController.MmsgTransport import MmsgTransport
+from MilightController.Packet import Packet
+from MilightController.PacketCapture import PacketCapture
+from MilightController.Payload import Payload
+from MilightController.Session import Session
+from MilightController.Transport import Transport
+from MilightController.Zone import Zone
+
+
+# The `FanOut` class sends a single command to many wifi-bridges through one shared UDP socket. The
+# packets of all bridges are sent with `Transport.send_each`, each one with the address of its bridge,
+# and the acknowledgments are matched to the bridges by the address they come from and their sequence
+# number, so with `MmsgTransport` a command reaches hundreds of bridges in a few system calls instead of
+# one per bridge and direction.
+#
+# The sessions of the bridges still provide the session IDs, sequence numbers, retransmission timeouts
+# and rate limiters. The shared socket is read by one thread at a time, `send` returns `None` while
+# another thread is using it.
+class FanOut:
+    def __init__(
+        self,
+        retries: int = 3,
+        capture: PacketCapture = None,
+        metrics: Metrics = None,
+        transport: Transport = None,
+    ) -> None:
+        '''The function initializes the shared socket.
+
+        Parameters
+        ----------
+        retries : int, optional
+            The `retries` parameter is the number of times an unacknowledged packet is retransmitted
+        before it is given up.
+        capture : PacketCapture, optional
+            The `capture` parameter is the `PacketCapture` every packet sent or received is written to,
+        `None` disables capturing.
+        metrics : Metrics, optional
+            The `metrics` parameter is the `Metrics` the commands are recorded in, `None` disables
+        recording.
+        transport : Transport, optional
+            The `transport` parameter is the `Transport` datagrams are sent and received with, `None`
+        uses a `MmsgTransport` where it is available and a `Transport` otherwise.
+
+        '''
+        self.retries: int = retries
+        self.capture: PacketCapture = capture
+        self.metrics: Metrics = metrics
+        self.socket: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(("0.0.0.0", 0))
+        if transport is None:
+            transport = MmsgTransport() if MmsgTransport.available() else Transport()
+        self.transport: Transport = transport
+        self.lock: threading.Lock = threading.Lock()
+
+    def send(self, sessions: list[Session], command: str | bytes, zone: Zone = Zone.ALL) -> dict[tuple[str, int], str]:
+        '''The function `send` sends a command to the bridges of established sessions and waits for their
+        acknowledgments, retransmitting lost packets like `MilightController.send_commands`.
+
+        Parameters
+        ----------
+        sessions : list[Session]
+            The `sessions` parameter is the list of the sessions of the bridges, which must have been
+        established, see `Session.ensure`.
+        command : str | bytes
+            The `command` parameter is a command generated by `Commands` or `Payloads`.
+        zone : Zone, optional
+            The `zone` parameter is the `Zone` the command is addressed to.
+
+        Returns
+        -------
+            A dictionary keyed by the `(ip, port)` address of every bridge, holding its acknowledgment in
+        hexadecimal format or `None` if the command was not acknowledged within the retry budget. `None`
+        is returned instead if another thread is using the socket.
+
+        '''
+        if not self.lock.acquire(blocking=False):
+            return None
+        try:
+            return self.__send(sessions, Payload.parse(command), zone)
+        finally:
+            self.lock.release()
+
+    def close(self) -> None:
+        '''The function `close` closes the shared socket.
+
+        '''
+        self.socket.close()
+
+    def __send(self, sessions: list[Session], payload: Payload, zone: Zone) -> dict[tuple[str, int], str]:
+        responses: dict[tuple[str, int], str] = {session.address: None for session in sessions}
+        # Sequence numbers are reserved for this mailbox, whose acknowledgments arrive on the shared socket
+        mailbox: deque = deque()
+        local: tuple[str, int] = ("0.0.0.0", self.socket.getsockname()[1])
+        # Bridges whose packet has not been sent yet
+        waiting: list[Session] = list(sessions)
+        # Maps the address of every bridge with a packet in flight to
+        # [session, sequence number, packet, time sent, attempts, time first sent]
+        in_flight: dict[tuple[str, int], list] = {}
+        latencies: dict[tuple[str, int], float] = {}
+        retransmissions: dict[tuple[str, int], int] = {}
+
+        try:
+            while waiting or in_flight:
+                outgoing: list[tuple[bytes, tuple[str, int]]] = []
+                # Time until the first rate limiter holding back a packet allows it, 0 if none does
+                paced: float = 0.0
+
+                now: float = time.monotonic()
+                for address, entry in list(in_flight.items()):
+                    session: Session = entry[0]
+                    if now - entry[3] < session.rtt.rto:
+                        continue
+                    session.rtt.backoff()
+                    if session.limiter is not None:
+                        session.limiter.on_loss()
+                    if entry[4] > self.retries:
+                        del in_flight[address]
+                        session.release(entry[1])
+                        continue
+                    entry[3] = now
+                    entry[4] += 1
+                    retransmissions[address] = retransmissions.get(address, 0) + 1
+                    outgoing.append((entry[2], address))
+
+                held: list[Session] = []
+                for session in waiting:
+                    # All sequence numbers of the bridge can be in flight for other threads, bridges without
+                    # a free sequence number are tried again shortly
+                    sequence_number: int = session.reserve(mailbox, block=False)
+                    delay: float = 0.001 if sequence_number is None else 0.0
+                    # A token is only taken once the packet can be sent, so it is not wasted
+                    if sequence_number is not None and session.limiter is not None:
+                        delay = session.limiter.try_acquire()
+                        if delay > 0:
+                            session.release(sequence_number)
+                    if delay > 0:
+                        paced = delay if paced == 0 else min(paced, delay)
+                        held.append(session)
+                        continue
+                    packet: bytes = bytes(
+                        Packet(session.packet.buffer[5], session.packet.buffer[6]).fill(sequence_number, payload, zone)
+                    )
+                    in_flight[session.address] = [session, sequence_number, packet, now, 1, now]
+                    outgoing.append((packet, session.address))
+                waiting = held
+
+                if outgoing:
+                    self.transport.send_each(self.socket, outgoing)
+                    if self.capture is not None:
+                        for packet, address in outgoing:
+                            self.capture.write(packet, local, address)
+
+                if not in_flight:
+                    if paced > 0:
+                        time.sleep(paced)
+                    continue
+                remaining: float = min(entry[3] + entry[0].rtt.rto for entry in in_flight.values()) - time.monotonic()
+                if paced > 0:
+                    remaining = min(max(remaining, 0.0), paced)
+                if remaining <= 0:
+                    continue
+
+                for data, address in self.transport.receive_from(self.socket, remaining):
+                    if self.capture is not None:
+                        self.capture.write(data, address, local)
+                    # Acknowledgment: 88 00 00 00 03 00 {SequenceNumber} 00
+                    entry: list = in_flight.get(address)
+                    if entry is None or len(data) <= 6 or data[0] != 0x88 or data[6] != entry[1]:
+                        continue
+                    del in_flight[address]
+                    session = entry[0]
+                    session.release(entry[1])
+                    received: float = time.monotonic()
+                    latencies[address] = received - entry[5]
+                    if entry[4] == 1:
+                        session.rtt.sample(received - entry[3])
+                        if session.limiter is not None:
+                            session.limiter.on_ack()
+                    responses[address] = data.hex()
+        finally:
+            for entry in in_flight.values():
+                entry[0].release(entry[1])
+
+        if self.metrics is not None:
+            for address, response in responses.items():
+                ip: str = address[0]
+                self.metrics.increment("commands_total", ip)
+                self.metrics.increment("retransmissions_total", ip, retransmissions.get(address, 0))
+                if response is None:
+                    self.metrics.increment("drops_total", ip)
+                else:
+                    self.metrics.increment("acks_total", ip)
+                    self.metrics.observe("command_latency_seconds", ip, latencies[address])
+
+        return responses
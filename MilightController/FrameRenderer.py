@@ -0,0 +1,217 @@
+import time
+from collections.abc import Iterable
+
+from MilightController.Device import Device
+from MilightController.MilightController import MilightController
+from MilightController.Payload import Payload
+from MilightController.Payloads import Payloads
+from MilightController.Zone import Zone
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# The `FrameRenderer` class drives pixel-mapped effects, treating every zone of every bridge as one
+# pixel of a frame. A frame is an array of shape (bridges, 4, 3) holding the RGB color of zones 1-4 of
+# every bridge. The on/off state, hue and brightness of all pixels are encoded with NumPy, compared with
+# the state the previous frames left the lamps in, and only the changed values are sent. Where all four
+# zones of a bridge change to the same value, a single `Zone.ALL` packet replaces the four zone packets.
+#
+# Colors are rendered fully saturated, as by `Payloads.set_color`, with the brightness taken from the
+# brightest channel. Black turns a zone off, and zones that are off keep their hue and brightness.
+class FrameRenderer:
+    ZONES: tuple[Zone, ...] = (Zone.ZONE_1, Zone.ZONE_2, Zone.ZONE_3, Zone.ZONE_4)
+    # Rows of the encoded state, see `encode`
+    ON: int = 0
+    HUE: int = 1
+    BRIGHTNESS: int = 2
+    UNKNOWN: int = -1
+
+    def __init__(self, devices: list[Device], controller: MilightController = None, window: int = 16) -> None:
+        '''The function initializes the renderer. The state of the lamps is unknown until the first
+        frame is sent, so the first frame sends every value.
+
+        Parameters
+        ----------
+        devices : list[Device]
+            The `devices` parameter is the list of bridges, in the order of the first axis of the frames.
+        controller : MilightController, optional
+            The `controller` parameter is the controller used by `send`. A controller is created if none
+        is passed.
+        window : int, optional
+            The `window` parameter is the maximum number of commands of one bridge in flight, see
+        `MilightController.send_commands`.
+
+        '''
+        if numpy is None:
+            raise ImportError("NumPy is required for frame rendering, install it with `pip install numpy`")
+
+        self.devices: list[Device] = [Device.from_dict(device) for device in devices]
+        self.controller: MilightController = MilightController() if controller is None else controller
+        self.window: int = window
+        self.state: numpy.ndarray = numpy.full((3, len(self.devices), len(self.ZONES)), self.UNKNOWN, dtype=numpy.int16)
+        # Payloads indexed by the encoded values
+        self.payloads: tuple[tuple[Payload, ...], ...] = (
+            (Payloads.light_off(), Payloads.light_on()),
+            tuple(Payload(row.tobytes()) for row in Payloads.hue_many(numpy.arange(256))),
+            tuple(Payloads.brightness(level) for level in range(101)),
+        )
+
+    @staticmethod
+    def encode(frame) -> "numpy.ndarray":
+        '''The static function `encode` converts a frame to the values sent to the lamps.
+
+        Parameters
+        ----------
+        frame
+            The `frame` parameter is an array-like of shape (bridges, 4, 3) holding RGB colors in the
+        range 0-255.
+
+        Returns
+        -------
+            An `int16` array of shape (3, bridges, 4) holding the on/off state (0 or 1), the hue (0-255)
+        and the brightness (0-100) of every zone, indexed by `ON`, `HUE` and `BRIGHTNESS`.
+
+        '''
+        rgb = numpy.asarray(frame)
+        if rgb.ndim != 3 or rgb.shape[1:] != (4, 3):
+            raise ValueError(f"Frames must have the shape (bridges, 4, 3), got {rgb.shape}")
+
+        value = rgb.max(axis=-1).astype(numpy.float64)
+        encoded = numpy.empty((3,) + rgb.shape[:2], dtype=numpy.int16)
+        encoded[FrameRenderer.ON] = value > 0
+        encoded[FrameRenderer.HUE] = Payloads.hues(rgb)
+        encoded[FrameRenderer.BRIGHTNESS] = numpy.rint(value / 255 * 100)
+        return encoded
+
+    def render(self, frame) -> dict[tuple[str, int], list[tuple[Payload, Zone]]]:
+        '''The function `render` computes the commands turning the lamps from the current state into a
+        frame, and assumes they are sent. `send` renders and sends a frame at once.
+
+        Parameters
+        ----------
+        frame
+            The `frame` parameter is an array-like of shape (bridges, 4, 3), see `encode`.
+
+        Returns
+        -------
+            A dictionary keyed by the `(ip, port)` address of every bridge with changes, holding the list
+        of `(payload, zone)` tuples to send to it. Lamps are turned on before, and off after, their color
+        and brightness are set.
+
+        '''
+        return {
+            address: [(payload, zone) for payload, zone, _ in commands]
+            for address, commands in self.__render(frame).items()
+        }
+
+    def send(self, frame) -> dict[tuple[str, int], dict]:
+        '''The function `send` renders a frame and sends the changes to all bridges concurrently. Values
+        whose commands were not acknowledged are sent again with the next frame.
+
+        Parameters
+        ----------
+        frame
+            The `frame` parameter is an array-like of shape (bridges, 4, 3), see `encode`.
+
+        Returns
+        -------
+            The results of `MilightController.fan_out`, for the bridges with changes only.
+
+        '''
+        rendered: dict[tuple[str, int], list[tuple[Payload, Zone, tuple]]] = self.__render(frame)
+        if not rendered:
+            return {}
+
+        devices: list[Device] = [device for device in self.devices if device.address in rendered]
+        results: dict[tuple[str, int], dict] = self.controller.fan_out(
+            devices,
+            {address: [(payload, zone) for payload, zone, _ in commands] for address, commands in rendered.items()},
+            window=self.window,
+        )
+
+        for address, result in results.items():
+            responses: list[str] = result["responses"] or [None] * len(rendered[address])
+            for (_, _, target), response in zip(rendered[address], responses):
+                if response is None:
+                    self.state[target] = self.UNKNOWN
+        return results
+
+    def play(self, frames: Iterable, rate: float) -> int:
+        '''The function `play` sends a sequence of frames at a fixed frame rate. Frames the renderer has
+        fallen behind on are skipped instead of being sent in a burst.
+
+        Parameters
+        ----------
+        frames : Iterable
+            The `frames` parameter is an iterable of frames, f.e. a generator computing an effect.
+        rate : float
+            The `rate` parameter is the number of frames per second.
+
+        Returns
+        -------
+            The number of frames skipped.
+
+        '''
+        interval: float = 1 / rate
+        next_frame: float = time.monotonic()
+        skipped: int = 0
+
+        for frame in frames:
+            if time.monotonic() - next_frame > interval:
+                skipped += 1
+                next_frame += interval
+                continue
+            self.send(frame)
+
+            next_frame += interval
+            delay: float = next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return skipped
+
+    def reset(self) -> None:
+        '''The function `reset` forgets the state of the lamps, so the next frame sends every value, f.e.
+        after the lamps were changed by a remote.
+
+        '''
+        self.state.fill(self.UNKNOWN)
+
+    def __render(self, frame) -> dict[tuple[str, int], list[tuple[Payload, Zone, tuple]]]:
+        target = self.encode(frame)
+        if target.shape[1] != len(self.devices):
+            raise ValueError(f"Frames must hold {len(self.devices)} bridges, got {target.shape[1]}")
+
+        on = target[self.ON] == 1
+        commands: dict[int, list[tuple[Payload, Zone, tuple]]] = {}
+
+        # Lamps are turned on first, as lamps that are off ignore color and brightness commands
+        passes: tuple[tuple[int, numpy.ndarray], ...] = (
+            (self.ON, on), (self.HUE, on), (self.BRIGHTNESS, on), (self.ON, ~on),
+        )
+        for row, mask in passes:
+            values = target[row]
+            changed = (values != self.state[row]) & mask
+            if not changed.any():
+                continue
+
+            # A single packet addresses all zones whose values agree, if all of them need it
+            collapse = changed.any(axis=1) & mask.all(axis=1) & (values == values[:, :1]).all(axis=1)
+            payloads: tuple[Payload, ...] = self.payloads[row]
+
+            for bridge in numpy.flatnonzero(collapse).tolist():
+                commands.setdefault(bridge, []).append(
+                    (payloads[values[bridge, 0]], Zone.ALL, (row, bridge))
+                )
+            bridges, zones = numpy.nonzero(changed & ~collapse[:, None])
+            for bridge, zone in zip(bridges.tolist(), zones.tolist()):
+                commands.setdefault(bridge, []).append(
+                    (payloads[values[bridge, zone]], self.ZONES[zone], (row, bridge, zone))
+                )
+
+            self.state[row][changed] = values[changed]
+
+        # Bridges are listed in the order of the frame, and commands in the order of the passes
+        return {self.devices[bridge].address: commands[bridge] for bridge in sorted(commands)}
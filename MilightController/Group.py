@@ -0,0 +1,141 @@
+from collections.abc import Iterable
+from functools import lru_cache
+
+from MilightController.Device import Device
+from MilightController.MilightController import MilightController
+from MilightController.Payload import Payload
+from MilightController.Zone import Zone
+
+
+# The `Group` class addresses a set of zones spread over one or more bridges, f.e. the lamps of a room,
+# as a whole. Its plan, the minimal list of packets reaching every zone of the group, is computed once
+# and reused by every command: zones of the same bridge share its session and a bridge whose four
+# zones all belong to the group is sent a single `Zone.ALL` packet instead of four. Plans are cached,
+# so groups with the same members share one plan.
+class Group:
+    ZONES: frozenset[Zone] = frozenset((Zone.ZONE_1, Zone.ZONE_2, Zone.ZONE_3, Zone.ZONE_4))
+
+    def __init__(self, members: Iterable, name: str = None) -> None:
+        '''The function initializes a group.
+
+        Parameters
+        ----------
+        members : Iterable
+            The `members` parameter lists the zones of the group. Every member is a `(device, zone)`
+        tuple, a device alone standing for all of its zones, or another `Group` whose zones are added.
+        name : str, optional
+            The `name` parameter is the name of the group, f.e. the room, used in its representation.
+
+        '''
+        self.name: str = name
+        self.members: frozenset[tuple[Device, Zone]] = frozenset(self.expand(members))
+        self.plan: tuple[tuple[Device, tuple[Zone, ...]], ...] = self.optimize(self.members)
+        self.devices: list[Device] = [device for device, _ in self.plan]
+
+    @staticmethod
+    def expand(members: Iterable) -> Iterable[tuple[Device, Zone]]:
+        '''The static generator `expand` flattens the members of a group into `(device, zone)` tuples
+        with a single zone each.
+
+        Parameters
+        ----------
+        members : Iterable
+            The `members` parameter lists the members as accepted by `Group`.
+
+        Returns
+        -------
+            An iterator over `(device, zone)` tuples, `Zone.ALL` is expanded to zones 1-4.
+
+        '''
+        for member in members:
+            if isinstance(member, Group):
+                yield from member.members
+                continue
+            device, zone = (member, Zone.ALL) if isinstance(member, dict | Device) else member
+            device = Device.from_dict(device)
+            if zone is Zone.ALL:
+                yield from ((device, zone) for zone in Group.ZONES)
+            else:
+                yield (device, zone)
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def optimize(members: frozenset[tuple[Device, Zone]]) -> tuple[tuple[Device, tuple[Zone, ...]], ...]:
+        '''The static function `optimize` computes the plan of a group, see `Group`. Plans are cached by
+        their members.
+
+        Parameters
+        ----------
+        members : frozenset[tuple[Device, Zone]]
+            The `members` parameter is the set of `(device, zone)` tuples of the group, as returned by
+        `expand`.
+
+        Returns
+        -------
+            A tuple with one `(device, zones)` entry per bridge, ordered by address. `zones` holds the
+        zones the packets of a command are addressed to, `(Zone.ALL,)` if the group covers the bridge.
+
+        '''
+        bridges: dict[tuple[str, int], tuple[Device, set[Zone]]] = {}
+        for device, zone in members:
+            bridges.setdefault(device.address, (device, set()))[1].add(zone)
+
+        return tuple(
+            (device, (Zone.ALL,) if zones >= Group.ZONES else tuple(sorted(zones, key=lambda zone: zone.value)))
+            for _, (device, zones) in sorted(bridges.items())
+        )
+
+    def commands(self, commands: str | bytes | list[str | bytes]) -> dict[tuple[str, int], list[tuple[Payload, Zone]]]:
+        '''The function `commands` applies the plan of the group to one or more commands.
+
+        Parameters
+        ----------
+        commands : str | bytes | list[str | bytes]
+            The `commands` parameter is a command generated by `Commands` or `Payloads`, or a list of them.
+
+        Returns
+        -------
+            A dictionary keyed by the `(ip, port)` address of every bridge of the group, holding the list
+        of `(payload, zone)` tuples to send to it, as accepted by `MilightController.fan_out`. Every
+        command reaches all zones before the next command is sent.
+
+        '''
+        if isinstance(commands, (str, bytes)):
+            commands = [commands]
+        payloads: list[Payload] = [Payload.parse(command) for command in commands]
+        return {
+            device.address: [(payload, zone) for payload in payloads for zone in zones]
+            for device, zones in self.plan
+        }
+
+    def send(
+        self, controller: MilightController, commands: str | bytes | list[str | bytes], window: int = 16
+    ) -> dict[tuple[str, int], dict]:
+        '''The function `send` sends one or more commands to every zone of the group, to all of its
+        bridges concurrently.
+
+        Parameters
+        ----------
+        controller : MilightController
+            The `controller` parameter is the controller used to send the commands.
+        commands : str | bytes | list[str | bytes]
+            The `commands` parameter is a command generated by `Commands` or `Payloads`, or a list of them.
+        window : int, optional
+            The `window` parameter is the maximum number of commands in flight per bridge, see
+        `MilightController.send_commands`.
+
+        Returns
+        -------
+            The results of `MilightController.fan_out`, keyed by the `(ip, port)` address of every bridge.
+
+        '''
+        return controller.fan_out(self.devices, self.commands(commands), window=window)
+
+    def __len__(self) -> int:
+        '''The number of packets a single command of the group is sent in.
+
+        '''
+        return sum(len(zones) for _, zones in self.plan)
+
+    def __repr__(self) -> str:
+        return f"Group({self.name!r}, {len(self.plan)} bridges, {len(self)} packets per command)"
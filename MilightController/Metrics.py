@@ -0,0 +1,292 @@
+
+import threading
+from bisect import bisect_left
+
+
+# The `Histogram` class counts observed values in fixed buckets, the same way Prometheus histograms do.
+# Observing a value is a binary search and an increment, so it is cheap enough for the send path.
+class Histogram:
+    BUCKETS: tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS) -> None:
+        '''The function initializes an empty histogram.
+
+        Parameters
+        ----------
+        buckets : tuple[float, ...], optional
+            The `buckets` parameter is the sorted upper bounds of the buckets. Values above the last
+        bound are counted in an additional overflow bucket.
+
+        '''
+        self.buckets: tuple[float, ...] = tuple(buckets)
+        self.counts: list[int] = [0] * (len(self.buckets) + 1)
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        '''The function `observe` adds a value to the histogram.
+
+        Parameters
+        ----------
+        value : float
+            The `value` parameter is the observed value, f.e. a latency in seconds.
+
+        '''
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        '''The function `quantile` estimates a quantile of the observed values by interpolating linearly
+        within the bucket it falls into, like `histogram_quantile` in Prometheus.
+
+        Parameters
+        ----------
+        q : float
+            The `q` parameter is the quantile between 0 and 1, f.e. 0.99.
+
+        Returns
+        -------
+            The estimated quantile, or `None` if nothing has been observed. Quantiles falling into the
+        overflow bucket are reported as the last bucket bound.
+
+        '''
+        if self.count == 0:
+            return None
+
+        rank: float = q * self.count
+        cumulative: int = 0
+        for index, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower: float = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+# The `Metrics` class collects latency histograms and event counters for every wifi-bridge, keyed by
+# its IP address. Pass an instance to a controller to enable it; the statistics can then be read with
+# `stats` or exported in the Prometheus text format with `export_prometheus`.
+class Metrics:
+    HISTOGRAMS: dict[str, str] = {
+        "session_establish_seconds": "Duration of session handshakes, including retransmissions.",
+        "command_latency_seconds": "Time from sending a command until it was acknowledged.",
+        "discovery_response_seconds": "Time from the first discover request until the bridge answered.",
+    }
+    COUNTERS: dict[str, str] = {
+        "commands_total": "Commands sent, not counting retransmissions.",
+        "acks_total": "Commands acknowledged by the bridge.",
+        "retransmissions_total": "Packets retransmitted after their timeout expired.",
+        "drops_total": "Commands given up after all retransmissions were lost.",
+        "timeouts_total": "Requests that failed with a timeout error.",
+    }
+
+    def __init__(self, namespace: str = "milight", buckets: tuple[float, ...] = Histogram.BUCKETS) -> None:
+        '''The function initializes empty metrics.
+
+        Parameters
+        ----------
+        namespace : str, optional
+            The `namespace` parameter is the prefix of the metric names in the Prometheus export.
+        buckets : tuple[float, ...], optional
+            The `buckets` parameter is the upper bounds in seconds of the buckets of every histogram.
+
+        '''
+        self.namespace: str = namespace
+        self.buckets: tuple[float, ...] = tuple(buckets)
+        self.bridges: dict[str, dict] = {}
+        self.macs: dict[str, str] = {}
+        self.lock: threading.Lock = threading.Lock()
+
+    def observe(self, name: str, ip: str, value: float) -> None:
+        '''The function `observe` adds a value to a histogram of a bridge.
+
+        Parameters
+        ----------
+        name : str
+            The `name` parameter is the name of the histogram, one of `HISTOGRAMS`.
+        ip : str
+            The `ip` parameter is the IP address of the bridge.
+        value : float
+            The `value` parameter is the observed latency in seconds.
+
+        '''
+        with self.lock:
+            self.__get_bridge(ip)["histograms"][name].observe(value)
+
+    def observe_many(self, name: str, ip: str, values: list[float]) -> None:
+        '''The function `observe_many` adds several values to a histogram of a bridge at once, taking the
+        lock only once.
+
+        Parameters
+        ----------
+        name : str
+            The `name` parameter is the name of the histogram, one of `HISTOGRAMS`.
+        ip : str
+            The `ip` parameter is the IP address of the bridge.
+        values : list[float]
+            The `values` parameter is the observed latencies in seconds.
+
+        '''
+        with self.lock:
+            histogram: Histogram = self.__get_bridge(ip)["histograms"][name]
+            for value in values:
+                histogram.observe(value)
+
+    def increment(self, name: str, ip: str, amount: int = 1) -> None:
+        '''The function `increment` increases a counter of a bridge.
+
+        Parameters
+        ----------
+        name : str
+            The `name` parameter is the name of the counter, one of `COUNTERS`.
+        ip : str
+            The `ip` parameter is the IP address of the bridge.
+        amount : int, optional
+            The `amount` parameter is the number the counter is increased by.
+
+        '''
+        with self.lock:
+            self.__get_bridge(ip)["counters"][name] += amount
+
+    def set_mac(self, ip: str, mac: str) -> None:
+        '''The function `set_mac` records the MAC address of a bridge, which is added to its statistics.
+
+        Parameters
+        ----------
+        ip : str
+            The `ip` parameter is the IP address of the bridge.
+        mac : str
+            The `mac` parameter is the MAC address of the bridge.
+
+        '''
+        with self.lock:
+            self.macs[ip] = mac
+
+    def stats(self) -> dict[str, dict]:
+        '''The function `stats` returns a snapshot of the metrics of every bridge.
+
+        Returns
+        -------
+            A dictionary mapping the IP address of every bridge to a dictionary with its "mac", its
+        "counters" and its "histograms". Every histogram is summarized by its "count", "sum", "mean",
+        "p50" and "p99" in seconds.
+
+        '''
+        with self.lock:
+            stats: dict[str, dict] = {}
+            for ip, bridge in self.bridges.items():
+                stats[ip] = {
+                    "mac": self.macs.get(ip),
+                    "counters": dict(bridge["counters"]),
+                    "histograms": {
+                        name: {
+                            "count": histogram.count,
+                            "sum": histogram.sum,
+                            "mean": histogram.sum / histogram.count if histogram.count else None,
+                            "p50": histogram.quantile(0.5),
+                            "p99": histogram.quantile(0.99),
+                        }
+                        for name, histogram in bridge["histograms"].items()
+                    },
+                }
+            return stats
+
+    def drain(self) -> dict[str, dict]:
+        '''The function `drain` returns the raw counters and histograms recorded since the last call and
+        resets them, so that they can be added to the metrics of another process with `merge`.
+
+        Returns
+        -------
+            A dictionary mapping the IP address of every bridge to a dictionary with its "counters" and
+        its "histograms". Every histogram is a `(counts, sum, count)` tuple of its buckets.
+
+        '''
+        with self.lock:
+            bridges: dict[str, dict] = self.bridges
+            self.bridges = {}
+        return {
+            ip: {
+                "counters": bridge["counters"],
+                "histograms": {
+                    name: (histogram.counts, histogram.sum, histogram.count)
+                    for name, histogram in bridge["histograms"].items()
+                },
+            }
+            for ip, bridge in bridges.items()
+        }
+
+    def merge(self, bridges: dict[str, dict]) -> None:
+        '''The function `merge` adds metrics returned by `drain` to these metrics. Both must use the same
+        buckets.
+
+        Parameters
+        ----------
+        bridges : dict[str, dict]
+            The `bridges` parameter is a dictionary returned by `drain`.
+
+        '''
+        with self.lock:
+            for ip, recorded in bridges.items():
+                bridge: dict = self.__get_bridge(ip)
+                for name, amount in recorded["counters"].items():
+                    bridge["counters"][name] += amount
+                for name, (counts, total, count) in recorded["histograms"].items():
+                    histogram: Histogram = bridge["histograms"][name]
+                    histogram.counts = [mine + theirs for mine, theirs in zip(histogram.counts, counts)]
+                    histogram.sum += total
+                    histogram.count += count
+
+    def export_prometheus(self) -> str:
+        '''The function `export_prometheus` renders the metrics of every bridge in the Prometheus text
+        exposition format, labelled with the IP address and, if known, the MAC address of the bridge.
+
+        Returns
+        -------
+            The metrics as text, ready to be served on a `/metrics` endpoint.
+
+        '''
+        lines: list[str] = []
+        with self.lock:
+            labels: dict[str, str] = {ip: self.__labels(ip) for ip in self.bridges}
+
+            for name, description in self.COUNTERS.items():
+                metric: str = f"{self.namespace}_{name}"
+                lines.append(f"# HELP {metric} {description}")
+                lines.append(f"# TYPE {metric} counter")
+                for ip, bridge in self.bridges.items():
+                    lines.append(f"{metric}{{{labels[ip]}}} {bridge['counters'][name]}")
+
+            for name, description in self.HISTOGRAMS.items():
+                metric = f"{self.namespace}_{name}"
+                lines.append(f"# HELP {metric} {description}")
+                lines.append(f"# TYPE {metric} histogram")
+                for ip, bridge in self.bridges.items():
+                    histogram: Histogram = bridge["histograms"][name]
+                    cumulative: int = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{metric}_bucket{{{labels[ip]},le="{bound}"}} {cumulative}')
+                    lines.append(f'{metric}_bucket{{{labels[ip]},le="+Inf"}} {histogram.count}')
+                    lines.append(f"{metric}_sum{{{labels[ip]}}} {histogram.sum}")
+                    lines.append(f"{metric}_count{{{labels[ip]}}} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def __get_bridge(self, ip: str) -> dict:
+        bridge: dict = self.bridges.get(ip)
+        if bridge is None:
+            bridge = {
+                "histograms": {name: Histogram(self.buckets) for name in self.HISTOGRAMS},
+                "counters": {name: 0 for name in self.COUNTERS},
+            }
+            self.bridges[ip] = bridge
+        return bridge
+
+    def __labels(self, ip: str) -> str:
+        labels: str = f'bridge="{ip}"'
+        if ip in self.macs:
+            labels += f',mac="{self.macs[ip]}"'
+        return labels
@@ -1,17 +1,53 @@
 
+import logging
 import socket
 import threading
 import time
-
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+from MilightController.Device import Device
+from MilightController.DeviceCache import DeviceCache
+from MilightController.DeviceIndex import DeviceIndex
+from MilightController.FanOut import FanOut
+from MilightController.Metrics import Metrics
+from MilightController.Packet import Packet
+from MilightController.PacketCapture import PacketCapture
+from MilightController.Payload import Payload
+from MilightController.RateLimiter import RateLimiter
+from MilightController.RttEstimator import RttEstimator
+from MilightController.SequenceSpace import SequenceSpace
+from MilightController.Session import Session
+from MilightController.Transport import Transport
 from MilightController.Zone import Zone
 
+logger: logging.Logger = logging.getLogger(__name__)
+
 
 # The `MilightController` class in Python provides functionality for network discovery and sending
 # commands to devices using UDP communication.
+#
+# A controller can be shared by any number of threads. Every bridge has its own `Session` with its own
+# socket and sequence numbers, and threads sending to the same bridge share the session without
+# waiting for each other, see `Session`.
 class MilightController:
     __PORT_v6: int = 5987
 
-    def __init__(self, port: int = 48899, address: str = "255.255.255.255", timeout: int = 3000) -> None:
+    def __init__(
+        self,
+        port: int = 48899,
+        address: str = "255.255.255.255",
+        timeout: int = 3000,
+        session_lifetime: int = 60000,
+        workers: int = 32,
+        retries: int = 3,
+        pacing: bool = True,
+        cache: str = None,
+        capture: PacketCapture = None,
+        metrics: Metrics = None,
+        transport: type[Transport] = None,
+    ) -> None:
         '''The function initializes attributes for a network discovery tool in Python.
         
         Parameters
@@ -28,6 +64,36 @@ class MilightController:
             The `timeout` parameter in the `__init__` method is used to specify the duration in
         milliseconds for which the program will wait for a response before timing out. In this case, the
         default value for `timeout` is set to 3000 milliseconds (3 seconds). This means that if
+        session_lifetime : int, optional
+            The `session_lifetime` parameter is the duration in milliseconds for which a session ID
+        obtained from a wifi-bridge is reused before a new handshake is made. The default value is set
+        to 60000 milliseconds (1 minute).
+        workers : int, optional
+            The `workers` parameter is the maximum number of wifi-bridges `fan_out` talks to at the same
+        time. Each bridge is handled by one worker thread of a pool shared by all `fan_out` calls.
+        retries : int, optional
+            The `retries` parameter is the number of times an unacknowledged command is retransmitted
+        before it is given up. Retransmissions use a timeout adapted to the measured round-trip time of
+        each bridge, bounded by `timeout`.
+        pacing : bool, optional
+            The `pacing` parameter enables the `RateLimiter` of every bridge, shared by all controllers
+        in the process. It spaces out packets so that bridges do not drop them, and tunes itself to the
+        fastest rate the bridge acknowledges reliably, so no sleeps are needed between commands.
+        cache : str, optional
+            The `cache` parameter is the path of a JSON file the discovered devices are persisted to, see
+        `DeviceCache`. With `discover(use_cache=True)` a restarted service gets its devices from the file
+        instead of waiting for a discovery.
+        capture : PacketCapture, optional
+            The `capture` parameter is a `PacketCapture` all packets exchanged with the wifi-bridges are
+        written to for offline debugging. The hexadecimal dumps of the packets are logged at the DEBUG
+        level of the `logging` module instead.
+        metrics : Metrics, optional
+            The `metrics` parameter is a `Metrics` the latencies of handshakes, commands and discovery
+        responses, and the number of retransmitted and lost packets of every bridge are recorded in.
+        transport : type[Transport], optional
+            The `transport` parameter is the `Transport` class every session sends and receives with.
+        `None` uses `MmsgTransport` where it is available, sending a window of packets with one system
+        call, and `Transport`, one system call per packet, otherwise.
         
         '''
         self.port: int = port
@@ -36,101 +102,229 @@ class MilightController:
         self.discovery_message_v6: bytes = (
             b"\x48\x46\x2D\x41\x31\x31\x41\x53\x53\x49\x53\x54\x48\x52\x45\x41\x44" 
         )
-        self.disco_results: list[dict[str, str]] = []
-        self.sequenceNumber: int = 0
-
-    def discover(self) -> list[dict[str, str]]:
+        # Discovered devices in the order they answered
+        self.disco_results: list[Device] = []
+        # Discovered devices keyed by MAC address and indexed by IP address, see `find_device`
+        self.devices: DeviceIndex = DeviceIndex()
+        self.cache: DeviceCache = None if cache is None else DeviceCache(cache)
+        self.session_lifetime: int = session_lifetime
+        self.sessions: dict[tuple[str, int], Session] = {}
+        self.workers: int = workers
+        self.retries: int = retries
+        self.pacing: bool = pacing
+        self.capture: PacketCapture = capture
+        self.metrics: Metrics = metrics
+        self.transport: type[Transport] = transport
+        self.executor: ThreadPoolExecutor = None
+        # Shared socket sending single commands to many bridges, see `fan_out`
+        self.shared: FanOut = None
+        # Guards the creation of sessions, of the executor and of the shared socket
+        self.lock: threading.Lock = threading.Lock()
+
+    def __enter__(self) -> "MilightController":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def discover(self, expected: int = None, use_cache: bool = False) -> list[Device]:
         '''The `discover` function in the provided Python code sends a discover request multiple times,
-        receives responses asynchronously, and returns a list of discovered devices.
+        collects the responses until the timeout expires, and returns a list of discovered devices.
+        
+        Parameters
+        ----------
+        expected : int, optional
+            The `expected` parameter is the number of devices to look for. Discovery returns as soon as
+        that many devices have answered instead of waiting for the whole timeout.
+        use_cache : bool, optional
+            The `use_cache` parameter makes `discover` return the devices stored in the `DeviceCache` of
+        the controller without sending a discover request, if the cache is not empty.
         
         Returns
         -------
-            A list of dictionaries containing information about discovered devices is being returned. If no
-        devices are discovered, `None` is returned.
+            A list of `Device` records describing the discovered devices is being returned. If no devices are
+        discovered, `None` is returned.
         
         '''
-        def receive():
-            while True:
-                data, _ = discoverer.recvfrom(1024)
-                self.__handle_message(data)
+        if use_cache and self.cache is not None and self.cache.devices:
+            return self.cache.values()
 
+        devices: list[Device] = list(self.discover_iter(expected))
+        logger.info("Discovered %d devices", len(devices))
+
+        if devices:
+            return devices
+        else:
+            return None
+
+    def discover_iter(self, expected: int = None) -> Iterator[Device]:
+        '''The generator `discover_iter` sends a discover request and yields every device as soon as it
+        answers. Devices are identified by their MAC address, so a device answering several requests is
+        yielded once. Discovered devices are also stored in `disco_results` and `devices`, and in the
+        `DeviceCache` of the controller, if any.
+        
+        Parameters
+        ----------
+        expected : int, optional
+            The `expected` parameter is the number of devices to look for. The generator stops as soon as
+        that many devices have answered, otherwise it stops when the timeout expires.
+        
+        Returns
+        -------
+            An iterator over the `Device` records of the discovered devices.
+        
+        '''
         discoverer: socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         discoverer.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         discoverer.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
         discoverer.bind(("0.0.0.0", self.port))
 
-        threading.Thread(target=receive, daemon=True).start()
-
+        found: dict[str, Device] = {}
+        started: float = time.monotonic()
         try:
             discoverer_attempts: int = 3
-            print(f"Sending discover request {discoverer_attempts} times")
-            
-            for _ in range(discoverer_attempts):
-                discoverer.sendto(self.discovery_message_v6, (self.host, self.port))
-                if self.disco_results:
-                    break
-                time.sleep(0.2)
+            logger.debug("Sending discover request up to %d times", discoverer_attempts)
 
-            time.sleep(self.timeout / 1000)
+            deadline: float = time.monotonic() + self.timeout / 1000
+            next_request: float = 0.0
+            while True:
+                # The request is repeated until the first device answers
+                now: float = time.monotonic()
+                if discoverer_attempts and not found and now >= next_request:
+                    discoverer.sendto(self.discovery_message_v6, (self.host, self.port))
+                    if self.capture is not None:
+                        self.capture.write(self.discovery_message_v6, ("0.0.0.0", self.port), (self.host, self.port))
+                    discoverer_attempts -= 1
+                    next_request = now + 0.2
+                    deadline = max(deadline, now + self.timeout / 1000)
+
+                remaining: float = deadline - now
+                if remaining <= 0:
+                    break
+                if discoverer_attempts and not found:
+                    remaining = min(remaining, next_request - now)
+
+                discoverer.settimeout(max(remaining, 0.001))
+                try:
+                    data, address = discoverer.recvfrom(1024)
+                except socket.timeout:
+                    continue
+                if self.capture is not None:
+                    self.capture.write(data, address, ("0.0.0.0", self.port))
+
+                device: Device = self.parse_device(data)
+                if device is None or device["mac"] in found:
+                    continue
+
+                found[device["mac"]] = device
+                self.__add_result(device)
+                if self.metrics is not None:
+                    self.metrics.set_mac(device["ip"], device["mac"])
+                    self.metrics.observe("discovery_response_seconds", device["ip"], time.monotonic() - started)
+                if self.cache is not None:
+                    self.cache.update(device)
+                yield device
+
+                if expected is not None and len(found) >= expected:
+                    break
         finally:
             discoverer.close()
+            if self.cache is not None and found:
+                self.cache.save()
 
-        print(f"Discovered {len(self.disco_results)} devices")
-
-        if self.disco_results:
-            return self.disco_results
-        else:
-            return None
+    def find_device(self, key: str) -> Device:
+        '''The function `find_device` looks a device up by its MAC or IP address among the discovered
+        devices, and among the devices of the `DeviceCache` if it was not discovered yet.
+        
+        Parameters
+        ----------
+        key : str
+            The `key` parameter is the MAC address, f.e. "AC:CF:23:00:00:01", or the IP address.
+        
+        Returns
+        -------
+            The `Device`, or `None` if no device has that address.
+        
+        '''
+        device: Device = self.devices.find(key)
+        if device is None and self.cache is not None:
+            device = self.cache.find(key)
+        return device
 
     def establish_session(self, udp_socket: socket, device: dict) -> tuple[str, str]:
-        '''This function establishes a session with a device using a UDP socket and retrieves the session
-        ID from the response.
+        '''This function establishes a session with a device and returns its session ID. It is kept for
+        compatibility and uses the cached `Session` of the device, see `get_session`.
         
         Parameters
         ----------
         udp_socket : socket
-            The `udp_socket` parameter in the `establish_session` method is expected to be a UDP socket
-        object that will be used to send and receive data over the network. It should be an instance of
-        the `socket` class in Python's socket module.
+            The `udp_socket` parameter is ignored, the session uses a socket of its own. It is kept so that
+        existing callers do not break.
         device : dict
             The `device` parameter is a dictionary containing information about the device. It should have
-        the following keys:
+        the keys "ip" and "port".
         
         Returns
         -------
             The function `establish_session` is returning a tuple containing two strings, which are the
-        values of `wb1` and `wb2` extracted from the response received after sending a command to get
-        the Wifi Bridge Session ID.
+        values of `wb1` and `wb2` of a valid session. A new handshake is only made if the session has
+        expired, and `socket.timeout` is raised if the bridge does not answer it.
         
         '''
-        # Send command to get Wifi Bridge Session ID
-        command = bytes.fromhex(
-            "20 00 00 00 16 02 62 3A D5 ED A3 01 AE 08 2D 46 61 41 A7 F6 DC AF D3 E6 00 00 1E"
-        )
-        udp_socket.sendto(command, (device.get("ip"), device.get("port")))
-        print("Sent reqest to get session ID:", self.__add_spaces_to_hex(command.hex()))
-
-        # Receive responses
-        while True:
-            data, _ = udp_socket.recvfrom(1024)
-            response = data.hex()
-            print("Got response: ", self.__add_spaces_to_hex(response))
+        return self.get_session(device).ensure()
 
-            # Extract WB1 and WB2 from the response
-            wb1 = response[38:40]
-            wb2 = response[40:42]
-            print("WB1:", wb1)
-            print("WB2:", wb2)
-
-            # Break the loop after receiving all responses
-            if len(data) < 28:
-                break
-
-        # Return session ID
-        return (wb1, wb2)
+    def get_session(self, device: dict) -> Session:
+        '''The function `get_session` returns the cached session of a device, creating a new one if the
+        device has not been contacted yet.
+        
+        Parameters
+        ----------
+        device : dict
+            The `device` parameter is a dictionary containing information about the device. It should have
+        the keys "ip" and "port".
+        
+        Returns
+        -------
+            The `Session` object bound to the device. The session keeps its socket and session ID for
+        its whole lifetime, so consecutive commands do not repeat the handshake.
+        
+        '''
+        address: tuple[str, int] = Device.address_of(device)
+        session: Session = self.sessions.get(address)
+        if session is None:
+            with self.lock:
+                session = self.sessions.get(address)
+                if session is None:
+                    limiter: RateLimiter = RateLimiter.for_bridge(address) if self.pacing else None
+                    session = Session(
+                        address, self.timeout, self.session_lifetime, self.retries, limiter, self.capture, self.metrics,
+                        None if self.transport is None else self.transport(),
+                    )
+                    self.sessions[address] = session
+        return session
+
+    def close(self) -> None:
+        '''The function `close` closes the sockets of all cached sessions and flushes the packet capture.
+        
+        '''
+        with self.lock:
+            executor: ThreadPoolExecutor = self.executor
+            self.executor = None
+            shared: FanOut = self.shared
+            self.shared = None
+            sessions: list[Session] = list(self.sessions.values())
+            self.sessions.clear()
+        if executor is not None:
+            executor.shutdown()
+        if shared is not None:
+            shared.close()
+        for session in sessions:
+            session.close()
+        if self.capture is not None:
+            self.capture.flush()
 
     # UDP Hex Send Format: 80 00 00 00 11 {WifiBridgeSessionID1} {WifiBridgeSessionID2} 00 {SequenceNumber} 00 {COMMAND} {ZONE NUMBER} 00 {Checksum}
-    def send_command(self, device: dict, command: str, zone: Zone = Zone.ALL) -> str:
+    def send_command(self, device: dict, command: str | bytes, zone: Zone = Zone.ALL) -> str:
         '''The function `send_command` sends a command to a device using UDP socket communication and
         returns the response in hexadecimal format.
         
@@ -140,11 +334,11 @@ class MilightController:
             The `device` parameter in the `send_command` method is expected to be a dictionary containing
         information about the device to which the command will be sent. It should have the keys "ip" and
         "port" to specify the IP address and port number of the device respectively.
-        command : str
+        command : str | bytes
             The `send_command` method you provided is used to send a command to a device over UDP and
-        receive a response. The `command` parameter in this method is a string that represents the
-        specific command you want to send to the device. This command could be any valid command that
-        the device understands and
+        receive a response. The `command` parameter in this method is either a string returned by one of
+        the `Commands` methods or a binary `Payload` returned by one of the `Payloads` methods. Payloads
+        are sent without any hex string parsing.
         zone : Zone
             The `zone` parameter in the `send_command` method is of type `Zone`, which is an enumeration.
         The `Zone` enumeration likely contains different zone values that can be used to specify a
@@ -155,118 +349,393 @@ class MilightController:
         -------
             The `send_command` method returns the response received from the device after sending the
         command. This response is in hexadecimal format and represents the device's acknowledgment or
-        response to the command that was sent.
+        response to the command that was sent. `socket.timeout` is raised if the command is not
+        acknowledged even after refreshing the session.
         
         '''
-        # Create UDP socket
-        udp_socket: socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-
-        # Establish connection and get session ID
-        wb1, wb2 = self.establish_session(udp_socket, device)
-
-        # Calculate sequence number
-        self.sequenceNumber = (self.sequenceNumber + 1) % 255
-        sn: str = "%02X" % self.sequenceNumber
-        
-        # Get zone code (default "00")
-        zone_hex: str = zone.value
-
-        # Generate packet
-        packet: str = "80 00 00 00 11 {} {} 00 {} 00 {} {} 00".format(wb1, wb2, sn, command, zone_hex)
-
-        # Calculate packet checksum
-        checksum: str = self.__calc_checksum(packet.strip(" "))
-
-        # Add checksum to the end of the packet
-        packet += checksum
+        session: Session = self.get_session(device)
+        commands: list[tuple[Payload, Zone]] = [(Payload.parse(command), zone)]
 
-        # Convert string to bytes
-        command: bytes = bytes.fromhex(packet)
+        established_at: float = session.established_at
+        response: str = self.__pipeline(session, commands, 1)[0]
 
-        # Send the command
-        udp_socket.sendto(command, (device.get("ip"), device.get("port")))
-        print("Sent request:", self.__add_spaces_to_hex(command.hex()))
+        if response is None:
+            # The bridge stopped acknowledging, the session ID has most likely expired
+            session.invalidate(established_at)
+            response = self.__pipeline(session, commands, 1)[0]
 
-        # Receive response
-        response, _ = udp_socket.recvfrom(1024)
-        response_hex: str = response.hex()
-        print("Received response:", self.__add_spaces_to_hex(response_hex))
+        if response is None:
+            if self.metrics is not None:
+                self.metrics.increment("timeouts_total", session.address[0])
+            raise socket.timeout(f"No acknowledgment from {session.address[0]}:{session.address[1]}")
 
-        # Close the socket
-        udp_socket.close()
+        return response
 
-        return response_hex
+    def send_commands(self, device: dict, commands: list[tuple[str | bytes, Zone]], window: int = 16) -> list[str]:
+        '''The function `send_commands` sends a batch of commands to a device, pipelining them onto a
+        single socket instead of waiting for each acknowledgment before sending the next command.
+        
+        Parameters
+        ----------
+        device : dict
+            The `device` parameter is a dictionary containing information about the device to which the
+        commands will be sent. It should have the keys "ip" and "port".
+        commands : list[tuple[str | bytes, Zone]]
+            The `commands` parameter is a list of `(command, zone)` tuples, where `command` is a string
+        generated by one of the `Commands` methods or a `Payload` generated by one of the `Payloads`
+        methods, and `zone` is the `Zone` it is addressed to. The commands are sent in the order they
+        are listed.
+        window : int, optional
+            The `window` parameter is the maximum number of commands sent but not yet acknowledged at
+        any time. It is limited to 256, the number of sequence numbers of a bridge, which are shared by
+        all threads sending to it.
+        
+        Returns
+        -------
+            A list with one entry per command, in the order of `commands`. Each entry is the response of
+        the bridge in hexadecimal format, or `None` if the command was not acknowledged within the retry
+        budget.
+        
+        '''
+        session: Session = self.get_session(device)
+        window = max(1, min(window, SequenceSpace.SIZE))
+
+        established_at: float = session.established_at
+        responses: list[str] = self.__pipeline(session, commands, window)
+
+        if commands and not any(responses):
+            # The bridge stopped acknowledging, the session ID has most likely expired
+            session.invalidate(established_at)
+            responses = self.__pipeline(session, commands, window)
+
+        return responses
+
+    def fan_out(
+        self,
+        devices: list[dict],
+        commands: str | bytes | list[tuple[str | bytes, Zone]] | dict[tuple[str, int], list[tuple[str | bytes, Zone]]],
+        zone: Zone = Zone.ALL,
+        window: int = 16,
+    ) -> dict[tuple[str, int], dict]:
+        '''The function `fan_out` sends a command, or a batch of commands, to many devices concurrently,
+        so that the whole operation takes about as long as the slowest bridge instead of the sum of all
+        of them. A single command is sent to all devices through one shared socket, see `FanOut`, and
+        devices that do not acknowledge it get a new session and another attempt, like `send_commands`.
+        
+        Parameters
+        ----------
+        devices : list[dict]
+            The `devices` parameter is a list of device dictionaries, as returned by `discover`.
+        commands : str | bytes | list[tuple[str | bytes, Zone]] | dict[tuple[str, int], list[tuple[str | bytes, Zone]]]
+            The `commands` parameter is either a single command generated by `Commands` or `Payloads`, a
+        list of `(command, zone)` tuples which is sent to every device with `send_commands`, or a
+        dictionary keyed by the `(ip, port)` address of every device holding its own list of tuples.
+        zone : Zone, optional
+            The `zone` parameter is the `Zone` a single command is addressed to. It is ignored when a list
+        of commands is passed.
+        window : int, optional
+            The `window` parameter is the maximum number of commands in flight per device, see
+        `send_commands`.
+        
+        Returns
+        -------
+            A dictionary keyed by the `(ip, port)` address of every device. Each value is a dictionary with the keys "device",
+        "responses" (the list returned by `send_commands`), "elapsed" (seconds spent on the device) and
+        "error" (the exception raised while talking to the device, or `None`).
+        
+        '''
+        if isinstance(commands, (str, bytes)):
+            commands = [(commands, zone)]
+
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="MilightController")
+            executor: ThreadPoolExecutor = self.executor
+            if self.shared is None:
+                self.shared = FanOut(
+                    self.retries, self.capture, self.metrics, None if self.transport is None else self.transport()
+                )
+            shared: FanOut = self.shared
+
+        if not isinstance(commands, dict) and len(commands) == 1 and len(devices) > 1:
+            shared_results: dict[tuple[str, int], dict] = self.__fan_out_shared(shared, executor, devices, *commands[0])
+            # `None` if another thread is using the shared socket
+            if shared_results is not None:
+                return shared_results
+
+        def send(device: dict) -> dict:
+            result: dict = {"device": device, "responses": None, "elapsed": None, "error": None}
+            start: float = time.perf_counter()
+            try:
+                batch: list[tuple[str | bytes, Zone]] = (
+                    commands[Device.address_of(device)] if isinstance(commands, dict) else commands
+                )
+                result["responses"] = self.send_commands(device, batch, window)
+            except Exception as error:
+                result["error"] = error
+            result["elapsed"] = time.perf_counter() - start
+            return result
+
+        results: dict[tuple[str, int], dict] = {}
+        for result in executor.map(send, devices):
+            results[Device.address_of(result["device"])] = result
+        return results
+
+    @staticmethod
+    def build_packet(wb1: str, wb2: str, sequence_number: int, command: str | bytes, zone: Zone) -> bytes:
+        '''The static function `build_packet` assembles a complete command packet including its
+        checksum.
+        
+        Parameters
+        ----------
+        wb1 : str
+            The first byte of the session ID in hexadecimal format.
+        wb2 : str
+            The second byte of the session ID in hexadecimal format.
+        sequence_number : int
+            The `sequence_number` parameter is the sequence number of the packet. The bridge echoes it in
+        its acknowledgment, which allows matching acknowledgments to packets.
+        command : str | bytes
+            The `command` parameter is a string generated by one of the `Commands` methods or a
+        `Payload` generated by one of the `Payloads` methods.
+        zone : Zone
+            The `zone` parameter is the `Zone` the command is addressed to.
+        
+        Returns
+        -------
+            The packet ready to be sent. Its sequence number is stored at index 8.
+        
+        '''
+        packet: Packet = Packet(int(wb1, 16), int(wb2, 16))
+        return bytes(packet.fill(sequence_number, Payload.parse(command), zone))
 
-    def __handle_message(self, message: bytes) -> None:
-        """
-        The function `__handle_message` decodes a message, extracts IP, MAC, and name information, and
-        appends a new device dictionary to a list if it is not already present.
-        
-        :param message: The `message` parameter in the `__handle_message` method is expected to be a
-        byte string containing information about a network device. The method decodes this byte string
-        as ASCII and splits it into a list using a comma as the delimiter. The decoded data is then used
-        to extract the IP address
-        :type message: bytes
-        """
-        data = message.decode("ascii").split(",")
+    @staticmethod
+    def parse_device(message: bytes) -> Device:
+        '''The static function `parse_device` decodes a discovery response and extracts IP, MAC, and
+        name information of the device that sent it.
+        
+        Parameters
+        ----------
+        message : bytes
+            The `message` parameter is a byte string containing comma separated information about a
+        network device, as sent by a wifi-bridge in response to the discovery request.
+        
+        Returns
+        -------
+            A `Device` describing the device, with its MAC address formatted like "AC:CF:23:00:00:01", or
+        `None` if the message is not a discovery response.
+        
+        '''
+        try:
+            data = message.decode("ascii").split(",")
+        except UnicodeDecodeError:
+            return None
         if len(data) >= 2:
             ip: str = data[0]
-            mac: str = "".join([f"{x:02X}:" for x in bytearray(data[1], "ascii")])[:-1]
-            name: str = data[2]
-            new_device: dict[str, str] = {
-                "ip": ip,
-                "port": self.__PORT_v6,
-                "mac": mac,
-                "name": name,
-                "type": "v6",
-            }
-            if new_device not in self.disco_results:
-                self.disco_results.append(new_device)
-
-    def __calc_checksum(self, hex_string: str) -> str:
+            # The MAC address is sent as 12 hexadecimal digits, f.e. "ACCF23000001"
+            mac: str = data[1].strip().upper()
+            if len(mac) == 12:
+                mac = ":".join(mac[index:index + 2] for index in range(0, 12, 2))
+            name: str = data[2] if len(data) > 2 else ""
+            return Device(ip, MilightController.__PORT_v6, mac, name, "v6")
+        return None
+
+    def __fan_out_shared(
+        self, shared: FanOut, executor: ThreadPoolExecutor, devices: list[dict], command: str | bytes, zone: Zone
+    ) -> dict[tuple[str, int], dict]:
+        start: float = time.perf_counter()
+        results: dict[tuple[str, int], dict] = {
+            Device.address_of(device): {"device": device, "responses": None, "elapsed": None, "error": None}
+            for device in devices
+        }
+
+        def establish(device: dict) -> Session:
+            try:
+                session: Session = self.get_session(device)
+                session.ensure()
+                return session
+            except Exception as error:
+                result: dict = results[Device.address_of(device)]
+                result["error"] = error
+                result["elapsed"] = time.perf_counter() - start
+                return None
+
+        sessions: list[Session] = [session for session in executor.map(establish, devices) if session is not None]
+        established_at: dict[tuple[str, int], float] = {session.address: session.established_at for session in sessions}
+        responses: dict[tuple[str, int], str] = shared.send(sessions, command, zone)
+        if responses is None:
+            return None
+
+        def retry(session: Session) -> None:
+            result: dict = results[session.address]
+            try:
+                # The bridge stopped acknowledging, the session ID has most likely expired
+                session.invalidate(established_at[session.address])
+                result["responses"] = self.__pipeline(session, [(command, zone)], 1)
+            except Exception as error:
+                result["error"] = error
+            result["elapsed"] = time.perf_counter() - start
+
+        elapsed: float = time.perf_counter() - start
+        for address, response in responses.items():
+            if response is not None:
+                results[address]["responses"] = [response]
+                results[address]["elapsed"] = elapsed
+        list(executor.map(retry, [session for session in sessions if responses[session.address] is None]))
+        return results
+
+    def __pipeline(self, session: Session, commands: list[tuple[str | bytes, Zone]], window: int) -> list[str]:
         """
-        The function calculates a checksum for a given hexadecimal string and appends it to the string.
-        
-        :param hex_string: The `hex_string` parameter is a string representing a sequence of hexadecimal
-        values. The function `__calc_checksum` calculates a checksum for the last 11 hex values in the
-        input string and appends it to the end of the string. If the input string is less than 22
-        characters long,
-        :type hex_string: str
-        :return: The function `__calc_checksum` returns the last 2 characters of the
-        `hex_string_with_checksum` variable, which represents the checksum calculated based on the input
-        `hex_string`.
+        The function `__pipeline` keeps up to `window` packets of a batch in flight and matches
+        acknowledgments back to the packets by their sequence number. Packets that are not acknowledged
+        within the retransmission timeout of the session are retransmitted, up to `self.retries` times,
+        while stale and duplicate acknowledgments are ignored. Several threads can pipeline on the same
+        session at once, every one of them only receives the acknowledgments of its own packets.
+        
+        :param session: The `Session` of the device the commands are sent to.
+        :type session: Session
+        :param commands: A list of `(command, zone)` tuples.
+        :type commands: list[tuple[str | bytes, Zone]]
+        :param window: The maximum number of unacknowledged packets in flight.
+        :type window: int
+        :return: A list with the response in hexadecimal format for every command, `None` for the
+        commands that were not acknowledged within the retry budget.
         """
-        if len(hex_string) >= 22:
-            # Each hex value is 2 characters, so 11 values means 22 characters
-            # Convert hex string to bytes
-            bytes_array: bytes = bytes.fromhex(hex_string)
-
-            # Calculate the modulo 256 checksum
-            checksum: int = sum(bytes_array[-11:]) % 256
-
-            # Append the checksum to the bytes array
-            bytes_array += bytes([checksum])
+        session.ensure()
+        payloads: list[tuple[Payload, Zone]] = [(Payload.parse(command), zone) for command, zone in commands]
+        # Packets are built when they are first sent, as sequence numbers are only reserved while in flight
+        packets: list[bytes] = [None] * len(payloads)
+        # A copy of the template of the session, so that threads do not overwrite each other's packets
+        template: Packet = Packet(session.packet.buffer[5], session.packet.buffer[6])
+        mailbox: deque = deque()
+        responses: list[str] = [None] * len(packets)
+        rtt: RttEstimator = session.rtt
+        limiter: RateLimiter = session.limiter
+        capture: PacketCapture = session.capture
+        # The hexadecimal dumps are only formatted if somebody reads them
+        debug: bool = logger.isEnabledFor(logging.DEBUG)
+
+        # Maps sequence number of every packet in flight to
+        # [index in `packets`, time sent, attempts, time first sent]
+        in_flight: dict[int, list] = {}
+        next_index: int = 0
+        # Metrics are collected locally and recorded once per batch
+        latencies: list[float] = []
+        retransmissions: int = 0
+        drops: int = 0
 
-            # Convert bytes back to hex string
-            hex_string_with_checksum: str = bytes_array.hex()
+        try:
+            while next_index < len(packets) or in_flight:
+                # Time until the rate limiter allows the next packet, 0 if it is not holding anything back
+                paced: float = 0.0
+                # Packets are sent together once all due packets are known
+                outgoing: list[bytes] = []
+
+                # Retransmit every packet whose timeout expired, or give it up once its retries are used
+                now: float = time.monotonic()
+                expired: bool = False
+                for sequence_number, entry in list(in_flight.items()):
+                    if now - entry[1] < rtt.rto:
+                        continue
+                    if entry[2] > self.retries:
+                        del in_flight[sequence_number]
+                        session.release(sequence_number)
+                        drops += 1
+                        expired = True
+                        continue
+                    if limiter is not None:
+                        paced = limiter.try_acquire()
+                        if paced > 0:
+                            break
+                    entry[1] = time.monotonic()
+                    entry[2] += 1
+                    retransmissions += 1
+                    outgoing.append(packets[entry[0]])
+                    if capture is not None:
+                        session.record(packets[entry[0]], True)
+                    if debug:
+                        logger.debug("Resent request: %s", packets[entry[0]].hex(" "))
+                    expired = True
+                if expired:
+                    rtt.backoff()
+                    if limiter is not None:
+                        limiter.on_loss()
+
+                while paced == 0 and next_index < len(packets) and len(in_flight) < window:
+                    # Other threads may hold the remaining sequence numbers of the bridge, which only
+                    # blocks while this thread has nothing in flight, as it would release numbers too
+                    sequence_number = session.reserve(mailbox, block=not in_flight)
+                    if sequence_number is None:
+                        break
+                    if limiter is not None:
+                        paced = limiter.try_acquire()
+                        if paced > 0:
+                            session.release(sequence_number)
+                            break
+                    packet: bytes = bytes(template.fill(sequence_number, *payloads[next_index]))
+                    packets[next_index] = packet
+                    outgoing.append(packet)
+                    sent: float = time.monotonic()
+                    in_flight[sequence_number] = [next_index, sent, 1, sent]
+                    if capture is not None:
+                        session.record(packet, True)
+                    if debug:
+                        logger.debug("Sent request: %s", packet.hex(" "))
+                    next_index += 1
+
+                if outgoing:
+                    session.transport.send(session.socket, outgoing, session.address)
+
+                # Wait for acknowledgments until the oldest packet in flight times out, or until the rate
+                # limiter allows sending the next packet
+                if not in_flight:
+                    if paced > 0:
+                        time.sleep(paced)
+                    continue
+                remaining: float = min(entry[1] for entry in in_flight.values()) + rtt.rto - time.monotonic()
+                if paced > 0:
+                    remaining = paced if remaining <= 0 else min(remaining, paced)
+                if remaining <= 0:
+                    continue
+
+                response: bytes = session.receive(mailbox, remaining)
+                if response is None:
+                    continue
+                if debug:
+                    logger.debug("Received response: %s", response.hex(" "))
+
+                # Acknowledgments of packets no longer in flight are stale or duplicate
+                entry: list = in_flight.pop(response[6], None)
+                if entry is not None:
+                    session.release(response[6])
+                    index, sent, attempts, first_sent = entry
+                    latencies.append(time.monotonic() - first_sent)
+                    if attempts == 1:
+                        rtt.sample(time.monotonic() - sent)
+                        if limiter is not None:
+                            limiter.on_ack()
+                    elif rtt.srtt is not None and time.monotonic() - sent >= rtt.srtt / 2:
+                        # The retransmission itself was acknowledged, not the late original
+                        rtt.restore()
+                    responses[index] = response.hex()
+        finally:
+            for sequence_number in in_flight:
+                session.release(sequence_number)
+
+        if self.metrics is not None:
+            ip: str = session.address[0]
+            self.metrics.increment("commands_total", ip, len(packets))
+            self.metrics.increment("acks_total", ip, len(latencies))
+            self.metrics.increment("retransmissions_total", ip, retransmissions)
+            self.metrics.increment("drops_total", ip, drops)
+            self.metrics.observe_many("command_latency_seconds", ip, latencies)
+
+        return responses
+
+    def __add_result(self, device: Device) -> None:
+        # A device answering with another IP address replaces its previous entry
+        previous: Device = self.devices.add(device)
+        if previous in self.disco_results:
+            self.disco_results[self.disco_results.index(previous)] = device
         else:
-            hex_string_with_checksum: str = hex_string
-
-        return hex_string_with_checksum[-2:]
-
-    def __add_spaces_to_hex(self, hex_string: str) -> str:
-        """
-        The function `__add_spaces_to_hex` takes a hexadecimal string and adds spaces between every two
-        characters.
-        
-        :param hex_string: Hexadecimal string that needs to have spaces added between every two
-        characters
-        :type hex_string: str
-        :return: The function `__add_spaces_to_hex` takes a hexadecimal string as input and returns the
-        same string with spaces added between every two characters.
-        """
-        # Using list comprehension to split the string into chunks of 2 characters
-        chunks = [hex_string[i : i + 2] for i in range(0, len(hex_string), 2)]
-        # Joining the chunks with a space between them
-        spaced_hex_string = " ".join(chunks)
-        return spaced_hex_string
+            self.disco_results.append(device)
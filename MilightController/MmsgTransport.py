@@ -0,0 +1,223 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import socket
+import struct
+import sys
+import threading
+
+from MilightController.Transport import Transport
+
+try:
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True) if sys.platform.startswith("linux") else None
+    sendmmsg = libc.sendmmsg
+    recvmmsg = libc.recvmmsg
+except (AttributeError, OSError, TypeError):
+    sendmmsg = recvmmsg = None
+
+
+# The `IoVector`, `MessageHeader` and `MmsgHeader` classes mirror `struct iovec`, `struct msghdr` and
+# `struct mmsghdr` of Linux.
+class IoVector(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class MessageHeader(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(IoVector)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class MmsgHeader(ctypes.Structure):
+    _fields_ = [("msg_hdr", MessageHeader), ("msg_len", ctypes.c_uint)]
+
+
+if sendmmsg is not None:
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    recvmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    recvmmsg.restype = ctypes.c_int
+
+
+# The `MmsgTransport` class is the `Transport` of Linux, which sends a whole window of packets with a
+# single `sendmmsg` call and drains every queued acknowledgment with a single `recvmmsg` call. The
+# message headers, buffers and address buffers of both directions are allocated once per transport.
+# Every message carries its own address, so `send_each` batches the packets of a command to many
+# bridges and `receive_from` tells the bridges' acknowledgments apart, see `FanOut`. Single datagrams
+# and addresses that are not IPv4 addresses take the path of `Transport`.
+class MmsgTransport(Transport):
+    # Number of datagrams per system call, size of a datagram slot and of a `struct sockaddr_in`
+    BATCH: int = 32
+    SLOT: int = 128
+    NAME: int = 16
+
+    def __init__(self, send_timeout: float = 1.0) -> None:
+        '''The function initializes the transport and preallocates its message headers and buffers. A
+        `OSError` is raised if `sendmmsg` and `recvmmsg` are not available, see `available`.
+
+        Parameters
+        ----------
+        send_timeout : float, optional
+            The `send_timeout` parameter is the longest number of seconds to wait for room in the send
+        buffer of a socket before `socket.timeout` is raised.
+
+        '''
+        if not self.available():
+            raise OSError(errno.ENOSYS, "sendmmsg and recvmmsg are only available on Linux")
+        super().__init__()
+        self.send_timeout: float = send_timeout
+        self.incoming: tuple = self.__allocate()
+        self.outgoing: tuple = self.__allocate()
+        self.names: dict[tuple[str, int], ctypes.Array] = {}
+        self.poller: select.poll = select.poll()
+        self.polled: int = None
+        # Guards the outgoing headers, as several threads can send at once
+        self.lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def available() -> bool:
+        '''The static function `available` checks whether the system provides `sendmmsg` and `recvmmsg`.
+
+        '''
+        return sendmmsg is not None and recvmmsg is not None
+
+    def send(self, sock: socket.socket, datagrams: list[bytes], address: tuple[str, int]) -> None:
+        '''The function `send` sends datagrams to the same address, in order, up to `BATCH` of them per
+        system call. See `Transport.send`.
+
+        '''
+        name: ctypes.Array = self.__name(address)
+        if len(datagrams) < 2 or name is None or any(len(datagram) > self.SLOT for datagram in datagrams):
+            super().send(sock, datagrams, address)
+            return
+        self.__send_batches(sock, [(datagram, name) for datagram in datagrams])
+
+    def send_each(self, sock: socket.socket, messages: list[tuple[bytes, tuple[str, int]]]) -> None:
+        '''The function `send_each` sends datagrams to different addresses, in order, up to `BATCH` of
+        them per system call. See `Transport.send_each`.
+
+        '''
+        named: list[tuple[bytes, ctypes.Array]] = [(datagram, self.__name(address)) for datagram, address in messages]
+        if len(named) < 2 or any(name is None or len(datagram) > self.SLOT for datagram, name in named):
+            super().send_each(sock, messages)
+            return
+        self.__send_batches(sock, named)
+
+    def receive(self, sock: socket.socket, timeout: float) -> list[bytes]:
+        '''The function `receive` waits for datagrams and returns every datagram queued by then, up to
+        `BATCH` of them. See `Transport.receive`.
+
+        '''
+        headers, _, slots, _, _ = self.incoming
+        count: int = self.__receive(sock, timeout)
+        return [ctypes.string_at(slots[index], headers[index].msg_len) for index in range(count)]
+
+    def receive_from(self, sock: socket.socket, timeout: float) -> list[tuple[bytes, tuple[str, int]]]:
+        '''The function `receive_from` waits for datagrams and returns every datagram queued by then, up
+        to `BATCH` of them, with the addresses they were sent from. See `Transport.receive_from`.
+
+        '''
+        headers, _, slots, _, names = self.incoming
+        received: list[tuple[bytes, tuple[str, int]]] = []
+        for index in range(self.__receive(sock, timeout)):
+            # struct sockaddr_in: family in host order, port in network order, address
+            name: bytes = ctypes.string_at(names[index], 8)
+            address: tuple[str, int] = (socket.inet_ntoa(name[4:8]), struct.unpack_from("!H", name, 2)[0])
+            received.append((ctypes.string_at(slots[index], headers[index].msg_len), address))
+        return received
+
+    def __receive(self, sock: socket.socket, timeout: float) -> int:
+        descriptor: int = sock.fileno()
+        if self.polled != descriptor:
+            if self.polled is not None:
+                self.poller.unregister(self.polled)
+            self.poller.register(descriptor, select.POLLIN)
+            self.polled = descriptor
+        if not self.poller.poll(max(0, timeout * 1000)):
+            return 0
+
+        headers: ctypes.Array = self.incoming[0]
+        # The kernel overwrites the address lengths of the messages it fills
+        for index in range(self.BATCH):
+            headers[index].msg_hdr.msg_namelen = self.NAME
+        count: int = recvmmsg(descriptor, ctypes.addressof(headers), self.BATCH, socket.MSG_DONTWAIT, None)
+        if count < 0:
+            error: int = ctypes.get_errno()
+            if error in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return 0
+            raise OSError(error, os.strerror(error))
+        return count
+
+    def __send_batches(self, sock: socket.socket, messages: list[tuple[bytes, ctypes.Array]]) -> None:
+        headers, vectors, slots, _, _ = self.outgoing
+        with self.lock:
+            for start in range(0, len(messages), self.BATCH):
+                chunk: list[tuple[bytes, ctypes.Array]] = messages[start:start + self.BATCH]
+                for index, (datagram, name) in enumerate(chunk):
+                    ctypes.memmove(slots[index], datagram, len(datagram))
+                    vectors[index].iov_len = len(datagram)
+                    header: MessageHeader = headers[index].msg_hdr
+                    header.msg_name = ctypes.addressof(name)
+                    header.msg_namelen = len(name)
+                self.__send_all(sock, len(chunk))
+
+    def __send_all(self, sock: socket.socket, count: int) -> None:
+        headers: ctypes.Array = self.outgoing[0]
+        sent: int = 0
+        while sent < count:
+            result: int = sendmmsg(
+                sock.fileno(), ctypes.addressof(headers) + sent * ctypes.sizeof(MmsgHeader), count - sent, 0
+            )
+            if result >= 0:
+                sent += result
+                continue
+            error: int = ctypes.get_errno()
+            if error in (errno.EAGAIN, errno.EWOULDBLOCK):
+                # The send buffer of the socket is full
+                if not select.select([], [sock], [], self.send_timeout)[1]:
+                    raise socket.timeout("Timed out waiting to send")
+            elif error != errno.EINTR:
+                raise OSError(error, os.strerror(error))
+
+    def __name(self, address: tuple[str, int]) -> ctypes.Array:
+        name: ctypes.Array = self.names.get(address)
+        if name is None:
+            try:
+                packed: bytes = socket.inet_aton(address[0])
+            except OSError:
+                return None
+            # struct sockaddr_in: family in host order, port in network order, address and padding
+            name = ctypes.create_string_buffer(
+                struct.pack("=H", socket.AF_INET) + struct.pack("!H", address[1]) + packed + bytes(8), self.NAME
+            )
+            self.names[address] = name
+        return name
+
+    def __allocate(self) -> tuple:
+        '''This method allocates `BATCH` message headers, each with one I/O vector pointing to a slot of
+        `SLOT` bytes and an address buffer of `NAME` bytes.
+
+        '''
+        headers: ctypes.Array = (MmsgHeader * self.BATCH)()
+        vectors: ctypes.Array = (IoVector * self.BATCH)()
+        buffer: ctypes.Array = ctypes.create_string_buffer(self.BATCH * (self.SLOT + self.NAME))
+        slots: list[int] = [ctypes.addressof(buffer) + index * self.SLOT for index in range(self.BATCH)]
+        # The address buffers follow the slots
+        names: list[int] = [slots[-1] + self.SLOT + index * self.NAME for index in range(self.BATCH)]
+        for index in range(self.BATCH):
+            vectors[index].iov_base = slots[index]
+            vectors[index].iov_len = self.SLOT
+            headers[index].msg_hdr.msg_iov = ctypes.pointer(vectors[index])
+            headers[index].msg_hdr.msg_iovlen = 1
+            headers[index].msg_hdr.msg_name = names[index]
+            headers[index].msg_hdr.msg_namelen = self.NAME
+        # The buffer is kept with the headers, as they point into it
+        return headers, vectors, slots, buffer, names
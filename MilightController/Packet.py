@@ -0,0 +1,87 @@
+
+from MilightController.Zone import Zone
+
+
+# The `Packet` class is a preallocated command packet template. The session ID is written once per
+# session, while the sequence number, payload, zone and checksum are patched in place for every command.
+#
+# Layout: 80 00 00 00 11 {WB1} {WB2} 00 {SequenceNumber} 00 {COMMAND} {ZONE NUMBER} 00 {Checksum}
+class Packet:
+    HEADER: bytes = b"\x80\x00\x00\x00\x11"
+    LENGTH: int = 22
+    ZONES: dict[Zone, int] = {zone: int(zone.value, 16) for zone in Zone}
+
+    def __init__(self, wb1: int = 0, wb2: int = 0) -> None:
+        '''The function allocates the packet buffer and writes the constant header into it.
+
+        Parameters
+        ----------
+        wb1 : int, optional
+            The first byte of the session ID.
+        wb2 : int, optional
+            The second byte of the session ID.
+
+        '''
+        self.buffer: bytearray = bytearray(self.LENGTH)
+        self.buffer[0:5] = self.HEADER
+        self.view: memoryview = memoryview(self.buffer)
+        self.set_session(wb1, wb2)
+
+    def set_session(self, wb1: int, wb2: int) -> None:
+        '''The function `set_session` writes the session ID into the packet template.
+
+        Parameters
+        ----------
+        wb1 : int
+            The first byte of the session ID.
+        wb2 : int
+            The second byte of the session ID.
+
+        '''
+        self.buffer[5] = wb1
+        self.buffer[6] = wb2
+
+    def fill(self, sequence_number: int, payload: bytes, zone: Zone) -> memoryview:
+        '''The function `fill` patches a command into the packet template and calculates its checksum.
+
+        Parameters
+        ----------
+        sequence_number : int
+            The `sequence_number` parameter is the sequence number of the packet, in the range 0-255.
+        payload : bytes
+            The `payload` parameter is the 9 byte command, f.e. a `Payload` returned by `Payloads`.
+        zone : Zone
+            The `zone` parameter is the `Zone` the command is addressed to.
+
+        Returns
+        -------
+            A view of the packet buffer, ready to be sent. The view is overwritten by the next call, so
+        it has to be copied with `bytes()` if the packet is kept.
+
+        '''
+        buffer: bytearray = self.buffer
+        zone_code: int = self.ZONES[zone]
+        buffer[8] = sequence_number
+        buffer[10:19] = payload
+        buffer[19] = zone_code
+
+        # Modulo 256 checksum of the last 11 bytes, the byte before the checksum is always 0
+        buffer[21] = (sum(payload) + zone_code) & 0xFF
+        return self.view
+
+    @staticmethod
+    def checksum(packet: bytes) -> int:
+        '''The static function `checksum` calculates the checksum of a complete packet, as it is
+        expected by the bridge in the last byte.
+
+        Parameters
+        ----------
+        packet : bytes
+            The `packet` parameter is a command packet with or without its checksum byte.
+
+        Returns
+        -------
+            The modulo 256 sum of the 11 bytes preceding the checksum.
+
+        '''
+        return sum(packet[10:21]) & 0xFF
@@ -0,0 +1,123 @@
+
+import io
+import socket
+import struct
+import threading
+import time
+
+
+# The `PacketCapture` class writes every packet exchanged with the wifi-bridges to a file in the pcap
+# format, so that traffic can be inspected offline with tcpdump or Wireshark. Packets are stored with
+# synthesized IPv4 and UDP headers (link type RAW), as only their payload is known to the controller.
+class PacketCapture:
+    LINKTYPE_RAW: int = 101
+    __GLOBAL_HEADER: struct.Struct = struct.Struct("<IHHiIII")
+    __RECORD_HEADER: struct.Struct = struct.Struct("<IIII")
+    __IP_HEADER: struct.Struct = struct.Struct("!BBHHHBBH4s4s")
+    __UDP_HEADER: struct.Struct = struct.Struct("!HHHH")
+
+    def __init__(self, path: str = None) -> None:
+        '''The function initializes the capture and writes the pcap header to a new file.
+
+        Parameters
+        ----------
+        path : str, optional
+            The `path` parameter is the path of the capture file. An existing file is overwritten. With
+        `None` the packets are kept in memory until they are taken with `drain`.
+
+        '''
+        self.path: str = path
+        self.lock: threading.Lock = threading.Lock()
+        if path is None:
+            self.file = io.BytesIO()
+        else:
+            self.file = open(path, "wb")
+            self.file.write(self.__GLOBAL_HEADER.pack(0xA1B2C3D4, 2, 4, 0, 0, 65535, self.LINKTYPE_RAW))
+
+    def __enter__(self) -> "PacketCapture":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def write(self, data: bytes, source: tuple[str, int], destination: tuple[str, int]) -> None:
+        '''The function `write` appends a single UDP datagram to the capture.
+
+        Parameters
+        ----------
+        data : bytes
+            The `data` parameter is the payload of the datagram.
+        source : tuple[str, int]
+            The `source` parameter is the IP address and port number the datagram was sent from.
+        destination : tuple[str, int]
+            The `destination` parameter is the IP address and port number the datagram was sent to.
+
+        '''
+        udp: bytes = self.__UDP_HEADER.pack(source[1], destination[1], 8 + len(data), 0)
+        ip: bytearray = bytearray(
+            self.__IP_HEADER.pack(
+                0x45, 0, 28 + len(data), 0, 0, 64, socket.IPPROTO_UDP, 0,
+                socket.inet_aton(source[0]), socket.inet_aton(destination[0]),
+            )
+        )
+        struct.pack_into("!H", ip, 10, self.__ip_checksum(ip))
+
+        timestamp: float = time.time()
+        length: int = len(ip) + len(udp) + len(data)
+        record: bytes = self.__RECORD_HEADER.pack(
+            int(timestamp), int(timestamp % 1 * 1_000_000), length, length
+        )
+
+        with self.lock:
+            if not self.file.closed:
+                self.file.write(b"".join((record, ip, udp, data)))
+
+    def drain(self) -> bytes:
+        '''The function `drain` takes the packets kept in memory by a capture without a file, so that
+        they can be written to the capture of another process with `append`.
+
+        Returns
+        -------
+            The pcap records of the packets written since the last call.
+
+        '''
+        with self.lock:
+            records: bytes = self.file.getvalue()
+            self.file.seek(0)
+            self.file.truncate()
+        return records
+
+    def append(self, records: bytes) -> None:
+        '''The function `append` writes pcap records returned by `drain` to the capture.
+
+        Parameters
+        ----------
+        records : bytes
+            The `records` parameter is the pcap records.
+
+        '''
+        with self.lock:
+            if not self.file.closed:
+                self.file.write(records)
+
+    def flush(self) -> None:
+        '''The function `flush` writes the buffered packets to the file.
+
+        '''
+        with self.lock:
+            if not self.file.closed:
+                self.file.flush()
+
+    def close(self) -> None:
+        '''The function `close` flushes and closes the capture file.
+
+        '''
+        with self.lock:
+            self.file.close()
+
+    @staticmethod
+    def __ip_checksum(header: bytes) -> int:
+        total: int = sum(struct.unpack(f"!{len(header) // 2}H", header))
+        while total > 0xFFFF:
+            total = (total & 0xFFFF) + (total >> 16)
+        return ~total & 0xFFFF
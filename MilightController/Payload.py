@@ -0,0 +1,51 @@
+
+# The `Payload` class is an immutable 9 byte command payload, the binary counterpart of the hex strings
+# returned by `Commands`. Its string form is the spaced hex representation used by `Commands`.
+class Payload(bytes):
+    LENGTH: int = 9
+
+    def __new__(cls, data=bytes(LENGTH)) -> "Payload":
+        '''The function creates a payload from any bytes-like object or iterable of integers.
+
+        Parameters
+        ----------
+        data
+            The `data` parameter holds the 9 bytes of the command, f.e. `b"\\x31\\x00\\x00\\x08\\x04\\x01\\x00\\x00\\x00"`.
+        Use `Payload.fromhex` to create a payload from a string returned by `Commands`.
+
+        Returns
+        -------
+            The new `Payload`. A `ValueError` is raised if `data` is not exactly 9 bytes long.
+
+        '''
+        payload = super().__new__(cls, data)
+        if len(payload) != cls.LENGTH:
+            raise ValueError(f"Command payload must be {cls.LENGTH} bytes long, got {len(payload)}")
+        return payload
+
+    @classmethod
+    def parse(cls, command: "str | bytes") -> "Payload":
+        '''The class method `parse` converts a command to a `Payload`. Payloads are returned as they are,
+        strings generated by `Commands` are parsed from hex and other bytes-like objects are copied.
+
+        Parameters
+        ----------
+        command : str | bytes
+            The `command` parameter is a command generated by `Commands` or `Payloads`.
+
+        Returns
+        -------
+            The command as a 9 byte `Payload`.
+
+        '''
+        if isinstance(command, cls):
+            return command
+        if isinstance(command, str):
+            return cls.fromhex(command)
+        return cls(command)
+
+    def __str__(self) -> str:
+        return self.hex(" ").upper()
+
+    def __repr__(self) -> str:
+        return f"Payload('{self}')"
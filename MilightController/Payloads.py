@@ -0,0 +1,542 @@
+
+from functools import lru_cache
+
+from MilightController.Payload import Payload
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# The `Payloads` class provides static methods for generating binary command payloads. It is the
+# binary counterpart of `Commands` and is meant for the hot path, as no hex strings are formatted or
+# parsed. Every method returns an immutable 9 byte `Payload`. Payloads of levels, colors and color
+# temperatures are precomputed, so encoding a command is a table lookup.
+class Payloads:
+    __LIGHT_ON: Payload = Payload(b"\x31\x00\x00\x08\x04\x01\x00\x00\x00")
+    __LIGHT_OFF: Payload = Payload(b"\x31\x00\x00\x08\x04\x02\x00\x00\x00")
+    __NIGHT_LIGHT_ON: Payload = Payload(b"\x31\x00\x00\x08\x04\x05\x00\x00\x00")
+    __WHITE_LIGHT_ON: Payload = Payload(b"\x31\x00\x00\x08\x05\x64\x00\x00\x00")
+    __MODE_SPEED_DECREASE: Payload = Payload(b"\x31\x00\x00\x08\x04\x04\x00\x00\x00")
+    __MODE_SPEED_INCREASE: Payload = Payload(b"\x31\x00\x00\x08\x04\x03\x00\x00\x00")
+    __LINK: Payload = Payload(b"\x3D\x00\x00\x08\x00\x00\x00\x00\x00")
+    __UNLINK: Payload = Payload(b"\x3E\x00\x00\x08\x00\x00\x00\x00\x00")
+    __WIFI_BRIDGE_LAMP_ON: Payload = Payload(b"\x31\x00\x00\x00\x03\x03\x00\x00\x00")
+    __WIFI_BRIDGE_LAMP_OFF: Payload = Payload(b"\x31\x00\x00\x00\x03\x04\x00\x00\x00")
+    __WIFI_BRIDGE_MODE_SPEED_DECREASE: Payload = Payload(b"\x31\x00\x00\x00\x03\x01\x00\x00\x00")
+    __WIFI_BRIDGE_MODE_SPEED_INCREASE: Payload = Payload(b"\x31\x00\x00\x00\x03\x02\x00\x00\x00")
+    __WIFI_BRIDGE_SET_COLOR_TO_WHITE: Payload = Payload(b"\x31\x00\x00\x00\x03\x05\x00\x00\x00")
+
+    # Byte representation of every percentage 0-100 and every Kelvin value 2700-6500
+    __PERCENTAGE_BYTES: tuple[int, ...] = tuple(int(percent / 100 * 100) for percent in range(101))
+    __KELVIN_BYTES: tuple[int, ...] = tuple(
+        max(0, min(100, int((KV - 2700) / (6500 - 2700) * 100))) for KV in range(2700, 6501)
+    )
+
+    # Payloads indexed by brightness, saturation, Kelvin byte and hue respectively
+    __BRIGHTNESS: tuple[Payload, ...] = tuple(
+        Payload((0x31, 0x00, 0x00, 0x08, 0x03, level, 0x00, 0x00, 0x00)) for level in __PERCENTAGE_BYTES
+    )
+    __SATURATION: tuple[Payload, ...] = tuple(
+        Payload((0x31, 0x00, 0x00, 0x08, 0x02, level, 0x00, 0x00, 0x00)) for level in __PERCENTAGE_BYTES[::-1]
+    )
+    __WIFI_BRIDGE_BRIGHTNESS: tuple[Payload, ...] = tuple(
+        Payload((0x31, 0x00, 0x00, 0x00, 0x02, level, 0x00, 0x00, 0x00)) for level in __PERCENTAGE_BYTES
+    )
+    __KELVIN: tuple[Payload, ...] = tuple(
+        Payload((0x31, 0x00, 0x00, 0x08, 0x05, temp, 0x00, 0x00, 0x00)) for temp in range(101)
+    )
+    __COLOR: tuple[Payload, ...] = tuple(
+        Payload((0x31, 0x00, 0x00, 0x08, 0x01, hue, hue, hue, hue)) for hue in range(256)
+    )
+    __WIFI_BRIDGE_COLOR: tuple[Payload, ...] = tuple(
+        Payload((0x31, 0x00, 0x00, 0x00, 0x01, hue, hue, hue, hue)) for hue in range(256)
+    )
+
+    @staticmethod
+    def light_on() -> Payload:
+        '''The static function `light_on` returns the payload of a command to turn lights on.
+
+        Returns
+        -------
+            31 00 00 08 04 01 00 00 00
+
+        '''
+        return Payloads.__LIGHT_ON
+
+    @staticmethod
+    def light_off() -> Payload:
+        '''The static function `light_off` returns the payload of a command to turn lights off.
+
+        Returns
+        -------
+            31 00 00 08 04 02 00 00 00
+
+        '''
+        return Payloads.__LIGHT_OFF
+
+    @staticmethod
+    def night_light_on() -> Payload:
+        '''The static function `night_light_on` returns the payload of a command to turn on night light.
+
+        Returns
+        -------
+            31 00 00 08 04 05 00 00 00
+
+        '''
+        return Payloads.__NIGHT_LIGHT_ON
+
+    @staticmethod
+    def white_light_on() -> Payload:
+        '''The static function `white_light_on` returns the payload of a command to turn on white mode
+        (Color RGB OFF).
+
+        Returns
+        -------
+            31 00 00 08 05 64 00 00 00
+
+        '''
+        return Payloads.__WHITE_LIGHT_ON
+
+    @staticmethod
+    def set_color(color: str) -> Payload:
+        '''The static function `set_color` returns the payload of a command to set color to passed hex
+        value.
+
+        Parameters
+        ----------
+        color : str
+            The `color` parameter is a hexadecimal color value, accepted in the same formats as by
+        `Commands.set_color`.
+
+        Returns
+        -------
+            31 00 00 08 01 {color} {color} {color} {color}
+
+        '''
+        return Payloads.__COLOR[Payloads.__hex_to_hue(color)]
+
+    @staticmethod
+    def saturation(saturation: int) -> Payload:
+        '''The static function `saturation` returns the payload of a command to set saturation to passed
+        level. Any value smaller than 0 and bigger than 100 will be set to 0 or 100 respectively.
+
+        Returns
+        -------
+            31 00 00 08 02 {saturation} 00 00 00
+
+        '''
+        # Ensure percent is within [0, 100] range
+        saturation = max(0, min(100, saturation))
+        if isinstance(saturation, int):
+            return Payloads.__SATURATION[saturation]
+        saturation = Payloads.__percentage_to_byte(100 - saturation)
+        return Payload((0x31, 0x00, 0x00, 0x08, 0x02, saturation, 0x00, 0x00, 0x00))
+
+    @staticmethod
+    def brightness(brightness: int) -> Payload:
+        '''The static function `brightness` returns the payload of a command to set brightness to passed
+        level. Any value smaller than 0 and bigger than 100 will be set to 0 or 100 respectively.
+
+        Returns
+        -------
+            31 00 00 08 03 {brightness} 00 00 00
+
+        '''
+        # Ensure percent is within [0, 100] range
+        brightness = max(0, min(100, brightness))
+        if isinstance(brightness, int):
+            return Payloads.__BRIGHTNESS[brightness]
+        brightness = Payloads.__percentage_to_byte(brightness)
+        return Payload((0x31, 0x00, 0x00, 0x08, 0x03, brightness, 0x00, 0x00, 0x00))
+
+    @staticmethod
+    def kelvin(temp: int) -> Payload:
+        '''The static function `kelvin` returns the payload of a command to change color to white with
+        passed color temperature in the range of 2700 to 6500.
+
+        Returns
+        -------
+            31 00 00 08 05 {temp} 00 00 00
+
+        '''
+        if isinstance(temp, int):
+            return Payloads.__KELVIN[Payloads.__KELVIN_BYTES[max(0, min(3800, temp - 2700))]]
+        return Payloads.__KELVIN[Payloads.__KV_to_byte(temp)]
+
+    @staticmethod
+    def mode_number(mode_number: int) -> Payload:
+        '''The static function `mode_number` returns the payload of a command to change mode.
+
+        Returns
+        -------
+            31 00 00 08 06 {mode} 00 00 00
+
+        '''
+        return Payload((0x31, 0x00, 0x00, 0x08, 0x06, mode_number, 0x00, 0x00, 0x00))
+
+    @staticmethod
+    def mode_speed_decrease() -> Payload:
+        '''The static function `mode_speed_decrease` returns the payload of a command to decrease speed
+        of mode animation.
+
+        Returns
+        -------
+            31 00 00 08 04 04 00 00 00
+
+        '''
+        return Payloads.__MODE_SPEED_DECREASE
+
+    @staticmethod
+    def mode_speed_increase() -> Payload:
+        '''The static function `mode_speed_increase` returns the payload of a command to increase speed
+        of mode animation.
+
+        Returns
+        -------
+            31 00 00 08 04 03 00 00 00
+
+        '''
+        return Payloads.__MODE_SPEED_INCREASE
+
+    @staticmethod
+    def link() -> Payload:
+        '''The static function `link` returns the payload of a command to link.
+
+        Returns
+        -------
+            3D 00 00 08 00 00 00 00 00
+
+        '''
+        return Payloads.__LINK
+
+    @staticmethod
+    def unlink() -> Payload:
+        '''The static function `unlink` returns the payload of a command to unlink.
+
+        Returns
+        -------
+            3E 00 00 08 00 00 00 00 00
+
+        '''
+        return Payloads.__UNLINK
+
+    @staticmethod
+    def wifi_bridge_lamp_on() -> Payload:
+        '''The static function `wifi_bridge_lamp_on` returns the payload of a command to turn on a
+        Wi-Fi bridge lamp.
+
+        Returns
+        -------
+            31 00 00 00 03 03 00 00 00
+
+        '''
+        return Payloads.__WIFI_BRIDGE_LAMP_ON
+
+    @staticmethod
+    def wifi_bridge_lamp_off() -> Payload:
+        '''The static function `wifi_bridge_lamp_off` returns the payload of a command to turn off a
+        Wi-Fi bridge lamp.
+
+        Returns
+        -------
+            31 00 00 00 03 04 00 00 00
+
+        '''
+        return Payloads.__WIFI_BRIDGE_LAMP_OFF
+
+    @staticmethod
+    def wifi_bridge_mode_number(mode_number: int) -> Payload:
+        '''The static function `wifi_bridge_mode_number` returns the payload of a command to change
+        Wi-Fi bridge mode.
+
+        Returns
+        -------
+            31 00 00 00 04 {mode} 00 00 00
+
+        '''
+        return Payload((0x31, 0x00, 0x00, 0x00, 0x04, mode_number, 0x00, 0x00, 0x00))
+
+    @staticmethod
+    def wifi_bridge_mode_speed_decrease() -> Payload:
+        '''The static function `wifi_bridge_mode_speed_decrease` returns the payload of a command to
+        decrease speed of Wi-Fi bridge mode animation.
+
+        Returns
+        -------
+            31 00 00 00 03 01 00 00 00
+
+        '''
+        return Payloads.__WIFI_BRIDGE_MODE_SPEED_DECREASE
+
+    @staticmethod
+    def wifi_bridge_mode_speed_increase() -> Payload:
+        '''The static function `wifi_bridge_mode_speed_increase` returns the payload of a command to
+        increase speed of Wi-Fi bridge mode animation.
+
+        Returns
+        -------
+            31 00 00 00 03 02 00 00 00
+
+        '''
+        return Payloads.__WIFI_BRIDGE_MODE_SPEED_INCREASE
+
+    @staticmethod
+    def wifi_bridge_set_color(color: str) -> Payload:
+        '''The static function `wifi_bridge_set_color` returns the payload of a command to set Wi-Fi
+        bridge lamp's color to passed hex value.
+
+        Returns
+        -------
+            31 00 00 00 01 {color} {color} {color} {color}
+
+        '''
+        return Payloads.__WIFI_BRIDGE_COLOR[Payloads.__hex_to_hue(color)]
+
+    @staticmethod
+    def wifi_bridge_set_color_to_white() -> Payload:
+        '''The static function `wifi_bridge_set_color_to_white` returns the payload of a command to set
+        Wi-Fi bridge color to white. (works ONLY when the lamp is ON)
+
+        Returns
+        -------
+            31 00 00 00 03 05 00 00 00
+
+        '''
+        return Payloads.__WIFI_BRIDGE_SET_COLOR_TO_WHITE
+
+    @staticmethod
+    def wifi_bridge_brightness(brightness: int) -> Payload:
+        '''The static function `wifi_bridge_brightness` returns the payload of a command to set Wi-Fi
+        bridge brightness to passed value. Any value smaller than 0 and bigger than 100 will be set to 0
+        or 100 respectively.
+
+        Returns
+        -------
+            31 00 00 00 02 {brightness} 00 00 00
+
+        '''
+        brightness = max(0, min(100, brightness))
+        if isinstance(brightness, int):
+            return Payloads.__WIFI_BRIDGE_BRIGHTNESS[brightness]
+        brightness = Payloads.__percentage_to_byte(brightness)
+        return Payload((0x31, 0x00, 0x00, 0x00, 0x02, brightness, 0x00, 0x00, 0x00))
+
+    @staticmethod
+    def hues(colors) -> "numpy.ndarray":
+        '''The static function `hues` converts an array of RGB colors to hue values in the range 0-255
+        in one vectorized call. It requires NumPy.
+
+        Parameters
+        ----------
+        colors
+            The `colors` parameter is an array-like of shape (..., 3) holding the red, green and blue
+        components of the colors in the range 0-255.
+
+        Returns
+        -------
+            An array of `uint8` hue values with the shape of `colors` without its last axis, equal to
+        the hues used by `set_color`.
+
+        '''
+        Payloads.__require_numpy()
+
+        rgb = numpy.asarray(colors, dtype=numpy.float64) / 255
+        r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+
+        max_val = rgb.max(axis=-1)
+        delta = max_val - rgb.min(axis=-1)
+        divisor = numpy.where(delta == 0, 1, delta)
+
+        hue = numpy.where(
+            max_val == r,
+            ((g - b) / divisor) % 6,
+            numpy.where(max_val == g, ((b - r) / divisor) + 2, ((r - g) / divisor) + 4),
+        )
+        hue = numpy.where(delta == 0, 0, hue) * 60
+
+        return (hue / 360 * 255).astype(numpy.uint8)
+
+    @staticmethod
+    def set_color_many(colors) -> "numpy.ndarray":
+        '''The static function `set_color_many` encodes the payloads of `set_color` commands for an
+        array of RGB colors in one vectorized call. It requires NumPy.
+
+        Parameters
+        ----------
+        colors
+            The `colors` parameter is an array-like of shape (N, 3) holding the red, green and blue
+        components of the colors in the range 0-255.
+
+        Returns
+        -------
+            A `uint8` array of shape (N, 9), where each row is the payload of one command. A row can be
+        turned into a `Payload` with `Payload(row)`.
+
+        '''
+        return Payloads.__stamp(Payloads.__COLOR[0], slice(5, 9), Payloads.hues(colors))
+
+    @staticmethod
+    def hue_many(hues) -> "numpy.ndarray":
+        '''The static function `hue_many` encodes the payloads of `set_color` commands for an array of
+        hue values in one vectorized call, f.e. hues interpolated by a transition. It requires NumPy.
+
+        Parameters
+        ----------
+        hues
+            The `hues` parameter is an array-like of N hue values in the range 0-255, as returned by
+        `hues`.
+
+        Returns
+        -------
+            A `uint8` array of shape (N, 9), where each row is the payload of one command.
+
+        '''
+        Payloads.__require_numpy()
+        return Payloads.__stamp(Payloads.__COLOR[0], slice(5, 9), numpy.asarray(hues, dtype=numpy.int64) % 256)
+
+    @staticmethod
+    def brightness_many(levels) -> "numpy.ndarray":
+        '''The static function `brightness_many` encodes the payloads of `brightness` commands for an
+        array of levels in one vectorized call. It requires NumPy.
+
+        Parameters
+        ----------
+        levels
+            The `levels` parameter is an array-like of N brightness levels. Values are clamped to 0-100.
+
+        Returns
+        -------
+            A `uint8` array of shape (N, 9), where each row is the payload of one command.
+
+        '''
+        return Payloads.__stamp(Payloads.__BRIGHTNESS[0], slice(5, 6), Payloads.__percentages_to_bytes(levels))
+
+    @staticmethod
+    def saturation_many(levels) -> "numpy.ndarray":
+        '''The static function `saturation_many` encodes the payloads of `saturation` commands for an
+        array of levels in one vectorized call. It requires NumPy.
+
+        Parameters
+        ----------
+        levels
+            The `levels` parameter is an array-like of N saturation levels. Values are clamped to 0-100.
+
+        Returns
+        -------
+            A `uint8` array of shape (N, 9), where each row is the payload of one command.
+
+        '''
+        Payloads.__require_numpy()
+        levels = 100 - numpy.clip(numpy.asarray(levels), 0, 100)
+        return Payloads.__stamp(Payloads.__SATURATION[0], slice(5, 6), Payloads.__percentages_to_bytes(levels))
+
+    @staticmethod
+    def kelvin_many(temps) -> "numpy.ndarray":
+        '''The static function `kelvin_many` encodes the payloads of `kelvin` commands for an array of
+        color temperatures in one vectorized call. It requires NumPy.
+
+        Parameters
+        ----------
+        temps
+            The `temps` parameter is an array-like of N color temperatures in Kelvin.
+
+        Returns
+        -------
+            A `uint8` array of shape (N, 9), where each row is the payload of one command.
+
+        '''
+        Payloads.__require_numpy()
+        temps = numpy.asarray(temps, dtype=numpy.float64)
+        values = numpy.clip(((temps - 2700) / (6500 - 2700) * 100).astype(numpy.int64), 0, 100)
+        return Payloads.__stamp(Payloads.__KELVIN[0], slice(5, 6), values)
+
+    @staticmethod
+    def __stamp(template: Payload, positions: slice, values) -> "numpy.ndarray":
+        '''This static method copies `template` once per value and writes the values at `positions`.
+
+        '''
+        values = numpy.asarray(values, dtype=numpy.uint8).reshape(-1)
+        payloads = numpy.empty((len(values), Payload.LENGTH), dtype=numpy.uint8)
+        payloads[:] = numpy.frombuffer(template, dtype=numpy.uint8)
+        payloads[:, positions] = values[:, None]
+        return payloads
+
+    @staticmethod
+    def __percentages_to_bytes(levels) -> "numpy.ndarray":
+        '''This static method is the vectorized counterpart of `__percentage_to_byte`, clamping the
+        levels to 0-100 first.
+
+        '''
+        Payloads.__require_numpy()
+        levels = numpy.clip(numpy.asarray(levels, dtype=numpy.float64), 0, 100)
+        return (levels / 100 * 100).astype(numpy.uint8)
+
+    @staticmethod
+    def __require_numpy() -> None:
+        if numpy is None:
+            raise ImportError("NumPy is required for vectorized encoding, install it with `pip install numpy`")
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def __hex_to_hue(hex_color: str) -> int:
+        '''This static method converts a hexadecimal color code to its corresponding hue value in
+        the range 0-255. It ignores any spaces and "#" at the start. Results are cached, as effects
+        tend to repeat the same colors.
+
+        '''
+        # Convert hex color to RGB
+        hex_color = hex_color.strip("#").replace(" ", "")
+        red = int(hex_color[0:2], 16)
+        green = int(hex_color[2:4], 16)
+        blue = int(hex_color[4:6], 16)
+
+        return Payloads.__rgb_to_hue(red, green, blue)
+
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def __rgb_to_hue(red: int, green: int, blue: int) -> int:
+        '''This static method converts RGB components in the range 0-255 to the corresponding hue
+        value in the range 0-255. Results are cached.
+
+        '''
+        # Convert RGB to HSL
+        r = red / 255
+        g = green / 255
+        b = blue / 255
+
+        max_val = max(r, g, b)
+        min_val = min(r, g, b)
+
+        delta = max_val - min_val
+
+        if delta == 0:
+            hue = 0
+        elif max_val == r:
+            hue = ((g - b) / delta) % 6
+        elif max_val == g:
+            hue = ((b - r) / delta) + 2
+        else:
+            hue = ((r - g) / delta) + 4
+
+        hue *= 60
+
+        # Convert hue to range 0-255
+        return int(hue / 360 * 255)
+
+    @staticmethod
+    def __KV_to_byte(KV: int) -> int:
+        '''The static function __KV_to_byte converts a Kelvin value to a percentage of the range of
+        2700 to 6500, clamped to 0-100 so that it always fits in a byte.
+
+        '''
+        return max(0, min(100, int((KV - 2700) / (6500 - 2700) * 100)))
+
+    @staticmethod
+    def __percentage_to_byte(percent: int) -> int:
+        '''The static method `__percentage_to_byte` converts a percentage value to its byte
+        representation.
+
+        '''
+        return int(percent / 100 * 100)
@@ -0,0 +1,151 @@
+
+import threading
+import time
+
+
+# The `RateLimiter` class paces the packets sent to a single wifi-bridge with a token bucket. The v6
+# bridges silently drop packets when flooded, so the rate is tuned automatically, like the congestion
+# window of TCP: it grows multiplicatively while every packet is acknowledged, until the first packet
+# is lost, then grows slowly and is cut down as soon as packets get lost again (AIMD). The bucket holds
+# a whole send window, so a scene is sent back to back. One limiter is shared by every sender in the
+# process talking to the same bridge, see `for_bridge`.
+class RateLimiter:
+    __limiters: dict[tuple[str, int], "RateLimiter"] = {}
+    __limiters_lock: threading.Lock = threading.Lock()
+
+    def __init__(
+        self,
+        rate: float = 200.0,
+        burst: float = 32.0,
+        min_rate: float = 5.0,
+        max_rate: float = 2000.0,
+        increase: float = 1.0,
+        decrease: float = 0.7,
+        ramp: float = 1.1,
+    ) -> None:
+        '''The function initializes the token bucket.
+
+        Parameters
+        ----------
+        rate : float, optional
+            The `rate` parameter is the initial number of packets per second.
+        burst : float, optional
+            The `burst` parameter is the number of packets that can be sent back to back after the
+        bridge was idle. The default covers the send window of `send_commands`, 1 enforces a minimum
+        interval between packets.
+        min_rate : float, optional
+            The `min_rate` parameter is the lowest rate the limiter tunes down to.
+        max_rate : float, optional
+            The `max_rate` parameter is the highest rate the limiter tunes up to.
+        increase : float, optional
+            The `increase` parameter is the number of packets per second added to the rate for every
+        packet acknowledged at the first attempt, once a packet has been lost.
+        decrease : float, optional
+            The `decrease` parameter is the factor the rate is multiplied by when a packet is lost. The
+        rate is decreased at most once per second, so that a burst of losses counts as one.
+        ramp : float, optional
+            The `ramp` parameter is the factor the rate is multiplied by for every packet acknowledged at
+        the first attempt, until the first packet is lost.
+
+        '''
+        self.rate: float = rate
+        self.burst: float = burst
+        self.min_rate: float = min_rate
+        self.max_rate: float = max_rate
+        self.increase: float = increase
+        self.decrease: float = decrease
+        self.ramp: float = ramp
+        # The rate ramps up multiplicatively until the first loss
+        self.ramping: bool = True
+        self.tokens: float = burst
+        self.updated: float = time.monotonic()
+        self.decreased: float = 0.0
+        self.lock: threading.Lock = threading.Lock()
+
+    @classmethod
+    def for_bridge(cls, address: tuple[str, int], **kwargs) -> "RateLimiter":
+        '''The class method `for_bridge` returns the limiter shared by every sender in the process for
+        the bridge with the given address, creating it on first use.
+
+        Parameters
+        ----------
+        address : tuple[str, int]
+            The `address` parameter is a tuple of the IP address and port number of the bridge.
+        kwargs
+            Arguments of the limiter, only used when it is created.
+
+        Returns
+        -------
+            The `RateLimiter` of the bridge.
+
+        '''
+        limiter: RateLimiter = cls.__limiters.get(address)
+        if limiter is None:
+            with cls.__limiters_lock:
+                limiter = cls.__limiters.setdefault(address, cls(**kwargs))
+        return limiter
+
+    def reserve(self) -> float:
+        '''The function `reserve` takes a token from the bucket for one packet.
+
+        Returns
+        -------
+            The number of seconds the caller has to wait before sending the packet. Tokens can be
+        reserved ahead, so concurrent callers are served in order.
+
+        '''
+        with self.lock:
+            now: float = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def try_acquire(self) -> float:
+        '''The function `try_acquire` takes a token from the bucket only if one is available, without
+        blocking. It is used by senders that wait for acknowledgments while being paced.
+
+        Returns
+        -------
+            0 if a token was taken and the packet may be sent now, otherwise the number of seconds until
+        a token becomes available.
+
+        '''
+        with self.lock:
+            now: float = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self) -> None:
+        '''The function `acquire` blocks until a packet may be sent to the bridge.
+
+        '''
+        delay: float = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def on_ack(self) -> None:
+        '''The function `on_ack` reports a packet acknowledged at the first attempt, increasing the rate
+        multiplicatively until the first loss and additively afterwards.
+
+        '''
+        with self.lock:
+            if self.ramping:
+                self.rate = min(self.max_rate, self.rate * self.ramp)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_loss(self) -> None:
+        '''The function `on_loss` reports a lost packet, decreasing the rate multiplicatively.
+
+        '''
+        with self.lock:
+            now: float = time.monotonic()
+            self.ramping = False
+            if now - self.decreased >= 1.0:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.decreased = now
@@ -0,0 +1,235 @@
+
+import threading
+import time
+
+from MilightController.Device import Device
+from MilightController.MilightController import MilightController
+from MilightController.Payload import Payload
+from MilightController.Payloads import Payloads
+from MilightController.Zone import Zone
+
+
+# The `Reconciler` class remembers the last acknowledged state of every zone of every wifi-bridge and
+# brings lamps to a desired state by sending only the commands that change something. States are
+# compared by their encoded payloads, so values that encode to the same bytes are never resent, and
+# commands for `Zone.ALL` are tracked for each of the four zones.
+class Reconciler:
+    # Attributes of a lamp in the order their commands are sent, the lamp is turned on first
+    ATTRIBUTES: tuple[str, ...] = ("on", "color", "kelvin", "saturation", "brightness")
+    ZONES: tuple[Zone, ...] = (Zone.ZONE_1, Zone.ZONE_2, Zone.ZONE_3, Zone.ZONE_4)
+
+    # Attributes a lamp forgets when another one is set, f.e. setting a color leaves the white mode
+    __EXCLUSIVE: dict[str, str] = {"color": "kelvin", "kelvin": "color"}
+
+    def __init__(self, controller: MilightController, window: int = 16, max_age: float = None) -> None:
+        '''The function initializes a reconciler with an empty state model.
+
+        Parameters
+        ----------
+        controller : MilightController
+            The `controller` parameter is the controller used to send the commands.
+        window : int, optional
+            The `window` parameter is the maximum number of commands in flight per bridge, see
+        `MilightController.send_commands`.
+        max_age : float, optional
+            The `max_age` parameter is the number of seconds after which a recorded state is no longer
+        trusted and is sent again, f.e. because the lamps may have been changed with a remote. `None`
+        trusts recorded states forever.
+
+        '''
+        self.controller: MilightController = controller
+        self.window: int = window
+        self.max_age: float = max_age
+        self.states: dict[tuple[str, int], dict[Zone, dict[str, tuple[Payload, float]]]] = {}
+        self.lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def encode(target: dict) -> dict[str, Payload]:
+        '''The static function `encode` turns a desired state into the payloads of its attributes.
+
+        Parameters
+        ----------
+        target : dict
+            The `target` parameter is a dictionary with any of the keys "on" (bool), "color" (str as
+        accepted by `Commands.set_color`), "kelvin" (int), "saturation" (int) and "brightness" (int).
+        "color" and "kelvin" cannot be combined.
+
+        Returns
+        -------
+            A dictionary mapping every attribute to its `Payload`, in the order of `ATTRIBUTES`.
+
+        '''
+        unknown: set[str] = set(target) - set(Reconciler.ATTRIBUTES)
+        if unknown:
+            raise ValueError(f"Unknown lamp attributes: {', '.join(sorted(unknown))}")
+        if target.get("color") is not None and target.get("kelvin") is not None:
+            raise ValueError("A lamp cannot show a color and a white temperature at once")
+
+        encoders: dict[str, callable] = {
+            "on": lambda on: Payloads.light_on() if on else Payloads.light_off(),
+            "color": Payloads.set_color,
+            "kelvin": Payloads.kelvin,
+            "saturation": Payloads.saturation,
+            "brightness": Payloads.brightness,
+        }
+        return {
+            attribute: encoders[attribute](target[attribute])
+            for attribute in Reconciler.ATTRIBUTES
+            if target.get(attribute) is not None
+        }
+
+    def plan(self, device: dict, target: dict, zone: Zone = Zone.ALL) -> list[tuple[Payload, Zone]]:
+        '''The function `plan` computes the commands needed to bring a zone from its recorded state to
+        the desired state, without sending them.
+
+        Parameters
+        ----------
+        device : dict
+            The `device` parameter is a dictionary containing information about the device. It should have
+        the keys "ip" and "port".
+        target : dict
+            The `target` parameter is the desired state, see `encode`. Lamps turned off only receive the
+        command turning them off.
+        zone : Zone, optional
+            The `zone` parameter is the `Zone` the desired state applies to. For `Zone.ALL` every
+        attribute is sent once to `Zone.ALL` if several zones differ from it, or to the single zone that
+        differs.
+
+        Returns
+        -------
+            A list of `(payload, zone)` tuples, which can be passed to `MilightController.send_commands`.
+
+        '''
+        payloads: dict[str, Payload] = self.encode(target)
+        if target.get("on") is False:
+            payloads = {"on": payloads["on"]}
+
+        zones: tuple[Zone, ...] = self.ZONES if zone is Zone.ALL else (zone,)
+        now: float = time.monotonic()
+        commands: list[tuple[Payload, Zone]] = []
+
+        with self.lock:
+            states: dict[Zone, dict] = self.states.get(self.__address(device), {})
+            for attribute, payload in payloads.items():
+                differing: list[Zone] = [
+                    single_zone for single_zone in zones
+                    if not self.__is_current(states.get(single_zone, {}).get(attribute), payload, now)
+                ]
+                if len(differing) == 1:
+                    commands.append((payload, differing[0]))
+                elif differing:
+                    commands.append((payload, zone))
+
+        return commands
+
+    def apply(self, device: dict, target: dict, zone: Zone = Zone.ALL) -> list[tuple[Payload, Zone]]:
+        '''The function `apply` sends the commands needed to bring a zone to the desired state and
+        records the commands the bridge acknowledged.
+
+        Parameters
+        ----------
+        device : dict
+            The `device` parameter is a dictionary containing information about the device. It should have
+        the keys "ip" and "port".
+        target : dict
+            The `target` parameter is the desired state, see `encode`.
+        zone : Zone, optional
+            The `zone` parameter is the `Zone` the desired state applies to.
+
+        Returns
+        -------
+            The list of `(payload, zone)` tuples that were sent. Commands that were not acknowledged are
+        not recorded, so they are sent again by the next call.
+
+        '''
+        commands: list[tuple[Payload, Zone]] = self.plan(device, target, zone)
+        if not commands:
+            return commands
+
+        responses: list[str] = self.controller.send_commands(device, commands, self.window)
+        for (payload, command_zone), response in zip(commands, responses):
+            if response is not None:
+                self.record(device, payload, command_zone)
+        return commands
+
+    def record(self, device: dict, payload: Payload, zone: Zone) -> None:
+        '''The function `record` updates the state model with a command acknowledged by a bridge. It is
+        called by `apply`, and can be called for commands sent by other means.
+
+        Parameters
+        ----------
+        device : dict
+            The `device` parameter is a dictionary containing information about the device. It should have
+        the keys "ip" and "port".
+        payload : Payload
+            The `payload` parameter is the acknowledged command.
+        zone : Zone
+            The `zone` parameter is the `Zone` the command was addressed to.
+
+        '''
+        attribute: str = self.__attribute(payload)
+        if attribute is None:
+            return
+
+        now: float = time.monotonic()
+        with self.lock:
+            states: dict[Zone, dict] = self.states.setdefault(self.__address(device), {})
+            for single_zone in self.ZONES if zone is Zone.ALL else (zone,):
+                state: dict = states.setdefault(single_zone, {})
+                state[attribute] = (payload, now)
+                if attribute in self.__EXCLUSIVE:
+                    state.pop(self.__EXCLUSIVE[attribute], None)
+
+    def state(self, device: dict, zone: Zone) -> dict[str, Payload]:
+        '''The function `state` returns the recorded state of a zone.
+
+        Parameters
+        ----------
+        device : dict
+            The `device` parameter is a dictionary containing information about the device. It should have
+        the keys "ip" and "port".
+        zone : Zone
+            The `zone` parameter is a single `Zone`.
+
+        Returns
+        -------
+            A dictionary mapping every known attribute to the last acknowledged `Payload`.
+
+        '''
+        with self.lock:
+            state: dict = self.states.get(self.__address(device), {}).get(zone, {})
+            return {attribute: payload for attribute, (payload, _) in state.items()}
+
+    def forget(self, device: dict = None) -> None:
+        '''The function `forget` clears the recorded state of a device, or of all devices, so that the
+        next `apply` sends every attribute, f.e. after the lamps lost power.
+
+        Parameters
+        ----------
+        device : dict, optional
+            The `device` parameter is the device to forget, `None` forgets all devices.
+
+        '''
+        with self.lock:
+            if device is None:
+                self.states.clear()
+            else:
+                self.states.pop(self.__address(device), None)
+
+    def __is_current(self, recorded: tuple[Payload, float], payload: Payload, now: float) -> bool:
+        if recorded is None or recorded[0] != payload:
+            return False
+        return self.max_age is None or now - recorded[1] < self.max_age
+
+    @staticmethod
+    def __attribute(payload: Payload) -> str:
+        # Lamp commands: 31 00 00 08 {function} {value} ...
+        if payload[0] != 0x31 or payload[3] != 0x08:
+            return None
+        if payload[4] == 0x04:
+            return "on" if payload[5] in (0x01, 0x02) else None
+        return {0x01: "color", 0x02: "saturation", 0x03: "brightness", 0x05: "kelvin"}.get(payload[4])
+
+    @staticmethod
+    def __address(device: dict) -> tuple[str, int]:
+        return Device.address_of(device)
@@ -0,0 +1,72 @@
+import threading
+
+
+# The `RttEstimator` class estimates the round-trip time of a wifi-bridge and derives the retransmission
+# timeout from it, following the algorithm TCP uses (RFC 6298). Healthy links get short timeouts, while
+# slow or lossy links back off instead of flooding the bridge with retransmissions. An estimator can be
+# updated by several threads sending to the same bridge.
+class RttEstimator:
+    ALPHA: float = 1 / 8
+    BETA: float = 1 / 4
+    K: int = 4
+
+    def __init__(self, initial: float = 1.0, minimum: float = 0.05, maximum: float = 3.0) -> None:
+        '''The function initializes the estimator before any round-trip time has been measured.
+
+        Parameters
+        ----------
+        initial : float, optional
+            The `initial` parameter is the retransmission timeout in seconds used until the first
+        round-trip time is measured.
+        minimum : float, optional
+            The `minimum` parameter is the lower bound of the retransmission timeout in seconds.
+        maximum : float, optional
+            The `maximum` parameter is the upper bound of the retransmission timeout in seconds, also
+        limiting how far `backoff` can grow it.
+
+        '''
+        self.minimum: float = minimum
+        self.maximum: float = maximum
+        self.srtt: float = None
+        self.rttvar: float = None
+        self.rto: float = max(minimum, min(maximum, initial))
+        self.lock: threading.Lock = threading.Lock()
+
+    def sample(self, rtt: float) -> None:
+        '''The function `sample` updates the estimate with a measured round-trip time. Only packets that
+        were acknowledged without being retransmitted should be sampled (Karn's algorithm), as the
+        acknowledgment of a retransmitted packet cannot be matched to a single transmission.
+
+        Parameters
+        ----------
+        rtt : float
+            The `rtt` parameter is the measured round-trip time in seconds.
+
+        '''
+        with self.lock:
+            if self.srtt is None:
+                self.srtt = rtt
+                self.rttvar = rtt / 2
+            else:
+                self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+                self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+
+            self.rto = max(self.minimum, min(self.maximum, self.srtt + self.K * self.rttvar))
+
+    def backoff(self) -> None:
+        '''The function `backoff` doubles the retransmission timeout after a packet was lost, up to
+        `maximum`.
+
+        '''
+        with self.lock:
+            self.rto = min(self.maximum, self.rto * 2)
+
+    def restore(self) -> None:
+        '''The function `restore` undoes `backoff` once a retransmitted packet was acknowledged, proving
+        that the bridge answers again. Without it, a few isolated losses at the end of a batch compound
+        the timeout although no round-trip time is sampled anymore.
+
+        '''
+        with self.lock:
+            if self.srtt is not None:
+                self.rto = max(self.minimum, min(self.maximum, self.srtt + self.K * self.rttvar))
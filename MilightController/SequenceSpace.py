@@ -0,0 +1,108 @@
+import itertools
+import threading
+
+
+# The `SequenceSpace` class hands out the sequence numbers of the packets sent to a single wifi-bridge.
+# The bridge echoes the sequence number of a packet in its acknowledgment, so the number must not be
+# reused while the packet is in flight. All 256 values of the byte are used in turn, numbers still in
+# flight are skipped, and a number is only reused after every other free number has been used, which
+# leaves late acknowledgments of given up packets the most time to arrive.
+#
+# `reserve` takes no lock unless the space is exhausted, as `next` on a counter and `dict.setdefault`
+# are atomic, so a space can be shared by many threads sending to the bridge at once.
+class SequenceSpace:
+    SIZE: int = 256
+
+    def __init__(self) -> None:
+        '''The function initializes a space with every sequence number free.
+
+        '''
+        self.counter: itertools.count = itertools.count()
+        # Maps every sequence number in flight to a list holding its owner, f.e. the mailbox or future
+        # waiting for it. Every reservation has its own list, so an owner can hold several numbers.
+        self.in_flight: dict[int, list] = {}
+        self.condition: threading.Condition = threading.Condition()
+        self.blocked: int = 0
+
+    def __len__(self) -> int:
+        return len(self.in_flight)
+
+    def reserve(self, owner: object, block: bool = True, timeout: float = None) -> int:
+        '''The function `reserve` takes the next free sequence number.
+
+        Parameters
+        ----------
+        owner : object
+            The `owner` parameter is stored with the number until it is released, see `owner`.
+        block : bool, optional
+            The `block` parameter makes the function wait for a number to be released when all of them
+        are in flight. Callers holding numbers themselves must not block, as they may be the ones to
+        release them.
+        timeout : float, optional
+            The `timeout` parameter is the longest number of seconds to block, `None` blocks until a
+        number is released.
+
+        Returns
+        -------
+            The sequence number, in the range 0-255, or `None` if every number is in flight.
+
+        '''
+        number: int = self.__try_reserve(owner)
+        if number is not None or not block:
+            return number
+
+        with self.condition:
+            self.blocked += 1
+            try:
+                # Numbers released before `blocked` was raised are found by the next attempt
+                while (number := self.__try_reserve(owner)) is None:
+                    if not self.condition.wait(timeout):
+                        return None
+            finally:
+                self.blocked -= 1
+        return number
+
+    def release(self, number: int) -> None:
+        '''The function `release` returns a sequence number once its packet was acknowledged or given
+        up. Acknowledgments arriving later are no longer matched to an owner.
+
+        Parameters
+        ----------
+        number : int
+            The `number` parameter is a number returned by `reserve`.
+
+        '''
+        self.in_flight.pop(number, None)
+        if self.blocked:
+            with self.condition:
+                self.condition.notify()
+
+    def owner(self, number: int) -> object:
+        '''The function `owner` returns the owner of a sequence number in flight.
+
+        Parameters
+        ----------
+        number : int
+            The `number` parameter is the sequence number, f.e. taken from an acknowledgment.
+
+        Returns
+        -------
+            The owner passed to `reserve`, or `None` if the number is not in flight.
+
+        '''
+        slot: list = self.in_flight.get(number)
+        return None if slot is None else slot[0]
+
+    def owners(self) -> list:
+        '''The function `owners` returns the owners of all sequence numbers in flight.
+
+        '''
+        return [slot[0] for slot in list(self.in_flight.values())]
+
+    def __try_reserve(self, owner: object) -> int:
+        slot: list = [owner]
+        for _ in range(self.SIZE):
+            number: int = next(self.counter) % self.SIZE
+            if self.in_flight.setdefault(number, slot) is slot:
+                return number
+        return None
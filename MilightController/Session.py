@@ -0,0 +1,351 @@
+
+import logging
+import socket
+import threading
+import time
+from collections import deque
+
+from MilightController.Metrics import Metrics
+from MilightController.MmsgTransport import MmsgTransport
+from MilightController.Packet import Packet
+from MilightController.PacketCapture import PacketCapture
+from MilightController.RateLimiter import RateLimiter
+from MilightController.RttEstimator import RttEstimator
+from MilightController.SequenceSpace import SequenceSpace
+from MilightController.Transport import Transport
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+# The `Session` class keeps an open UDP socket and the WB1/WB2 session ID of a single wifi-bridge, so
+# that consecutive commands can reuse one handshake instead of requesting a new session every time.
+#
+# A session is safe to share between threads. Sequence numbers are reserved from the `SequenceSpace` of
+# the session without locking, and every thread sends on the shared socket directly. Datagrams are
+# received by one waiting thread at a time, which hands every acknowledgment to the thread owning its
+# sequence number (leader/follower), so threads never steal each other's acknowledgments.
+#
+# Sessions are kept for every bridge the controller has talked to, so they use `__slots__`.
+class Session:
+    __slots__ = (
+        "address", "timeout", "lifetime", "retries", "limiter", "capture", "metrics", "rtt", "wb1", "wb2",
+        "established_at", "packet", "socket", "sequences", "handshake", "handshake_mailbox", "receiving",
+        "condition", "transport",
+    )
+    SESSION_REQUEST: bytes = bytes.fromhex(
+        "20 00 00 00 16 02 62 3A D5 ED A3 01 AE 08 2D 46 61 41 A7 F6 DC AF D3 E6 00 00 1E"
+    )
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        timeout: int = 3000,
+        lifetime: int = 60000,
+        retries: int = 3,
+        limiter: RateLimiter = None,
+        capture: PacketCapture = None,
+        metrics: Metrics = None,
+        transport: Transport = None,
+    ) -> None:
+        '''The function initializes a session bound to a single wifi-bridge.
+
+        Parameters
+        ----------
+        address : tuple[str, int]
+            The `address` parameter is a tuple of the IP address and port number of the wifi-bridge the
+        session belongs to.
+        timeout : int, optional
+            The `timeout` parameter is the longest duration in milliseconds the session waits for the
+        bridge to answer before a request is retransmitted. The actual retransmission timeout adapts to
+        the measured round-trip time of the bridge.
+        lifetime : int, optional
+            The `lifetime` parameter is the duration in milliseconds after which the session ID is
+        considered expired and a new handshake is made before the next command.
+        retries : int, optional
+            The `retries` parameter is the number of times a lost request is retransmitted before it is
+        given up.
+        limiter : RateLimiter, optional
+            The `limiter` parameter is the `RateLimiter` pacing the packets sent to the bridge, `None`
+        sends packets as fast as possible.
+        capture : PacketCapture, optional
+            The `capture` parameter is the `PacketCapture` every packet exchanged with the bridge is
+        written to, `None` disables capturing.
+        metrics : Metrics, optional
+            The `metrics` parameter is the `Metrics` the handshakes of the session are recorded in,
+        `None` disables recording.
+        transport : Transport, optional
+            The `transport` parameter is the `Transport` datagrams are sent and received with, `None`
+        uses a `MmsgTransport` where it is available and a `Transport` otherwise.
+
+        '''
+        self.address: tuple[str, int] = address
+        self.timeout: int = timeout
+        self.lifetime: int = lifetime
+        self.retries: int = retries
+        self.limiter: RateLimiter = limiter
+        self.capture: PacketCapture = capture
+        self.metrics: Metrics = metrics
+        self.rtt: RttEstimator = RttEstimator(min(1.0, timeout / 1000), maximum=timeout / 1000)
+        self.wb1: str = None
+        self.wb2: str = None
+        self.established_at: float = None
+        self.packet: Packet = Packet()
+        self.socket: socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.settimeout(timeout / 1000)
+        self.sequences: SequenceSpace = SequenceSpace()
+        self.handshake: threading.Lock = threading.Lock()
+        # Mailbox of the thread waiting for a session response, if any
+        self.handshake_mailbox: deque = None
+        self.receiving: bool = False
+        self.condition: threading.Condition = threading.Condition()
+        if transport is None:
+            transport = MmsgTransport() if MmsgTransport.available() else Transport()
+        self.transport: Transport = transport
+
+    def is_valid(self) -> bool:
+        '''The function `is_valid` checks whether the session ID is known and has not expired yet.
+
+        Returns
+        -------
+            `True` if the session can be used to send commands, `False` otherwise.
+
+        '''
+        if self.established_at is None:
+            return False
+        return (time.monotonic() - self.established_at) * 1000 < self.lifetime
+
+    def establish(self) -> tuple[str, str]:
+        '''The function `establish` requests a new session ID from the wifi-bridge and stores it in
+        the session.
+
+        Returns
+        -------
+            A tuple containing the `wb1` and `wb2` values extracted from the response of the bridge. The
+        request is retransmitted with an adaptive timeout, and `socket.timeout` is raised if the bridge
+        does not answer within the retry budget.
+
+        '''
+        started: float = time.monotonic()
+        mailbox: deque = deque()
+        self.handshake_mailbox = mailbox
+        try:
+            return self.__establish(started, mailbox)
+        finally:
+            self.handshake_mailbox = None
+
+    def __establish(self, started: float, mailbox: deque) -> tuple[str, str]:
+        for attempt in range(self.retries + 1):
+            if attempt and self.metrics is not None:
+                self.metrics.increment("retransmissions_total", self.address[0])
+            if self.limiter is not None:
+                self.limiter.acquire()
+            self.transport.send(self.socket, [self.SESSION_REQUEST], self.address)
+            sent: float = time.monotonic()
+            self.record(self.SESSION_REQUEST, True)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Sent request to get session ID: %s", self.SESSION_REQUEST.hex(" "))
+
+            # Wait for a response until the retransmission timeout
+            data: bytes = self.receive(mailbox, sent + self.rtt.rto - time.monotonic())
+            if data is not None:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Got response: %s", data.hex(" "))
+                if attempt == 0:
+                    self.rtt.sample(time.monotonic() - sent)
+
+                # Extract WB1 and WB2 from the response
+                self.wb1 = "%02x" % data[19]
+                self.wb2 = "%02x" % data[20]
+                logger.debug("WB1: %s WB2: %s", self.wb1, self.wb2)
+
+                self.packet.set_session(data[19], data[20])
+                self.established_at = time.monotonic()
+                if self.metrics is not None:
+                    self.metrics.observe("session_establish_seconds", self.address[0], self.established_at - started)
+                return (self.wb1, self.wb2)
+
+            self.rtt.backoff()
+
+        if self.metrics is not None:
+            self.metrics.increment("timeouts_total", self.address[0])
+
+        raise socket.timeout(f"No session response from {self.address[0]}:{self.address[1]}")
+
+    def record(self, data: bytes, outgoing: bool) -> None:
+        '''The function `record` writes a packet exchanged with the bridge to the `PacketCapture` of the
+        session, if any.
+
+        Parameters
+        ----------
+        data : bytes
+            The `data` parameter is the packet.
+        outgoing : bool
+            The `outgoing` parameter is `True` for packets sent to the bridge, `False` for packets
+        received from it.
+
+        '''
+        if self.capture is None:
+            return
+        local: tuple[str, int] = ("0.0.0.0", self.socket.getsockname()[1])
+        if outgoing:
+            self.capture.write(data, local, self.address)
+        else:
+            self.capture.write(data, self.address, local)
+
+    @staticmethod
+    def is_session_response(data: bytes) -> bool:
+        '''The static function `is_session_response` checks whether a datagram is a response to the
+        session request, as opposed to an acknowledgment of a command.
+
+        Parameters
+        ----------
+        data : bytes
+            The `data` parameter is a datagram received from the bridge.
+
+        Returns
+        -------
+            `True` if the datagram carries a session ID, `False` otherwise.
+
+        '''
+        # Session response: 28 00 00 00 11 00 02 {MAC} ... {WB1} {WB2} 00
+        return len(data) >= 21 and data[0] == 0x28
+
+    def ensure(self) -> tuple[str, str]:
+        '''The function `ensure` returns the current session ID, making a new handshake only if the
+        session has not been established yet or has expired.
+
+        Returns
+        -------
+            A tuple containing the `wb1` and `wb2` values of a valid session.
+
+        '''
+        if not self.is_valid():
+            # Threads finding the session expired at the same time share a single handshake
+            with self.handshake:
+                if not self.is_valid():
+                    return self.establish()
+        return (self.wb1, self.wb2)
+
+    def invalidate(self, established_at: float = None) -> None:
+        '''The function `invalidate` forgets the session ID, forcing a new handshake before the next
+        command. It is used when the bridge stops acknowledging commands.
+
+        Parameters
+        ----------
+        established_at : float, optional
+            The `established_at` parameter is the value of `established_at` when the caller started
+        using the session. The session is only invalidated if it has not been established again since,
+        f.e. by another thread, `None` invalidates it unconditionally.
+
+        '''
+        if established_at is None or established_at == self.established_at:
+            self.established_at = None
+
+    def reserve(self, mailbox: deque, block: bool = True) -> int:
+        '''The function `reserve` takes a free sequence number for a packet, whose acknowledgment
+        `receive` delivers to a mailbox until the number is released. It can be called by several
+        threads at once.
+
+        Parameters
+        ----------
+        mailbox : deque
+            The `mailbox` parameter is the queue of the calling thread, passed to `receive`.
+        block : bool, optional
+            The `block` parameter makes the function wait while all 256 sequence numbers of the bridge
+        are in flight. Callers with packets in flight must not block, see `SequenceSpace.reserve`.
+
+        Returns
+        -------
+            The sequence number, or `None` if every number is in flight and `block` is `False`.
+
+        '''
+        return self.sequences.reserve(mailbox, block)
+
+    def release(self, sequence_number: int) -> None:
+        '''The function `release` frees the sequence number of a packet that was acknowledged or given up.
+
+        Parameters
+        ----------
+        sequence_number : int
+            The `sequence_number` parameter is a number returned by `reserve`.
+
+        '''
+        self.sequences.release(sequence_number)
+
+    def receive(self, mailbox: deque, timeout: float) -> bytes:
+        '''The function `receive` waits for the next datagram delivered to a mailbox. While no other
+        thread is reading the socket, the calling thread reads it and delivers the datagrams to the
+        mailboxes of the threads expecting them.
+
+        Parameters
+        ----------
+        mailbox : deque
+            The `mailbox` parameter is the queue passed to `reserve`.
+        timeout : float
+            The `timeout` parameter is the number of seconds to wait.
+
+        Returns
+        -------
+            The datagram, or `None` if none was delivered within the timeout.
+
+        '''
+        deadline: float = time.monotonic() + timeout
+        while True:
+            # Only the owner takes from its mailbox, so no lock is needed
+            if mailbox:
+                return mailbox.popleft()
+
+            with self.condition:
+                while not mailbox and self.receiving:
+                    remaining: float = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    self.condition.wait(remaining)
+                if mailbox:
+                    continue
+                self.receiving = True
+
+            # This thread reads the socket for all threads until a datagram of its own arrives
+            try:
+                while not mailbox:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    datagrams: list[bytes] = self.transport.receive(self.socket, remaining)
+                    if not datagrams:
+                        break
+                    others: bool = False
+                    for data in datagrams:
+                        receiver: deque = self.__deliver(data)
+                        others = others or (receiver is not None and receiver is not mailbox)
+                    if others:
+                        with self.condition:
+                            self.condition.notify_all()
+            finally:
+                # The next waiting thread takes over reading
+                with self.condition:
+                    self.receiving = False
+                    self.condition.notify_all()
+
+            if not mailbox:
+                return None
+
+    def __deliver(self, data: bytes) -> deque:
+        self.record(data, False)
+        # Acknowledgments carry the sequence number of the packet at index 6
+        if self.is_session_response(data):
+            mailbox: deque = self.handshake_mailbox
+        elif len(data) > 6 and data[0] == 0x88:
+            mailbox = self.sequences.owner(data[6])
+        else:
+            return None
+        if mailbox is not None:
+            mailbox.append(data)
+        return mailbox
+
+    def close(self) -> None:
+        '''The function `close` closes the socket of the session.
+
+        '''
+        self.invalidate()
+        self.socket.close()
@@ -0,0 +1,292 @@
+import itertools
+import multiprocessing
+import os
+import socket
+import threading
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from MilightController.Device import Device
+from MilightController.Metrics import Metrics
+from MilightController.MilightController import MilightController
+from MilightController.PacketCapture import PacketCapture
+from MilightController.Payload import Payload
+from MilightController.Session import Session
+from MilightController.Zone import Zone
+
+
+# The `ShardedController` class spreads the bridges of a large installation over several worker
+# processes, so that building packets and the socket calls of hundreds of bridges are not limited to a
+# single core. Every bridge is assigned to a worker by a hash of its IP address, and the worker owns the
+# sessions and sequence numbers of its bridges in a `MilightController` of its own. Commands are sent to
+# the workers over pipes, one message per call and worker, and the controller keeps the API of
+# `MilightController`, so it can replace one in `Reconciler`, `Daemon`, `Group` or `FrameRenderer`.
+#
+# Discovery and the `DeviceCache` are handled by the controller itself, while sessions only exist in the
+# workers, so `get_session` is not supported. If `capture` or `metrics` is passed, the workers record
+# their packets and metrics in memory and return them with every response, and the controller adds
+# them to its own before the call returns.
+class ShardedController(MilightController):
+    # Options of `MilightController` passed on to the controllers of the workers
+    OPTIONS: tuple[str, ...] = ("timeout", "session_lifetime", "workers", "retries", "pacing", "transport")
+
+    def __init__(self, processes: int = None, start_method: str = None, **options) -> None:
+        '''The function initializes the controller and starts its worker processes.
+
+        Parameters
+        ----------
+        processes : int, optional
+            The `processes` parameter is the number of worker processes, the number of CPUs by default.
+        start_method : str, optional
+            The `start_method` parameter is the `multiprocessing` start method of the workers, f.e.
+        "spawn", the default of the platform if `None`.
+        **options
+            The keyword arguments of `MilightController`.
+
+        '''
+        super().__init__(**options)
+        self.processes: int = max(1, processes or os.cpu_count() or 1)
+        self.counter: itertools.count = itertools.count()
+        self.pending: dict[int, Future] = {}
+
+        context = multiprocessing.get_context(start_method)
+        worker_options: dict = {option: getattr(self, option) for option in self.OPTIONS}
+        # The workers record with the buckets of the controller, so that their histograms can be merged
+        recording: tuple = (None if self.metrics is None else self.metrics.buckets, self.capture is not None)
+        self.responses: multiprocessing.SimpleQueue = context.SimpleQueue()
+        self.requests: list[multiprocessing.SimpleQueue] = []
+        self.worker_processes: list[multiprocessing.Process] = []
+        for index in range(self.processes):
+            requests: multiprocessing.SimpleQueue = context.SimpleQueue()
+            process: multiprocessing.Process = context.Process(
+                target=ShardedController.serve,
+                args=(requests, self.responses, worker_options, recording),
+                name=f"MilightController-{index}",
+                daemon=True,
+            )
+            process.start()
+            self.requests.append(requests)
+            self.worker_processes.append(process)
+
+        # Requests are written by the calling threads, one at a time per worker
+        self.request_locks: list[threading.Lock] = [threading.Lock() for _ in range(self.processes)]
+        self.receiver: threading.Thread = threading.Thread(
+            target=self.__receive, name="ShardedController", daemon=True
+        )
+        self.receiver.start()
+
+    def shard(self, device: dict) -> int:
+        '''The function `shard` returns the index of the worker a bridge is assigned to. The assignment
+        only depends on the IP address of the bridge, so it is the same in every process and run, and
+        the `RateLimiter` of a bridge is only used by one worker.
+
+        Parameters
+        ----------
+        device : dict
+            The `device` parameter is a `Device` or a dictionary with the key "ip".
+
+        Returns
+        -------
+            The index of the worker, in the range 0 to `processes` - 1.
+
+        '''
+        return zlib.crc32(Device.address_of(device)[0].encode("ascii")) % self.processes
+
+    def establish_session(self, udp_socket: socket, device: dict) -> tuple[str, str]:
+        '''The function `establish_session` makes sure the worker owning a device holds a valid session
+        with it, f.e. to keep the handshake out of a measurement, see `MilightController.establish_session`.
+
+        '''
+        return self.__call(self.shard(device), "ensure", (Device.address_of(device),))
+
+    def get_session(self, device: dict) -> Session:
+        '''The function `get_session` is not supported, as the sessions are owned by the workers. A
+        session of the controller process would be a second owner of the sequence numbers and session ID
+        of a bridge, so use `establish_session` to make sure a session is established instead.
+
+        '''
+        raise NotImplementedError(
+            "The sessions of a ShardedController are owned by its workers, use establish_session instead"
+        )
+
+    def send_command(self, device: dict, command: str | bytes, zone: Zone = Zone.ALL) -> str:
+        '''The function `send_command` sends a command to a device through the worker owning it, see
+        `MilightController.send_command`.
+
+        '''
+        return self.__call(self.shard(device), "send_command", (Device.address_of(device), Payload.parse(command), zone))
+
+    def send_commands(self, device: dict, commands: list[tuple[str | bytes, Zone]], window: int = 16) -> list[str]:
+        '''The function `send_commands` sends a batch of commands to a device through the worker owning
+        it, see `MilightController.send_commands`.
+
+        '''
+        commands = [(Payload.parse(command), zone) for command, zone in commands]
+        return self.__call(self.shard(device), "send_commands", (Device.address_of(device), commands, window))
+
+    def fan_out(
+        self,
+        devices: list[dict],
+        commands: str | bytes | list[tuple[str | bytes, Zone]] | dict[tuple[str, int], list[tuple[str | bytes, Zone]]],
+        zone: Zone = Zone.ALL,
+        window: int = 16,
+    ) -> dict[tuple[str, int], dict]:
+        '''The function `fan_out` sends a command, or a batch of commands, to many devices. The devices
+        of every worker are sent to it in a single message, and the workers send concurrently, see
+        `MilightController.fan_out`.
+
+        '''
+        if isinstance(commands, (str, bytes)):
+            commands = [(commands, zone)]
+
+        shards: dict[int, list[dict]] = {}
+        for device in devices:
+            shards.setdefault(self.shard(device), []).append(device)
+
+        futures: dict[int, Future] = {}
+        for shard, members in shards.items():
+            addresses: list[tuple[str, int]] = [Device.address_of(device) for device in members]
+            if isinstance(commands, dict):
+                batch = {address: self.__parse(commands[address]) for address in addresses}
+            else:
+                batch = self.__parse(commands)
+            futures[shard] = self.__submit(shard, "fan_out", (addresses, batch, window))
+
+        results: dict[tuple[str, int], dict] = {}
+        for shard, future in futures.items():
+            results.update(self.__wait(shard, future))
+        # The results describe the devices of the caller, not the copies of the workers
+        for device in devices:
+            results[Device.address_of(device)]["device"] = device
+        return results
+
+    def close(self) -> None:
+        '''The function `close` stops the worker processes, closing the sessions they keep, and closes
+        the discovery resources of the controller.
+
+        '''
+        for shard, requests in enumerate(self.requests):
+            if self.worker_processes[shard].is_alive():
+                with self.request_locks[shard]:
+                    requests.put(None)
+        for process in self.worker_processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+        self.requests.clear()
+        self.worker_processes.clear()
+
+        if self.receiver.is_alive():
+            self.responses.put(None)
+            self.receiver.join()
+        for future in list(self.pending.values()):
+            future.set_exception(RuntimeError("The controller was closed"))
+        self.pending.clear()
+        super().close()
+
+    @staticmethod
+    def serve(
+        requests: multiprocessing.SimpleQueue,
+        responses: multiprocessing.SimpleQueue,
+        options: dict,
+        recording: tuple = (None, False),
+    ) -> None:
+        '''The static function `serve` is the main function of a worker process. It answers the requests
+        of the controller with a `MilightController` of its own until it receives `None`. Requests are
+        handled concurrently, so a slow bridge does not hold up the other bridges of the worker.
+
+        Parameters
+        ----------
+        requests : multiprocessing.SimpleQueue
+            The `requests` parameter is the queue of `(identifier, operation, arguments)` requests.
+        responses : multiprocessing.SimpleQueue
+            The `responses` parameter is the queue the `(identifier, ok, result, metrics, packets)`
+        responses are written to. `metrics` holds the metrics recorded since the last response, see
+        `Metrics.drain`, and `packets` the packets captured since, see `PacketCapture.drain`.
+        options : dict
+            The `options` parameter holds the keyword arguments of the `MilightController`.
+        recording : tuple, optional
+            The `recording` parameter is a tuple of the buckets of the metrics, `None` to record no
+        metrics, and whether packets are captured.
+
+        '''
+        buckets, capturing = recording
+        metrics: Metrics = None if buckets is None else Metrics(buckets=buckets)
+        capture: PacketCapture = PacketCapture() if capturing else None
+        controller: MilightController = MilightController(**options, capture=capture, metrics=metrics)
+        lock: threading.Lock = threading.Lock()
+
+        def handle(identifier: int, operation: str, arguments: tuple) -> None:
+            try:
+                if operation == "fan_out":
+                    addresses, commands, window = arguments
+                    result = controller.fan_out([Device(*address) for address in addresses], commands, window=window)
+                elif operation == "ensure":
+                    result = controller.get_session(Device(*arguments[0])).ensure()
+                else:
+                    address, *rest = arguments
+                    result = getattr(controller, operation)(Device(*address), *rest)
+                response: tuple = (identifier, True, result)
+            except Exception as error:
+                response = (identifier, False, error)
+
+            with lock:
+                recorded: tuple = (
+                    None if metrics is None else metrics.drain(), None if capture is None else capture.drain()
+                )
+                try:
+                    responses.put(response + recorded)
+                except Exception as error:
+                    # The result or exception could not be pickled
+                    responses.put((identifier, False, RuntimeError(repr(error))) + recorded)
+
+        with ThreadPoolExecutor(max_workers=options.get("workers", 32), thread_name_prefix="MilightController") as executor:
+            try:
+                while (request := requests.get()) is not None:
+                    executor.submit(handle, *request)
+            except (EOFError, KeyboardInterrupt):
+                pass
+        controller.close()
+
+    def __call(self, shard: int, operation: str, arguments: tuple) -> object:
+        return self.__wait(shard, self.__submit(shard, operation, arguments))
+
+    def __submit(self, shard: int, operation: str, arguments: tuple) -> Future:
+        identifier: int = next(self.counter)
+        future: Future = Future()
+        self.pending[identifier] = future
+        with self.request_locks[shard]:
+            self.requests[shard].put((identifier, operation, arguments))
+        return future
+
+    def __wait(self, shard: int, future: Future) -> object:
+        while not wait((future,), 1.0).done:
+            if not self.worker_processes or not self.worker_processes[shard].is_alive():
+                raise RuntimeError(f"Worker {shard} of the ShardedController is not running")
+        return future.result()
+
+    def __receive(self) -> None:
+        while True:
+            try:
+                response: tuple = self.responses.get()
+            except EOFError:
+                return
+            if response is None:
+                return
+            identifier, ok, result, metrics, packets = response
+            # Recorded before the result is delivered, so callers find their commands in the metrics
+            if metrics:
+                self.metrics.merge(metrics)
+            if packets:
+                self.capture.append(packets)
+            future: Future = self.pending.pop(identifier, None)
+            if future is None:
+                continue
+            if ok:
+                future.set_result(result)
+            else:
+                future.set_exception(result)
+
+    @staticmethod
+    def __parse(commands: list[tuple[str | bytes, Zone]]) -> list[tuple[Payload, Zone]]:
+        return [(Payload.parse(command), zone) for command, zone in commands]
@@ -0,0 +1,281 @@
+
+import asyncio
+import logging
+import math
+from bisect import bisect_right
+from collections.abc import Callable
+
+from MilightController.AsyncMilightController import AsyncMilightController
+from MilightController.Device import Device
+from MilightController.Payload import Payload
+from MilightController.Payloads import Payloads
+from MilightController.Zone import Zone
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+# Easing curves mapping the progress of a transition in [0, 1] to the progress of its value
+EASINGS: dict[str, Callable] = {
+    "linear": lambda t: t,
+    "ease_in": lambda t: t * t,
+    "ease_out": lambda t: 1 - (1 - t) * (1 - t),
+    "ease_in_out": lambda t: t * t * (3 - 2 * t),
+    "sine": lambda t: (1 - numpy.cos(numpy.pi * t)) / 2,
+}
+
+
+# The `TransitionEngine` class fades lamps from one state to another. The frames of a transition are
+# precomputed with NumPy and frames encoding to the same payload as their predecessor are dropped, so
+# slow fades send only as many packets as there are distinct levels. Every bridge is driven by a task
+# that sends the due frames of all its transitions at a fixed frame rate on the monotonic clock of the
+# event loop, skipping frames it has fallen behind on, so many transitions on many bridges run
+# concurrently on a single thread.
+class TransitionEngine:
+    ATTRIBUTES: tuple[str, ...] = ("color", "saturation", "brightness", "kelvin")
+
+    def __init__(self, controller: AsyncMilightController, rate: float = 10.0, window: int = 16) -> None:
+        '''The function initializes the engine.
+
+        Parameters
+        ----------
+        controller : AsyncMilightController
+            The `controller` parameter is the controller used to send the frames.
+        rate : float, optional
+            The `rate` parameter is the number of frames per second sent to a single bridge. All
+        transitions running on a bridge share its frames.
+        window : int, optional
+            The `window` parameter is the maximum number of commands of one frame in flight, see
+        `AsyncMilightController.send_many`.
+
+        '''
+        if numpy is None:
+            raise ImportError("NumPy is required for transitions, install it with `pip install numpy`")
+
+        self.controller: AsyncMilightController = controller
+        self.rate: float = rate
+        self.window: int = window
+        self.bridges: dict[tuple[str, int], dict] = {}
+
+    def add(
+        self,
+        device: dict,
+        start: dict,
+        end: dict,
+        duration: float,
+        zone: Zone = Zone.ALL,
+        easing: str | Callable = "linear",
+    ) -> asyncio.Future:
+        '''The function `add` starts a transition of a zone. It replaces running transitions of the same
+        attributes of the zone, and must be called from within the event loop. A transition of
+        `Zone.ALL` also replaces the transitions of the attributes of the single zones, while a transition
+        of a single zone takes the zone out of a running transition of `Zone.ALL`, which continues on the
+        other zones.
+
+        Parameters
+        ----------
+        device : dict
+            The `device` parameter is a dictionary containing information about the device. It should have
+        the keys "ip" and "port".
+        start : dict
+            The `start` parameter is the state the transition starts from, with any of the keys "color"
+        (str as accepted by `Commands.set_color`), "saturation", "brightness" and "kelvin".
+        end : dict
+            The `end` parameter is the state the transition ends in. Only attributes present in both
+        `start` and `end` are transitioned.
+        duration : float
+            The `duration` parameter is the duration of the transition in seconds.
+        zone : Zone, optional
+            The `zone` parameter is the `Zone` the transition applies to.
+        easing : str | Callable, optional
+            The `easing` parameter is the name of a curve in `EASINGS`, or a function mapping a NumPy
+        array of progress values in [0, 1] to eased progress values.
+
+        Returns
+        -------
+            A future resolved once the last frame of the transition has been sent, or once the
+        transition has been replaced by another one. It fails with the exception raised while sending
+        the frames of the bridge, which stops all of its transitions.
+
+        '''
+        curve: Callable = EASINGS[easing] if isinstance(easing, str) else easing
+        done: asyncio.Future = asyncio.get_running_loop().create_future()
+        bridge: dict = self.__get_bridge(device)
+
+        transitions: dict[str, dict] = {}
+        for attribute in self.ATTRIBUTES:
+            if start.get(attribute) is None or end.get(attribute) is None:
+                continue
+            offsets, payloads = self.frames(attribute, start[attribute], end[attribute], duration, curve, self.rate)
+            transitions[attribute] = {"zone": zone, "offsets": offsets, "payloads": payloads, "sent": -1, "started": None}
+
+        if not transitions:
+            done.set_result(None)
+            return done
+
+        remaining: list[int] = [len(transitions)]
+
+        def finish() -> None:
+            remaining[0] -= 1
+            if remaining[0] == 0 and not done.done():
+                done.set_result(None)
+
+        for attribute, transition in transitions.items():
+            transition["finish"] = finish
+            transition["done"] = done
+            self.__replace(bridge, zone, attribute)
+            bridge["transitions"][(zone, attribute)] = transition
+
+        if bridge["task"] is None or bridge["task"].done():
+            bridge["task"] = asyncio.get_running_loop().create_task(self.__run_bridge(bridge))
+        return done
+
+    async def wait(self) -> None:
+        '''The function `wait` waits until all transitions have finished.
+
+        '''
+        while True:
+            tasks: list[asyncio.Task] = [
+                bridge["task"] for bridge in self.bridges.values()
+                if bridge["task"] is not None and not bridge["task"].done()
+            ]
+            if not tasks:
+                return
+            await asyncio.gather(*tasks)
+
+    @staticmethod
+    def frames(attribute: str, start, end, duration: float, easing: Callable, rate: float) -> tuple[list[float], list[Payload]]:
+        '''The static function `frames` precomputes the frames of a transition of a single attribute.
+
+        Parameters
+        ----------
+        attribute : str
+            The `attribute` parameter is one of `ATTRIBUTES`.
+        start
+            The `start` parameter is the value the transition starts from.
+        end
+            The `end` parameter is the value the transition ends in.
+        duration : float
+            The `duration` parameter is the duration of the transition in seconds.
+        easing : Callable
+            The `easing` parameter is a function mapping progress values in [0, 1] to eased progress.
+        rate : float
+            The `rate` parameter is the number of frames per second.
+
+        Returns
+        -------
+            A tuple of the offsets in seconds of the frames from the start of the transition, and their
+        payloads. Frames encoding to the same payload as the previous frame are dropped, and the last
+        frame is always the end state.
+
+        '''
+        count: int = max(1, math.ceil(duration * rate))
+        progress = numpy.asarray(easing(numpy.arange(1, count + 1) / count), dtype=numpy.float64)
+
+        if attribute == "color":
+            first: int = Payloads.set_color(start)[5]
+            last: int = Payloads.set_color(end)[5]
+            # Hues wrap around, so the transition takes the shorter way around the color wheel
+            delta: int = (last - first + 128) % 256 - 128
+            rows = Payloads.hue_many(numpy.rint(first + delta * progress).astype(numpy.int64))
+            initial, final = Payloads.hue_many([first, last])
+        else:
+            encoder: Callable = {
+                "saturation": Payloads.saturation_many,
+                "brightness": Payloads.brightness_many,
+                "kelvin": Payloads.kelvin_many,
+            }[attribute]
+            rows = encoder(start + (end - start) * progress)
+            initial, final = encoder([start, end])
+
+        # The end state is reached exactly, whatever the easing curve returns
+        rows[-1] = final
+        changed = numpy.any(rows != numpy.vstack((initial, rows[:-1])), axis=1)
+
+        offsets: list[float] = (numpy.arange(1, count + 1)[changed] / count * duration).tolist()
+        payloads: list[Payload] = [Payload(row.tobytes()) for row in rows[changed]]
+        return offsets, payloads
+
+    def __get_bridge(self, device: dict) -> dict:
+        address: tuple[str, int] = Device.address_of(device)
+        bridge: dict = self.bridges.get(address)
+        if bridge is None:
+            bridge = {"device": device, "transitions": {}, "task": None}
+            self.bridges[address] = bridge
+        return bridge
+
+    @staticmethod
+    def __replace(bridge: dict, zone: Zone, attribute: str) -> None:
+        # Ends the running transitions of the attribute a new transition of the zone overlaps with
+        transitions: dict[tuple[Zone, str], dict] = bridge["transitions"]
+        if zone is Zone.ALL:
+            replaced: list[tuple[Zone, str]] = [key for key in transitions if key[1] == attribute]
+        else:
+            replaced = [(zone, attribute)]
+            shared: dict = transitions.pop((Zone.ALL, attribute), None)
+            if shared is not None:
+                # The transition of all zones continues on the other zones, and finishes with the last one
+                zones: list[Zone] = [single_zone for single_zone in Zone if single_zone not in (Zone.ALL, zone)]
+                remaining: list[int] = [len(zones)]
+
+                def finish() -> None:
+                    remaining[0] -= 1
+                    if remaining[0] == 0:
+                        shared["finish"]()
+
+                for single_zone in zones:
+                    transitions[(single_zone, attribute)] = dict(shared, zone=single_zone, finish=finish)
+
+        for key in replaced:
+            transition: dict = transitions.pop(key, None)
+            if transition is not None:
+                transition["finish"]()
+
+    async def __run_bridge(self, bridge: dict) -> None:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        interval: float = 1 / self.rate
+        next_frame: float = loop.time()
+
+        while bridge["transitions"]:
+            now: float = loop.time()
+            commands: list[tuple[Payload, Zone]] = []
+            finished: list[dict] = []
+
+            for key, transition in list(bridge["transitions"].items()):
+                if transition["started"] is None:
+                    transition["started"] = now
+
+                # Only the newest due frame is sent, frames the bridge fell behind on are skipped
+                index: int = bisect_right(transition["offsets"], now - transition["started"]) - 1
+                if index > transition["sent"]:
+                    commands.append((transition["payloads"][index], transition["zone"]))
+                    transition["sent"] = index
+
+                if transition["sent"] == len(transition["payloads"]) - 1:
+                    del bridge["transitions"][key]
+                    finished.append(transition)
+
+            if commands:
+                try:
+                    await self.controller.send_many(bridge["device"], commands, self.window)
+                except Exception as error:
+                    logger.exception("Stopping the transitions of %s:%s", *Device.address_of(bridge["device"]))
+                    finished.extend(bridge["transitions"].values())
+                    bridge["transitions"].clear()
+                    for transition in finished:
+                        if not transition["done"].done():
+                            transition["done"].set_exception(error)
+                    return
+            for transition in finished:
+                transition["finish"]()
+
+            next_frame += interval
+            delay: float = next_frame - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Behind schedule, continue from now instead of sending a burst of frames
+                next_frame = loop.time()
@@ -0,0 +1,96 @@
+import socket
+
+
+# The `Transport` class sends and receives the datagrams of a `Session`. This is the portable transport
+# making one system call per datagram, and the base class of transports batching several datagrams per
+# system call, see `MmsgTransport`. Datagrams are received into a preallocated buffer, so no buffer is
+# allocated per datagram. Like the socket of a session, a transport is only read by one thread at a
+# time, while several threads can send through it at once.
+class Transport:
+    # Size of the receive buffer, wifi-bridges never send datagrams this long
+    SIZE: int = 1024
+
+    def __init__(self) -> None:
+        '''The function initializes the transport and its receive buffer.
+
+        '''
+        self.buffer: bytearray = bytearray(self.SIZE)
+        self.view: memoryview = memoryview(self.buffer)
+
+    def send(self, sock: socket.socket, datagrams: list[bytes], address: tuple[str, int]) -> None:
+        '''The function `send` sends datagrams to the same address, in order.
+
+        Parameters
+        ----------
+        sock : socket.socket
+            The `sock` parameter is the UDP socket of the session.
+        datagrams : list[bytes]
+            The `datagrams` parameter is the list of datagrams to send.
+        address : tuple[str, int]
+            The `address` parameter is a tuple of the IP address and port number of the wifi-bridge.
+
+        '''
+        for datagram in datagrams:
+            sock.sendto(datagram, address)
+
+    def send_each(self, sock: socket.socket, messages: list[tuple[bytes, tuple[str, int]]]) -> None:
+        '''The function `send_each` sends datagrams to different addresses, in order, f.e. the packets of
+        a command to many bridges from one socket.
+
+        Parameters
+        ----------
+        sock : socket.socket
+            The `sock` parameter is the UDP socket the datagrams are sent from.
+        messages : list[tuple[bytes, tuple[str, int]]]
+            The `messages` parameter is the list of `(datagram, address)` tuples to send.
+
+        '''
+        for datagram, address in messages:
+            sock.sendto(datagram, address)
+
+    def receive(self, sock: socket.socket, timeout: float) -> list[bytes]:
+        '''The function `receive` waits for datagrams and returns the datagrams received.
+
+        Parameters
+        ----------
+        sock : socket.socket
+            The `sock` parameter is the UDP socket of the session.
+        timeout : float
+            The `timeout` parameter is the longest number of seconds to wait for the first datagram.
+
+        Returns
+        -------
+            A list of the datagrams received, at least one of them, or an empty list if none arrived
+        within the timeout.
+
+        '''
+        sock.settimeout(timeout)
+        try:
+            length, _ = sock.recvfrom_into(self.buffer)
+        except socket.timeout:
+            return []
+        return [bytes(self.view[:length])]
+
+    def receive_from(self, sock: socket.socket, timeout: float) -> list[tuple[bytes, tuple[str, int]]]:
+        '''The function `receive_from` waits for datagrams and returns the datagrams received with the
+        addresses they were sent from, see `receive`.
+
+        Parameters
+        ----------
+        sock : socket.socket
+            The `sock` parameter is the UDP socket the datagrams are received on.
+        timeout : float
+            The `timeout` parameter is the longest number of seconds to wait for the first datagram.
+
+        Returns
+        -------
+            A list of `(datagram, address)` tuples, at least one of them, or an empty list if none arrived
+        within the timeout.
+
+        '''
+        sock.settimeout(timeout)
+        try:
+            length, address = sock.recvfrom_into(self.buffer)
+        except socket.timeout:
+            return []
+        return [(bytes(self.view[:length]), address)]
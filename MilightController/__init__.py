@@ -1,6 +1,33 @@
+import logging
+
 from .MilightController import MilightController
+from .AsyncMilightController import AsyncMilightController
+from .BridgeEmulator import BridgeEmulator
 from .Commands import Commands
+from .CommandScheduler import CommandScheduler
+from .Daemon import Daemon
+from .Device import Device
+from .DeviceCache import DeviceCache
+from .DeviceIndex import DeviceIndex
+from .FanOut import FanOut
+from .FrameRenderer import FrameRenderer
+from .Group import Group
+from .Metrics import Metrics
+from .MmsgTransport import MmsgTransport
+from .Packet import Packet
+from .PacketCapture import PacketCapture
+from .Payload import Payload
+from .Payloads import Payloads
+from .RateLimiter import RateLimiter
+from .Reconciler import Reconciler
+from .SequenceSpace import SequenceSpace
+from .Session import Session
+from .ShardedController import ShardedController
+from .TransitionEngine import TransitionEngine
+from .Transport import Transport
 from .Zone import Zone
 
+logging.getLogger("MilightController").addHandler(logging.NullHandler())
+
 __version__ = '0.1.6'
 __name__ = "MilightController"
\ No newline at end of file
@@ -0,0 +1,333 @@
+import argparse
+import inspect
+import json
+import logging
+import os
+import shlex
+import string
+import subprocess
+import sys
+import time
+
+from MilightController.Daemon import Daemon
+from MilightController.Device import Device
+from MilightController.DeviceCache import DeviceCache
+from MilightController.Metrics import Metrics
+from MilightController.MilightController import MilightController
+from MilightController.Payload import Payload
+from MilightController.Payloads import Payloads
+from MilightController.Reconciler import Reconciler
+from MilightController.ShardedController import ShardedController
+from MilightController.Zone import Zone
+
+CACHE: str = os.path.join(os.path.expanduser("~"), ".cache", "MilightController", "devices.json")
+
+
+# Command line interface of the package, f.e.:
+#
+#   python -m MilightController discover
+#   python -m MilightController send --zone 1 brightness 50
+#   python -m MilightController scene --ip 192.168.0.10 --color "#ff8800" --brightness 70
+#   python -m MilightController batch commands.txt
+#   python -m MilightController daemon start
+#
+# Commands are sent to every cached device unless `--ip` is given. If a daemon is running, commands
+# are sent through it, so its warm sessions are reused.
+
+
+# Parser of the lines of a batch file, which raises errors instead of printing them and exiting, so
+# that they are reported with their line number
+class LineParser(argparse.ArgumentParser):
+    def error(self, message: str) -> None:
+        raise ValueError(message)
+
+
+def commands() -> list[str]:
+    '''The function `commands` lists the names of the `Payloads` methods usable with `send`.
+
+    '''
+    return sorted(
+        name for name, member in vars(Payloads).items()
+        if isinstance(member, staticmethod) and not name.startswith("_") and not name.endswith("_many")
+        and name != "hues"
+    )
+
+
+def parser(parser_class: type[argparse.ArgumentParser] = argparse.ArgumentParser) -> argparse.ArgumentParser:
+    '''The function `parser` builds the argument parser of the command line interface, of the class
+    `parser_class`.
+
+    '''
+    main: argparse.ArgumentParser = parser_class(
+        prog="python -m MilightController", description="Control MiLight / LimitlessLED lights"
+    )
+    main.add_argument("-v", "--verbose", action="count", default=0, help="log more, twice for packet dumps")
+    main.add_argument("--cache", default=CACHE, help="file the discovered devices are stored in")
+    main.add_argument("--socket", default=Daemon.SOCKET, help="Unix socket of the daemon")
+    main.add_argument("--no-daemon", action="store_true", help="never send through a running daemon")
+    main.add_argument("--timeout", type=int, default=3000, help="timeout in milliseconds")
+    subcommands = main.add_subparsers(dest="subcommand", required=True)
+
+    discover: argparse.ArgumentParser = subcommands.add_parser("discover", help="discover wifi-bridges")
+    discover.add_argument("--expected", type=int, help="stop once this many bridges answered")
+    discover.add_argument("--json", action="store_true", help="print the devices as JSON")
+
+    target: argparse.ArgumentParser = argparse.ArgumentParser(add_help=False)
+    target.add_argument("--ip", action="append", help="IP address of a bridge, all cached bridges by default")
+    target.add_argument("--port", type=int, default=5987, help="port number of the bridges")
+    target.add_argument("--zone", type=int, default=0, choices=range(5), help="zone 1-4, 0 for all zones")
+
+    send: argparse.ArgumentParser = subcommands.add_parser("send", parents=[target], help="send a command")
+    send.add_argument("command", choices=commands(), metavar="command", help="one of: " + ", ".join(commands()))
+    send.add_argument("arguments", nargs="*", help="arguments of the command")
+
+    scene: argparse.ArgumentParser = subcommands.add_parser("scene", parents=[target], help="set a lamp state")
+    scene.add_argument("--on", dest="on", action="store_true", default=None, help="turn the lamps on")
+    scene.add_argument("--off", dest="on", action="store_false", help="turn the lamps off")
+    scene.add_argument("--color", type=color, help="color, f.e. #ff8800")
+    scene.add_argument("--kelvin", type=int, help="white temperature in Kelvin")
+    scene.add_argument("--saturation", type=int, help="saturation 0-100")
+    scene.add_argument("--brightness", type=int, help="brightness 0-100")
+
+    batch: argparse.ArgumentParser = subcommands.add_parser(
+        "batch", help="run send and scene lines from a file, - for stdin, as one batch"
+    )
+    batch.add_argument("file", nargs="?", default="-")
+
+    daemon: argparse.ArgumentParser = subcommands.add_parser("daemon", help="run the daemon keeping sessions warm")
+    daemon.add_argument("action", choices=("run", "start", "stop", "status"), help="run in the foreground, "
+                        "start in the background, stop or query a running daemon")
+    daemon.add_argument("--http", metavar="HOST:PORT", help="also serve the HTTP JSON API, f.e. 127.0.0.1:8987")
+    daemon.add_argument("--processes", type=int, help="spread the bridges over this many worker processes")
+    return main
+
+
+def to_commands(arguments: argparse.Namespace, devices: list[Device]) -> list[tuple[Device, Payload, Zone]]:
+    '''The function `to_commands` turns a parsed `send` or `scene` line into commands for every device.
+
+    '''
+    zone: Zone = Zone(f"{arguments.zone:02d}")
+    if arguments.ip:
+        devices = [Device(ip, arguments.port) for ip in arguments.ip]
+
+    if arguments.subcommand == "send":
+        method = getattr(Payloads, arguments.command)
+        parameters: list[inspect.Parameter] = list(inspect.signature(method).parameters.values())
+        if len(arguments.arguments) != len(parameters):
+            raise ValueError(f"{arguments.command} takes {len(parameters)} argument(s), {len(arguments.arguments)} given")
+        values: list = [convert(parameter, value) for parameter, value in zip(parameters, arguments.arguments)]
+        payloads: list[Payload] = [method(*values)]
+    else:
+        target: dict = {
+            attribute: getattr(arguments, attribute)
+            for attribute in Reconciler.ATTRIBUTES
+            if getattr(arguments, attribute) is not None
+        }
+        payloads = list(Reconciler.encode(target).values())
+        if target.get("on") is False:
+            payloads = [Payloads.light_off()]
+
+    return [(device, payload, zone) for device in devices for payload in payloads]
+
+
+def convert(parameter: inspect.Parameter, value: str) -> object:
+    '''The function `convert` converts a command line argument to the type annotated on the parameter of
+    the `Payloads` method it is passed to, so f.e. the color "112233" stays a string.
+
+    '''
+    if parameter.name == "color":
+        return color(value)
+    if parameter.annotation in (int, float):
+        try:
+            return parameter.annotation(value)
+        except ValueError:
+            raise ValueError(f"{parameter.name} must be a number, got {value!r}") from None
+    return value
+
+
+def color(value: str) -> str:
+    '''The function `color` checks that a command line argument is a color accepted by
+    `Payloads.set_color`, f.e. "#ff8800" or "FF 88 00".
+
+    '''
+    digits: str = value.strip("#").replace(" ", "")
+    if len(digits) != 6 or not all(digit in string.hexdigits for digit in digits):
+        raise ValueError(f"color must be 6 hexadecimal digits, f.e. #ff8800, got {value!r}")
+    return value
+
+
+def read_batch(path: str) -> list[argparse.Namespace]:
+    '''The function `read_batch` parses every `send` and `scene` line of a file. Empty lines and lines
+    starting with "#" are skipped. The number of every line is stored in its `line` attribute, and
+    invalid lines raise a `ValueError` naming it.
+
+    '''
+    line_parser: argparse.ArgumentParser = parser(LineParser)
+    file = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    lines: list[argparse.Namespace] = []
+    try:
+        for number, line in enumerate(file, 1):
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            try:
+                arguments: argparse.Namespace = line_parser.parse_args(shlex.split(line))
+            except ValueError as error:
+                raise ValueError(f"line {number}: {error}") from None
+            if arguments.subcommand not in ("send", "scene"):
+                raise ValueError(f"line {number}: only send and scene can be batched")
+            arguments.line = number
+            lines.append(arguments)
+    finally:
+        if file is not sys.stdin:
+            file.close()
+    return lines
+
+
+def send(batch: list[tuple[Device, Payload, Zone]], arguments: argparse.Namespace) -> list[str]:
+    '''The function `send` sends a batch through the daemon if one is running, or directly otherwise.
+    The commands of every bridge are pipelined.
+
+    '''
+    if not arguments.no_daemon and Daemon.is_running(arguments.socket):
+        response: dict = Daemon.request(
+            {
+                "op": "send",
+                "commands": [
+                    {"ip": device["ip"], "port": device["port"], "payload": str(payload), "zone": zone.value}
+                    for device, payload, zone in batch
+                ],
+            },
+            arguments.socket,
+        )
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error"))
+        return response["responses"]
+
+    responses: list[str] = [None] * len(batch)
+    groups: dict[tuple[str, int], list[int]] = {}
+    for index, (device, _, _) in enumerate(batch):
+        groups.setdefault(device.address, []).append(index)
+
+    with MilightController(timeout=arguments.timeout) as controller:
+        for (ip, port), indexes in groups.items():
+            try:
+                results: list[str] = controller.send_commands(
+                    batch[indexes[0]][0], [(batch[index][1], batch[index][2]) for index in indexes]
+                )
+            except OSError as error:
+                print(f"Could not reach {ip}:{port}: {error}", file=sys.stderr)
+                continue
+            for index, result in zip(indexes, results):
+                responses[index] = result
+    return responses
+
+
+def known_devices(arguments: argparse.Namespace) -> list[Device]:
+    '''The function `known_devices` returns the cached devices, discovering them if the cache is empty.
+
+    '''
+    cache: DeviceCache = DeviceCache(arguments.cache)
+    if cache.devices:
+        return cache.values()
+    return discover(arguments, None)
+
+
+def discover(arguments: argparse.Namespace, expected: int) -> list[Device]:
+    os.makedirs(os.path.dirname(os.path.abspath(arguments.cache)), exist_ok=True)
+    controller: MilightController = MilightController(timeout=arguments.timeout, cache=arguments.cache)
+    return controller.discover(expected) or []
+
+
+def daemon(arguments: argparse.Namespace) -> int:
+    if arguments.action == "run":
+        http: tuple[str, int] = None
+        if arguments.http:
+            host, _, port = arguments.http.rpartition(":")
+            http = (host or "127.0.0.1", int(port))
+        # The metrics are served on /metrics of the HTTP API
+        metrics: Metrics = Metrics() if http is not None else None
+        if arguments.processes:
+            controller: MilightController = ShardedController(
+                arguments.processes, timeout=arguments.timeout, cache=arguments.cache, metrics=metrics
+            )
+        else:
+            controller = MilightController(timeout=arguments.timeout, cache=arguments.cache, metrics=metrics)
+        Daemon(controller, arguments.socket, http=http).serve_forever()
+        return 0
+
+    running: bool = Daemon.is_running(arguments.socket)
+    if arguments.action == "status":
+        print("running" if running else "stopped")
+        return 0 if running else 1
+
+    if arguments.action == "stop":
+        if running:
+            Daemon.request({"op": "shutdown"}, arguments.socket)
+        return 0
+
+    if not running:
+        subprocess.Popen(
+            [sys.executable, "-m", "MilightController", "--socket", arguments.socket, "--cache", arguments.cache,
+             "--timeout", str(arguments.timeout), "daemon", "run"] + (["--http", arguments.http] if arguments.http else [])
+            + (["--processes", str(arguments.processes)] if arguments.processes else []),
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+        )
+        deadline: float = time.monotonic() + 5
+        while not Daemon.is_running(arguments.socket):
+            if time.monotonic() > deadline:
+                print("The daemon did not start", file=sys.stderr)
+                return 1
+            time.sleep(0.05)
+    return 0
+
+
+def main(argv: list[str] = None) -> int:
+    arguments: argparse.Namespace = parser().parse_args(argv)
+    logging.basicConfig(
+        level=(logging.WARNING, logging.INFO, logging.DEBUG)[min(arguments.verbose, 2)],
+        format="%(asctime)s %(name)s %(levelname)s %(message)s",
+    )
+
+    if arguments.subcommand == "daemon":
+        return daemon(arguments)
+
+    if arguments.subcommand == "discover":
+        devices: list[Device] = discover(arguments, arguments.expected)
+        if arguments.json:
+            print(json.dumps([device.to_dict() for device in devices], indent=2))
+        else:
+            for device in devices:
+                print(f"{device['ip']}\t{device['mac']}\t{device['name']}")
+        return 0 if devices else 1
+
+    try:
+        lines: list[argparse.Namespace] = (
+            read_batch(arguments.file) if arguments.subcommand == "batch" else [arguments]
+        )
+        # The cache is only read, or the network searched, if a line is not addressed with --ip
+        devices = known_devices(arguments) if any(not line.ip for line in lines) else []
+        batch: list[tuple[Device, Payload, Zone]] = []
+        for line in lines:
+            try:
+                batch.extend(to_commands(line, devices))
+            except ValueError as error:
+                if not hasattr(line, "line"):
+                    raise
+                raise ValueError(f"line {line.line}: {error}") from None
+    except (OSError, ValueError) as error:
+        print(error, file=sys.stderr)
+        return 2
+
+    if not batch:
+        print("No devices to send to, run discover or pass --ip", file=sys.stderr)
+        return 1
+
+    responses: list[str] = send(batch, arguments)
+    failed: int = sum(response is None for response in responses)
+    for (device, payload, zone), response in zip(batch, responses):
+        print(f"{device['ip']}\t{zone.name}\t{payload}\t{'ok' if response is not None else 'no response'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
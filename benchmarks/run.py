@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+# The package is imported from the checkout the script is run from, f.e. `python benchmarks/run.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MilightController as package
+from MilightController import BridgeEmulator, Commands, Metrics, MilightController, Packet, Payload, Payloads, Zone
+from MilightController.Metrics import Histogram
+
+
+# Benchmarks of MilightController. Micro benchmarks time the command builders and the packet
+# assembly, macro benchmarks send commands to emulated bridges on localhost. The results are written
+# as JSON, so that two versions can be compared by diffing their results.
+
+# Latency buckets of the batch benchmarks, 5% apart from 10 microseconds to 20 seconds
+BUCKETS: tuple[float, ...] = tuple(1e-5 * 1.05 ** index for index in range(300))
+
+
+def micro(repeat: int) -> dict[str, float]:
+    '''The function `micro` times the encoding hot paths.
+
+    Returns
+    -------
+        A dictionary mapping the name of every benchmark to the best time per call in nanoseconds.
+
+    '''
+    packet: Packet = Packet(0x05, 0x00)
+    payload: Payload = Payloads.brightness(50)
+    sequence: list[int] = [0]
+    color: list[int] = [0]
+
+    def fill() -> None:
+        sequence[0] = (sequence[0] + 1) % 255
+        packet.fill(sequence[0], payload, Zone.ZONE_1)
+
+    def new_color() -> Payload:
+        # Steps through all 2^24 colors in an order that defeats the caches of the color conversion
+        color[0] = (color[0] + 0x9E3779) % 0x1000000
+        return Payloads.set_color(f"#{color[0]:06x}")
+
+    cases: dict[str, callable] = {
+        "Commands.light_on": Commands.light_on,
+        "Commands.brightness": lambda: Commands.brightness(50),
+        "Commands.kelvin": lambda: Commands.kelvin(4000),
+        "Commands.set_color": lambda: Commands.set_color("#af00ff"),
+        "Payloads.brightness": lambda: Payloads.brightness(50),
+        "Payloads.set_color": lambda: Payloads.set_color("#af00ff"),
+        "Payloads.set_color (new colors)": new_color,
+        "Payload.parse (str)": lambda: Payload.parse("31 00 00 08 03 32 00 00 00"),
+        "Packet.checksum": lambda: Packet.checksum(packet.buffer),
+        "Packet.fill": fill,
+        "MilightController.build_packet": lambda: MilightController.build_packet(
+            "05", "00", 1, "31 00 00 08 03 32 00 00 00", Zone.ZONE_1
+        ),
+    }
+
+    results: dict[str, float] = {}
+    for name, function in cases.items():
+        timer: timeit.Timer = timeit.Timer(function)
+        number, _ = timer.autorange()
+        best: float = min(timer.repeat(repeat, number)) / number
+        results[name] = round(best * 1e9, 1)
+    return results
+
+
+def summarize(latencies: list[float] | Histogram, elapsed: float, sent: int, acknowledged: int) -> dict[str, float]:
+    '''The function `summarize` computes the throughput and latency percentiles of a benchmark.
+
+    Parameters
+    ----------
+    latencies : list[float] | Histogram
+        The `latencies` parameter holds the latency of every acknowledged command in seconds, either
+    as a list or as a `Histogram` they were observed in.
+
+    '''
+    if isinstance(latencies, Histogram):
+        p50, p99 = latencies.quantile(0.5), latencies.quantile(0.99)
+        mean: float = latencies.sum / latencies.count if latencies.count else None
+    else:
+        latencies = sorted(latencies)
+        p50 = latencies[len(latencies) // 2] if latencies else None
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else None
+        mean = statistics.fmean(latencies) if latencies else None
+    return {
+        "commands": sent,
+        "acknowledged": acknowledged,
+        "elapsed_s": round(elapsed, 4),
+        "commands_per_s": round(sent / elapsed, 1) if elapsed else None,
+        "p50_ms": None if p50 is None else round(p50 * 1000, 3),
+        "p99_ms": None if p99 is None else round(p99 * 1000, 3),
+        "mean_ms": None if mean is None else round(mean * 1000, 3),
+    }
+
+
+def send_command(concurrency: int, loss: float, commands: int) -> dict[str, float]:
+    '''The function `send_command` sends commands one by one with `send_command`, each of `concurrency`
+    threads talking to its own emulated bridge.
+
+    '''
+    emulators: list[BridgeEmulator] = [
+        BridgeEmulator(port=0, loss=loss, seed=index).start() for index in range(concurrency)
+    ]
+    controller: MilightController = MilightController(timeout=1000, pacing=False)
+
+    def run(emulator: BridgeEmulator) -> tuple[list[float], int]:
+        latencies: list[float] = []
+        acknowledged: int = 0
+        for index in range(commands):
+            started: float = time.perf_counter()
+            try:
+                controller.send_command(emulator.device, Payloads.brightness(index % 101), Zone.ZONE_1)
+            except OSError:
+                continue
+            latencies.append(time.perf_counter() - started)
+            acknowledged += 1
+        return latencies, acknowledged
+
+    try:
+        # Handshakes are not part of the measurement
+        for emulator in emulators:
+            controller.get_session(emulator.device).ensure()
+
+        started: float = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as executor:
+            results: list[tuple[list[float], int]] = list(executor.map(run, emulators))
+        elapsed: float = time.perf_counter() - started
+    finally:
+        controller.close()
+        for emulator in emulators:
+            emulator.stop()
+
+    latencies: list[float] = [latency for result in results for latency in result[0]]
+    return summarize(latencies, elapsed, concurrency * commands, sum(result[1] for result in results))
+
+
+def send_commands(window: int, loss: float, commands: int) -> dict[str, float]:
+    '''The function `send_commands` sends a batch of commands with `send_commands`, keeping up to
+    `window` of them in flight. The latency of every command, from its first transmission until its
+    acknowledgment, is taken from the `Metrics` of the controller.
+
+    '''
+    emulator: BridgeEmulator = BridgeEmulator(port=0, loss=loss, seed=0).start()
+    metrics: Metrics = Metrics(buckets=BUCKETS)
+    controller: MilightController = MilightController(timeout=1000, pacing=False, metrics=metrics)
+    batch: list[tuple[Payload, Zone]] = [(Payloads.brightness(index % 101), Zone.ZONE_1) for index in range(commands)]
+
+    try:
+        controller.get_session(emulator.device).ensure()
+        # Handshakes are not part of the measurement
+        metrics.drain()
+        started: float = time.perf_counter()
+        responses: list[str] = controller.send_commands(emulator.device, batch, window)
+        elapsed: float = time.perf_counter() - started
+    finally:
+        controller.close()
+        emulator.stop()
+
+    acknowledged: int = sum(response is not None for response in responses)
+    histogram: Histogram = metrics.bridges[emulator.device.ip]["histograms"]["command_latency_seconds"]
+    return summarize(histogram, elapsed, commands, acknowledged)
+
+
+def macro(commands: int, concurrencies: list[int], windows: list[int], losses: list[float]) -> dict[str, list]:
+    '''The function `macro` sweeps the end-to-end benchmarks across concurrency, batch window and
+    simulated loss.
+
+    '''
+    results: dict[str, list] = {"send_command": [], "send_commands": []}
+    for loss in losses:
+        for concurrency in concurrencies:
+            result: dict = send_command(concurrency, loss, commands)
+            results["send_command"].append({"concurrency": concurrency, "loss": loss, **result})
+        for window in windows:
+            result = send_commands(window, loss, commands)
+            results["send_commands"].append({"window": window, "loss": loss, **result})
+    return results
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="Benchmarks of MilightController")
+    parser.add_argument("-o", "--output", help="file the JSON results are written to, stdout by default")
+    parser.add_argument("--quick", action="store_true", help="fewer commands and a smaller sweep")
+    parser.add_argument("--skip-micro", action="store_true", help="skip the micro benchmarks")
+    parser.add_argument("--skip-macro", action="store_true", help="skip the end-to-end benchmarks")
+    arguments: argparse.Namespace = parser.parse_args()
+
+    commands: int = 200 if arguments.quick else 1000
+    concurrencies: list[int] = [1, 4] if arguments.quick else [1, 4, 16]
+    windows: list[int] = [1, 16] if arguments.quick else [1, 4, 16, 64]
+    losses: list[float] = [0.0, 0.05] if arguments.quick else [0.0, 0.01, 0.05]
+
+    results: dict = {
+        "version": package.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    if not arguments.skip_micro:
+        results["micro_ns"] = micro(repeat=3 if arguments.quick else 5)
+    if not arguments.skip_macro:
+        results["macro"] = macro(commands, concurrencies, windows, losses)
+
+    output: str = json.dumps(results, indent=2)
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        sys.stdout.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+import pytest
+
+from MilightController import BridgeEmulator
+
+
+@pytest.fixture
+def emulator():
+    emulator: BridgeEmulator = BridgeEmulator(port=0).start()
+    yield emulator
+    emulator.stop()
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from MilightController import AsyncMilightController, BridgeEmulator, Payloads, Zone
+
+
+def test_commands_to_many_bridges_run_concurrently_on_one_loop():
+    emulators: list[BridgeEmulator] = [BridgeEmulator(port=0, latency=0.05) for _ in range(10)]
+
+    async def run() -> tuple[list[str], float]:
+        for emulator in emulators:
+            await emulator.serve()
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        try:
+            async with AsyncMilightController(timeout=1000, pacing=False) as controller:
+                await asyncio.gather(*(controller.send(emulator.device, Payloads.light_on()) for emulator in emulators))
+                started: float = loop.time()
+                responses: list[str] = await asyncio.gather(
+                    *(controller.send(emulator.device, Payloads.brightness(30), Zone.ZONE_2) for emulator in emulators)
+                )
+                return responses, loop.time() - started
+        finally:
+            for emulator in emulators:
+                emulator.stop()
+
+    responses, elapsed = asyncio.run(run())
+
+    assert None not in responses
+    # Sequentially the commands would take 10 round trips of 50 ms
+    assert elapsed < 0.25
+    for emulator in emulators:
+        assert emulator.zones[Zone.ZONE_2]["brightness"] == Payloads.brightness(30)[5]
+
+
+def test_send_many_returns_the_responses_in_order(emulator):
+    async def run() -> list[str]:
+        async with AsyncMilightController(timeout=1000, pacing=False) as controller:
+            commands = [(Payloads.light_on(), Zone.ZONE_3)] + [(Payloads.kelvin(level), Zone.ZONE_3) for level in range(20)]
+            return await controller.send_many(emulator.device, commands, window=1)
+
+    responses: list[str] = asyncio.run(run())
+    assert [bytes.fromhex(response)[6] for response in responses] == list(range(21))
+    assert emulator.zones[Zone.ZONE_3]["kelvin"] == Payloads.kelvin(19)[5]
+
+
+def test_silent_bridges_time_out():
+    async def run() -> None:
+        emulator: BridgeEmulator = await BridgeEmulator(port=0, loss=1.0).serve()
+        try:
+            async with AsyncMilightController(timeout=200) as controller:
+                await controller.send(emulator.device, Payloads.light_on())
+        finally:
+            emulator.stop()
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run())
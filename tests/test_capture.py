@@ -0,0 +1,80 @@
+import logging
+import struct
+
+from MilightController import MilightController, PacketCapture, Payloads, Zone
+
+
+def read_pcap(data: bytes) -> tuple[tuple, list[bytes]]:
+    header: tuple = struct.unpack_from("<IHHiIII", data)
+    records: list[bytes] = []
+    offset: int = 24
+    while offset < len(data):
+        _, _, length, original = struct.unpack_from("<IIII", data, offset)
+        assert length == original
+        records.append(data[offset + 16:offset + 16 + length])
+        offset += 16 + length
+    return header, records
+
+
+def ip_checksum(header: bytes) -> int:
+    total: int = sum(struct.unpack("!10H", header))
+    while total > 0xFFFF:
+        total = (total & 0xFFFF) + (total >> 16)
+    return total
+
+
+def test_the_traffic_is_written_to_a_pcap_file(emulator, tmp_path):
+    path: str = str(tmp_path / "traffic.pcap")
+    with PacketCapture(path) as capture:
+        with MilightController(timeout=1000, pacing=False, capture=capture) as controller:
+            batch = [(Payloads.light_on(), Zone.ZONE_1), (Payloads.brightness(40), Zone.ZONE_1)]
+            controller.send_commands(emulator.device, batch)
+
+    with open(path, "rb") as file:
+        header, records = read_pcap(file.read())
+
+    assert header[0] == 0xA1B2C3D4 and header[-1] == PacketCapture.LINKTYPE_RAW
+    # Session request and response, then two commands and their acknowledgments
+    assert len(records) == 6
+    for record in records:
+        assert record[0] == 0x45 and record[9] == 17
+        assert ip_checksum(record[:20]) == 0xFFFF
+        assert struct.unpack_from("!H", record, 24)[0] == len(record) - 20
+
+    payloads: list[bytes] = [record[28:] for record in records]
+    commands: list[bytes] = [payload for payload in payloads if payload[0] == 0x80]
+    assert [command[10:19] for command in commands] == [bytes(Payloads.light_on()), bytes(Payloads.brightness(40))]
+    assert sum(payload[0] == 0x88 for payload in payloads) == 2
+    # Commands are sent to the port of the bridge
+    assert all(struct.unpack_from("!H", record, 22)[0] == emulator.port for record in records if record[28] == 0x80)
+
+
+def test_a_capture_without_file_is_drained_into_another_one(emulator, tmp_path):
+    memory: PacketCapture = PacketCapture()
+    with MilightController(timeout=1000, pacing=False, capture=memory) as controller:
+        controller.send_command(emulator.device, Payloads.light_on(), Zone.ZONE_2)
+
+    records: bytes = memory.drain()
+    assert memory.drain() == b""
+
+    path: str = str(tmp_path / "merged.pcap")
+    with PacketCapture(path) as capture:
+        capture.append(records)
+    with open(path, "rb") as file:
+        assert len(read_pcap(file.read())[1]) == 4
+
+
+def test_packets_are_only_logged_at_debug_level(emulator, caplog, capsys):
+    with MilightController(timeout=1000, pacing=False) as controller:
+        with caplog.at_level(logging.INFO, logger="MilightController"):
+            controller.send_command(emulator.device, Payloads.light_on())
+        assert caplog.records == []
+
+        with caplog.at_level(logging.DEBUG, logger="MilightController"):
+            controller.send_command(emulator.device, Payloads.light_off())
+
+    messages: list[str] = [record.getMessage() for record in caplog.records]
+    assert any(message.startswith("Sent request: 80 00 00 00 11") for message in messages)
+    assert any(message.startswith("Received response: 88") for message in messages)
+    # Nothing is printed anymore
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,81 @@
+import pytest
+
+from MilightController import BridgeEmulator, Device, Payloads, Zone
+from MilightController.__main__ import main, parser, to_commands
+
+
+def commands(*argv: str) -> list:
+    return to_commands(parser().parse_args(argv), [])
+
+
+def test_arguments_are_converted_from_the_parameter_annotations():
+    assert commands("send", "brightness", "40", "--ip", "10.0.0.1") == [
+        (Device("10.0.0.1"), Payloads.brightness(40), Zone.ALL)
+    ]
+    # Colors consisting of digits stay strings
+    assert commands("send", "set_color", "112233", "--ip", "10.0.0.1", "--zone", "2") == [
+        (Device("10.0.0.1"), Payloads.set_color("112233"), Zone.ZONE_2)
+    ]
+
+
+@pytest.mark.parametrize("argv, message", [
+    (("brightness", "abc"), "brightness must be a number, got 'abc'"),
+    (("brightness",), "brightness takes 1 argument(s), 0 given"),
+    (("light_on", "1"), "light_on takes 0 argument(s), 1 given"),
+])
+def test_invalid_arguments_are_reported(argv, message, capsys):
+    assert main(["--no-daemon", "send", *argv, "--ip", "10.0.0.1"]) == 2
+    assert message in capsys.readouterr().err
+
+
+def test_send_reaches_the_bridge(tmp_path, capsys):
+    with BridgeEmulator(port=0) as emulator:
+        argv = ["--no-daemon", "--cache", str(tmp_path / "devices.json"), "--timeout", "1000"]
+        target = ["--ip", emulator.host, "--port", str(emulator.port), "--zone", "4"]
+        assert main([*argv, "send", "light_on", *target]) == 0
+        assert main([*argv, "send", "kelvin", "30", *target]) == 0
+
+    assert emulator.zones[Zone.ZONE_4]["on"] is True
+    assert emulator.zones[Zone.ZONE_4]["kelvin"] == Payloads.kelvin(30)[5]
+    assert emulator.zones[Zone.ZONE_1]["on"] is False
+    assert capsys.readouterr().out.count("\tok") == 2
+
+
+def test_invalid_colors_are_reported(capsys):
+    assert main(["--no-daemon", "send", "set_color", "#12345G", "--ip", "10.0.0.1"]) == 2
+    assert "color must be 6 hexadecimal digits" in capsys.readouterr().err
+
+    with pytest.raises(SystemExit):
+        main(["--no-daemon", "scene", "--color", "red", "--ip", "10.0.0.1"])
+    assert "invalid color value: 'red'" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("line, message", [
+    ("send brightness abc --ip 10.0.0.1", "line 3: brightness must be a number, got 'abc'"),
+    ("send dim 40 --ip 10.0.0.1", "line 3: argument command: invalid choice: 'dim'"),
+    ("scene --brightness --ip 10.0.0.1", "line 3: argument --brightness: expected one argument"),
+    ("send light_on --ip '10.0.0.1", "line 3: No closing quotation"),
+    ("discover", "line 3: only send and scene can be batched"),
+])
+def test_invalid_batch_lines_are_reported_with_their_number(line, message, tmp_path, capsys):
+    path = tmp_path / "commands.txt"
+    path.write_text(f"# Living room\nsend light_on --ip 10.0.0.1\n{line}\n")
+    assert main(["--no-daemon", "batch", str(path)]) == 2
+    assert message in capsys.readouterr().err
+
+
+def test_a_batch_reaches_the_bridge(tmp_path, capsys):
+    with BridgeEmulator(port=0) as emulator:
+        target = f"--ip {emulator.host} --port {emulator.port}"
+        path = tmp_path / "commands.txt"
+        path.write_text(
+            f"send light_on {target} --zone 1\n\n"
+            f"scene {target} --zone 2 --on --color '#00ff00' --brightness 30\n"
+            f"send brightness 70 {target} --zone 1\n"
+        )
+        assert main(["--no-daemon", "--timeout", "1000", "batch", str(path)]) == 0
+
+    assert emulator.zones[Zone.ZONE_1]["brightness"] == 70
+    assert emulator.zones[Zone.ZONE_2]["color"] == Payloads.set_color("#00ff00")[5]
+    assert emulator.zones[Zone.ZONE_2]["brightness"] == 30
+    assert capsys.readouterr().out.count("\tok") == 5
@@ -0,0 +1,133 @@
+import http.client
+import json
+import random
+import threading
+import time
+
+import pytest
+
+from MilightController import BridgeEmulator, Daemon, Metrics, MilightController, Payloads, Zone
+
+ON = Payloads.light_on()
+OFF = Payloads.light_off()
+DIM = Payloads.brightness(20)
+BRIGHT = Payloads.brightness(50)
+FASTER = Payloads.mode_speed_increase()
+
+
+def test_copies_without_anything_in_between_are_merged():
+    kept, mapping = Daemon.coalesce([(ON, Zone.ZONE_1), (ON, Zone.ZONE_1)])
+    assert kept == [(ON, Zone.ZONE_1)]
+    assert mapping == [0, 0]
+
+
+def test_copies_are_merged_past_commands_to_other_zones():
+    kept, mapping = Daemon.coalesce([(ON, Zone.ZONE_1), (BRIGHT, Zone.ZONE_2), (ON, Zone.ZONE_1)])
+    assert kept == [(BRIGHT, Zone.ZONE_2), (ON, Zone.ZONE_1)]
+    assert mapping == [1, 0, 1]
+
+
+def test_copies_are_not_merged_past_commands_to_the_same_zone():
+    commands = [(ON, Zone.ALL), (BRIGHT, Zone.ALL), (OFF, Zone.ALL), (ON, Zone.ALL)]
+    assert Daemon.coalesce(commands) == (commands, [0, 1, 2, 3])
+
+    commands = [(BRIGHT, Zone.ZONE_1), (DIM, Zone.ZONE_1), (BRIGHT, Zone.ZONE_1)]
+    assert Daemon.coalesce(commands) == (commands, [0, 1, 2])
+
+
+def test_copies_are_not_merged_past_commands_to_all_zones():
+    commands = [(BRIGHT, Zone.ZONE_1), (OFF, Zone.ALL), (BRIGHT, Zone.ZONE_1)]
+    assert Daemon.coalesce(commands) == (commands, [0, 1, 2])
+
+    commands = [(OFF, Zone.ALL), (BRIGHT, Zone.ZONE_3), (OFF, Zone.ALL)]
+    assert Daemon.coalesce(commands) == (commands, [0, 1, 2])
+
+
+def test_repeatable_commands_are_all_kept():
+    commands = [(FASTER, Zone.ZONE_1), (FASTER, Zone.ZONE_1)]
+    assert Daemon.coalesce(commands) == (commands, [0, 1])
+
+
+def test_coalescing_keeps_the_final_state_of_the_lamps():
+    choices = [ON, OFF, DIM, BRIGHT, FASTER]
+    zones = list(Zone)
+    generator: random.Random = random.Random(7)
+
+    def apply(commands) -> tuple:
+        emulator: BridgeEmulator = BridgeEmulator()
+        for payload, zone in commands:
+            emulator.apply(payload, int(zone.value))
+        return tuple(tuple(sorted(emulator.zones[zone].items())) for zone in zones if zone is not Zone.ALL)
+
+    for _ in range(500):
+        commands = [(generator.choice(choices), generator.choice(zones)) for _ in range(generator.randint(1, 12))]
+        kept, mapping = Daemon.coalesce(commands)
+        assert apply(kept) == apply(commands)
+        assert len(mapping) == len(commands)
+        assert all(kept[mapping[index]] == command for index, command in enumerate(commands))
+
+
+@pytest.fixture
+def daemon():
+    controller: MilightController = MilightController(timeout=1000, pacing=False, metrics=Metrics())
+    daemon: Daemon = Daemon(controller, None, http=("127.0.0.1", 0))
+    thread: threading.Thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    while not daemon.servers:
+        time.sleep(0.01)
+    yield daemon
+    daemon.shutdown()
+    thread.join(5)
+
+
+def request(daemon: Daemon, method: str, path: str, body: str = None, headers: dict = None) -> tuple:
+    host, port = daemon.servers[0].server_address[:2]
+    connection: http.client.HTTPConnection = http.client.HTTPConnection(host, port, timeout=5)
+    try:
+        connection.request(method, path, body, headers or {})
+        response: http.client.HTTPResponse = connection.getresponse()
+        return response.status, response.getheader("Allow"), response.read().decode("utf-8")
+    finally:
+        connection.close()
+
+
+def test_operations_are_posted_as_json(daemon, emulator):
+    body: str = json.dumps({"commands": [
+        {"ip": emulator.device.ip, "port": emulator.port, "payload": str(Payloads.light_on()), "zone": "02"}
+    ]})
+    status, _, text = request(daemon, "POST", "/send", body, {"Content-Type": "application/json"})
+    assert status == 200
+    assert json.loads(text)["responses"][0].startswith("88")
+    assert emulator.zones[Zone.ZONE_2]["on"] is True
+
+    status, _, text = request(daemon, "POST", "/ping", "", {"Content-Type": "application/json; charset=utf-8"})
+    assert status == 200 and json.loads(text)["ok"] is True
+
+
+def test_operations_are_refused_without_a_json_body(daemon, emulator):
+    body: str = json.dumps({"commands": [
+        {"ip": emulator.device.ip, "port": emulator.port, "payload": str(Payloads.light_on())}
+    ]})
+    # What a form on a web page could post to the daemon
+    status, _, _ = request(daemon, "POST", "/send", body, {"Content-Type": "application/x-www-form-urlencoded"})
+    assert status == 415
+    status, _, _ = request(daemon, "POST", "/send", body, {"Content-Type": "text/plain"})
+    assert status == 415
+    assert emulator.stats["received"] == 0
+
+
+@pytest.mark.parametrize("path", ["/send", "/shutdown", "/discover", "/"])
+def test_operations_cannot_be_requested_with_get(daemon, path):
+    status, allow, text = request(daemon, "GET", path)
+    assert status == 405 and allow == "POST"
+    assert json.loads(text)["ok"] is False
+    assert not daemon.stopped.is_set()
+
+
+def test_ping_and_metrics_are_served_with_get(daemon):
+    status, _, text = request(daemon, "GET", "/ping")
+    assert status == 200 and json.loads(text)["ok"] is True
+
+    status, _, text = request(daemon, "GET", "/metrics")
+    assert status == 200
+    assert "# TYPE milight_commands_total counter" in text
@@ -0,0 +1,83 @@
+import json
+import pickle
+
+import pytest
+
+from MilightController import Device, DeviceIndex, MilightController, Payloads, Session, Zone
+
+
+def test_devices_can_be_used_like_the_dictionaries_they_replace():
+    device: Device = Device("10.0.0.5", mac="AC:CF:23:00:00:01", name="HF-LPB100")
+    assert device["ip"] == "10.0.0.5" and device.get("port") == 5987
+    assert device.get("missing") is None
+    assert dict(device) == {
+        "ip": "10.0.0.5", "port": 5987, "mac": "AC:CF:23:00:00:01", "name": "HF-LPB100", "type": "v6"
+    }
+    assert device == dict(device)
+    assert json.loads(json.dumps(device.to_dict())) == dict(device)
+    with pytest.raises(KeyError):
+        device["address"]
+
+
+def test_devices_are_immutable_and_hashable_records():
+    device: Device = Device("10.0.0.5", mac="AC:CF:23:00:00:01")
+    assert device.address == ("10.0.0.5", 5987)
+    assert not hasattr(device, "__dict__")
+    with pytest.raises(AttributeError):
+        device.ip = "10.0.0.6"
+
+    moved: Device = device.replace(ip="10.0.0.6")
+    assert moved.address == ("10.0.0.6", 5987) and moved.mac == device.mac
+    assert {device: 1}[Device("10.0.0.5", mac="AC:CF:23:00:00:01")] == 1
+    assert pickle.loads(pickle.dumps(device)) == device
+
+
+def test_addresses_are_taken_from_devices_and_dictionaries():
+    device: Device = Device.from_dict({"ip": "10.0.0.5", "port": 5988, "extra": True})
+    assert Device.from_dict(device) is device
+    assert Device.address_of(device) == ("10.0.0.5", 5988)
+    assert Device.address_of({"ip": "10.0.0.7", "port": 5987}) == ("10.0.0.7", 5987)
+
+
+def test_sessions_have_no_dictionary():
+    session: Session = Session(("127.0.0.1", 5987))
+    assert not hasattr(session, "__dict__")
+    session.close()
+
+
+def test_the_index_finds_devices_by_mac_and_ip():
+    index: DeviceIndex = DeviceIndex()
+    device: Device = Device("10.0.0.5", mac="AC:CF:23:00:00:01")
+    assert index.add(device) is None
+    assert index.find("AC:CF:23:00:00:01") is device
+    assert index.find("ac:cf:23:00:00:01") is device
+    assert index.find("10.0.0.5") is device
+
+    # A bridge with a new IP address replaces its entry in both indexes
+    moved: Device = device.replace(ip="10.0.0.6")
+    assert index.add(moved) is device
+    assert index.find("10.0.0.6") is moved
+    assert index.find("10.0.0.5") is None
+    assert len(index) == 1
+
+
+def test_discovery_responses_carry_the_mac_address_as_text():
+    device: Device = MilightController.parse_device(b"10.0.0.5,ACCF23000001,HF-LPB100")
+    assert device.mac == "AC:CF:23:00:00:01"
+    assert device.name == "HF-LPB100"
+
+    controller: MilightController = MilightController()
+    controller.devices.add(device)
+    assert controller.find_device("AC:CF:23:00:00:01") is device
+    assert controller.find_device("ac:cf:23:00:00:01") is device
+    assert controller.find_device("10.0.0.5") is device
+
+
+def test_commands_are_sent_to_devices_and_dictionaries(emulator):
+    with MilightController(timeout=1000, pacing=False) as controller:
+        assert controller.send_command(emulator.device, Payloads.light_on(), Zone.ZONE_1) is not None
+        plain: dict = {"ip": emulator.device.ip, "port": emulator.device.port}
+        assert controller.send_command(plain, Payloads.brightness(30), Zone.ZONE_1) is not None
+
+    assert emulator.stats["sessions"] == 1
+    assert emulator.zones[Zone.ZONE_1]["brightness"] == 30
@@ -0,0 +1,115 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+from MilightController import AsyncMilightController, BridgeEmulator, MilightController
+
+
+# Answers discovery requests on behalf of several bridges, every answer is sent twice
+class Responder:
+    def __init__(self, devices: list[tuple[str, str]], interval: float = 0.0) -> None:
+        self.devices: list[tuple[str, str]] = devices
+        self.interval: float = interval
+        self.requests: int = 0
+        self.socket: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(("127.0.0.2", 0))
+        self.port: int = self.socket.getsockname()[1]
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self) -> None:
+        while True:
+            try:
+                data, address = self.socket.recvfrom(1024)
+            except OSError:
+                return
+            if data != BridgeEmulator.DISCOVERY_REQUEST:
+                continue
+            self.requests += 1
+            for ip, mac in list(self.devices):
+                for _ in range(2):
+                    self.socket.sendto(f"{ip},{mac},HF-LPB100".encode(), address)
+                time.sleep(self.interval)
+
+    def close(self) -> None:
+        self.socket.close()
+
+
+@pytest.fixture
+def responder():
+    responder: Responder = Responder([(f"10.0.0.{index}", f"ACCF23F57A{index:02X}") for index in range(1, 4)])
+    yield responder
+    responder.close()
+
+
+def test_devices_are_yielded_as_they_answer():
+    responder: Responder = Responder([("10.0.0.1", "ACCF23F57A01"), ("10.0.0.2", "ACCF23F57A02")], interval=0.2)
+    try:
+        controller: MilightController = MilightController(port=responder.port, address="127.0.0.2", timeout=2000)
+        started: float = time.monotonic()
+        devices = controller.discover_iter()
+        assert next(devices).ip == "10.0.0.1"
+        # The first device is yielded before the second one answered
+        assert time.monotonic() - started < 0.2
+        assert next(devices).ip == "10.0.0.2"
+        devices.close()
+    finally:
+        responder.close()
+
+
+def test_discovery_stops_once_the_expected_devices_answered(responder):
+    controller: MilightController = MilightController(port=responder.port, address="127.0.0.2", timeout=3000)
+    started: float = time.monotonic()
+    devices = controller.discover(expected=3)
+    assert time.monotonic() - started < 1.0
+
+    # Devices answering twice are listed once, in the order they answered
+    assert [device.ip for device in devices] == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+    assert controller.disco_results == devices
+    assert controller.disco_results[0].mac == "AC:CF:23:F5:7A:01"
+    assert [device["ip"] for device in controller.disco_results] == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+
+
+def test_discovered_devices_are_found_by_mac_and_ip(responder):
+    controller: MilightController = MilightController(port=responder.port, address="127.0.0.2", timeout=3000)
+    controller.discover(expected=3)
+    assert controller.find_device("AC:CF:23:F5:7A:02").ip == "10.0.0.2"
+    assert controller.find_device("ac:cf:23:f5:7a:02").ip == "10.0.0.2"
+    assert controller.find_device("10.0.0.3").mac == "AC:CF:23:F5:7A:03"
+    assert controller.find_device("10.0.0.9") is None
+
+    # A bridge with a new IP address replaces its entry
+    responder.devices[1] = ("10.0.0.7", "ACCF23F57A02")
+    controller.discover(expected=3)
+    assert [device.ip for device in controller.disco_results] == ["10.0.0.1", "10.0.0.7", "10.0.0.3"]
+    assert controller.find_device("AC:CF:23:F5:7A:02").ip == "10.0.0.7"
+    assert controller.find_device("10.0.0.2") is None
+
+
+def test_discovered_devices_are_cached(responder, tmp_path):
+    path: str = str(tmp_path / "devices.json")
+    MilightController(port=responder.port, address="127.0.0.2", timeout=3000, cache=path).discover(expected=3)
+    assert responder.requests == 1
+
+    controller: MilightController = MilightController(port=responder.port, address="127.0.0.2", cache=path)
+    devices = controller.discover(use_cache=True)
+    assert responder.requests == 1
+    assert sorted(device.ip for device in devices) == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+    assert controller.find_device("AC:CF:23:F5:7A:03").ip == "10.0.0.3"
+
+
+def test_devices_are_discovered_asynchronously(responder):
+    async def discover() -> list:
+        controller: AsyncMilightController = AsyncMilightController(
+            port=responder.port, address="127.0.0.2", timeout=3000
+        )
+        devices: list = [device async for device in controller.discover_iter(expected=3)]
+        assert controller.disco_results == devices
+        assert controller.devices.find("10.0.0.2").mac == "AC:CF:23:F5:7A:02"
+        return devices
+
+    devices: list = asyncio.run(discover())
+    assert [device.ip for device in devices] == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
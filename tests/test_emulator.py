@@ -0,0 +1,153 @@
+import asyncio
+import socket
+
+import pytest
+
+from MilightController import BridgeEmulator, MilightController, Payloads, Session, Zone
+
+
+@pytest.fixture
+def client():
+    client: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client.settimeout(0.5)
+    yield client
+    client.close()
+
+
+def exchange(client: socket.socket, emulator: BridgeEmulator, packet: bytes) -> bytes:
+    client.sendto(packet, emulator.device.address)
+    try:
+        return client.recv(1024)
+    except socket.timeout:
+        return None
+
+
+def command(emulator: BridgeEmulator, sequence_number: int, payload: bytes, zone: Zone = Zone.ALL) -> bytes:
+    return MilightController.build_packet(
+        format(emulator.wb1, "02X"), format(emulator.wb2, "02X"), sequence_number, payload, zone
+    )
+
+
+def test_sessions_are_handed_out_and_commands_acknowledged(emulator, client):
+    response: bytes = exchange(client, emulator, Session.SESSION_REQUEST)
+    assert response[:5] == bytes.fromhex("28 00 00 00 11")
+    assert response[7:13] == bytes.fromhex(emulator.mac)
+    assert (response[19], response[20]) == (emulator.wb1, emulator.wb2)
+
+    assert exchange(client, emulator, command(emulator, 7, Payloads.light_on(), Zone.ZONE_2)) == bytes.fromhex(
+        "88 00 00 00 03 00 07 00"
+    )
+    assert emulator.zones[Zone.ZONE_2]["on"] is True
+    assert emulator.zones[Zone.ZONE_1]["on"] is False
+    assert emulator.stats["sessions"] == 1 and emulator.stats["acknowledged"] == 1
+
+
+def test_invalid_packets_are_dropped(emulator, client):
+    packet: bytearray = bytearray(command(emulator, 1, Payloads.light_on()))
+    packet[21] ^= 0xFF
+    assert exchange(client, emulator, bytes(packet)) is None
+
+    wrong_session: str = format((emulator.wb1 + 1) % 256, "02X")
+    packet = bytearray(MilightController.build_packet(wrong_session, "00", 2, Payloads.light_on(), Zone.ALL))
+    assert exchange(client, emulator, bytes(packet)) is None
+
+    assert exchange(client, emulator, b"\x80\x00\x00\x00\x11") is None
+
+    assert emulator.stats["bad_checksum"] == 1
+    assert emulator.stats["bad_session"] == 1
+    assert emulator.stats["malformed"] == 1
+    assert emulator.stats["acknowledged"] == 0
+    assert emulator.zones[Zone.ZONE_1]["on"] is False
+
+
+def test_lamps_that_are_off_only_react_to_being_turned_on():
+    emulator: BridgeEmulator = BridgeEmulator()
+    emulator.apply(Payloads.brightness(40), 1)
+    emulator.apply(Payloads.set_color("#FF0000"), 1)
+    assert emulator.zones[Zone.ZONE_1]["brightness"] is None
+    assert emulator.zones[Zone.ZONE_1]["color"] is None
+
+    emulator.apply(Payloads.night_light_on(), 1)
+    assert emulator.zones[Zone.ZONE_1]["on"] is True and emulator.zones[Zone.ZONE_1]["night"] is True
+    emulator.apply(Payloads.light_on(), 0)
+    emulator.apply(Payloads.brightness(40), 0)
+    emulator.apply(Payloads.kelvin(6500), 3)
+    for zone, state in emulator.zones.items():
+        assert state["on"] is True and state["night"] is False
+        assert state["brightness"] == 40
+        assert state["white"] is (zone is Zone.ZONE_3)
+
+    emulator.apply(Payloads.light_off(), 0)
+    emulator.apply(Payloads.brightness(90), 0)
+    assert all(state["brightness"] == 40 for state in emulator.zones.values())
+
+
+def test_the_bridge_lamp_and_pairing_are_emulated():
+    emulator: BridgeEmulator = BridgeEmulator()
+    emulator.apply(Payloads.wifi_bridge_lamp_on(), 0)
+    emulator.apply(Payloads.wifi_bridge_brightness(30), 0)
+    emulator.apply(Payloads.wifi_bridge_mode_speed_increase(), 0)
+    assert emulator.bridge_lamp["on"] is True
+    assert emulator.bridge_lamp["brightness"] == 30
+    assert emulator.bridge_lamp["speed"] == 1
+    assert emulator.zones[Zone.ZONE_1]["on"] is False
+
+    emulator.apply(Payloads.link(), 4)
+    assert [state["linked"] for state in emulator.zones.values()] == [False, False, False, True]
+    emulator.apply(Payloads.unlink(), 0)
+    assert not any(state["linked"] for state in emulator.zones.values())
+
+
+def test_loss_and_rate_limits_drop_packets(client):
+    with BridgeEmulator(port=0, loss=1.0) as emulator:
+        assert exchange(client, emulator, Session.SESSION_REQUEST) is None
+        assert emulator.stats["lost"] == 1
+
+    with BridgeEmulator(port=0, rate=1, burst=2) as emulator:
+        for _ in range(5):
+            client.sendto(Session.SESSION_REQUEST, emulator.device.address)
+        answered: int = 0
+        try:
+            while client.recv(1024):
+                answered += 1
+        except socket.timeout:
+            pass
+        assert emulator.stats["rate_limited"] >= 3
+        assert answered == 5 - emulator.stats["rate_limited"]
+
+
+def test_discovery_requests_are_answered(client):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        discovery_port: int = probe.getsockname()[1]
+
+    with BridgeEmulator(port=0, discovery_port=discovery_port, mac="ACCF23000001", name="Bridge") as emulator:
+        client.sendto(BridgeEmulator.DISCOVERY_REQUEST, ("127.0.0.1", discovery_port))
+        device = MilightController.parse_device(client.recv(1024))
+        assert device.ip == "127.0.0.1"
+        assert device.mac == "AC:CF:23:00:00:01"
+        assert device.name == "Bridge"
+        assert emulator.device.port == emulator.port
+
+
+def test_an_emulator_can_be_served_on_the_running_loop():
+    async def run() -> tuple:
+        emulator: BridgeEmulator = await BridgeEmulator(port=0, latency=0.01).serve()
+        try:
+            loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+            received: asyncio.Future = loop.create_future()
+
+            class Client(asyncio.DatagramProtocol):
+                def datagram_received(self, data: bytes, address: tuple) -> None:
+                    received.set_result(data)
+
+            transport, _ = await loop.create_datagram_endpoint(Client, remote_addr=emulator.device.address)
+            transport.sendto(Session.SESSION_REQUEST)
+            response: bytes = await asyncio.wait_for(received, 1.0)
+            transport.close()
+            return response, emulator.wb1, emulator.wb2
+        finally:
+            emulator.stop()
+
+    response, wb1, wb2 = asyncio.run(run())
+    assert (response[19], response[20]) == (wb1, wb2)
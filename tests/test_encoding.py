@@ -0,0 +1,175 @@
+import pytest
+
+from MilightController import Commands, Payload, Payloads
+
+
+# Reference implementations of the hex string encoders `Commands` had before it was built on
+# `Payloads`, the binary payloads must stay byte for byte identical to them.
+def old_percentage_to_hex(percent) -> str:
+    return format(int(percent / 100 * 100), '02X')
+
+
+def old_KV_to_hex(KV) -> str:
+    return format(int((KV - 2700) / (6500 - 2700) * 100), '02X')
+
+
+def old_hex_to_hue(hex_color: str) -> str:
+    hex_color = hex_color.strip("#").replace(" ", "")
+    r = int(hex_color[0:2], 16) / 255
+    g = int(hex_color[2:4], 16) / 255
+    b = int(hex_color[4:6], 16) / 255
+    max_val = max(r, g, b)
+    delta = max_val - min(r, g, b)
+    if delta == 0:
+        hue = 0
+    elif max_val == r:
+        hue = ((g - b) / delta) % 6
+    elif max_val == g:
+        hue = ((b - r) / delta) + 2
+    else:
+        hue = ((r - g) / delta) + 4
+    hue *= 60
+    return format(int(hue / 360 * 255), '02X')
+
+
+COLORS = [
+    "#FF0000", "#00FF00", "#0000FF", "#FFFFFF", "#000000", "#af00ff", "#AF 00 FF", "af00ff",
+    "12 34 56", "#FF00FE", "#7F7F80", "#00FFFF", "#FFFF00", "#FF8000", "#010203",
+]
+
+FIXED = {
+    "light_on": "31 00 00 08 04 01 00 00 00",
+    "light_off": "31 00 00 08 04 02 00 00 00",
+    "night_light_on": "31 00 00 08 04 05 00 00 00",
+    "white_light_on": "31 00 00 08 05 64 00 00 00",
+    "mode_speed_decrease": "31 00 00 08 04 04 00 00 00",
+    "mode_speed_increase": "31 00 00 08 04 03 00 00 00",
+    "link": "3D 00 00 08 00 00 00 00 00",
+    "unlink": "3E 00 00 08 00 00 00 00 00",
+    "wifi_bridge_lamp_on": "31 00 00 00 03 03 00 00 00",
+    "wifi_bridge_lamp_off": "31 00 00 00 03 04 00 00 00",
+    "wifi_bridge_mode_speed_decrease": "31 00 00 00 03 01 00 00 00",
+    "wifi_bridge_mode_speed_increase": "31 00 00 00 03 02 00 00 00",
+    "wifi_bridge_set_color_to_white": "31 00 00 00 03 05 00 00 00",
+}
+
+
+def assert_same(payload: Payload, command: str, old: str) -> None:
+    assert isinstance(payload, Payload)
+    assert command == old
+    assert bytes(payload) == bytes.fromhex(old)
+    assert Payload.parse(command) == payload
+
+
+@pytest.mark.parametrize("name", sorted(FIXED))
+def test_fixed_commands_match_the_old_encoders(name):
+    assert_same(getattr(Payloads, name)(), getattr(Commands, name)(), FIXED[name])
+
+
+def test_levels_match_the_old_encoders():
+    for level in range(-5, 106):
+        clamped = max(0, min(100, level))
+        assert_same(
+            Payloads.brightness(level),
+            Commands.brightness(level),
+            "31 00 00 08 03 {} 00 00 00".format(old_percentage_to_hex(clamped)),
+        )
+        assert_same(
+            Payloads.saturation(level),
+            Commands.saturation(level),
+            "31 00 00 08 02 {} 00 00 00".format(old_percentage_to_hex(100 - clamped)),
+        )
+        assert_same(
+            Payloads.wifi_bridge_brightness(level),
+            Commands.wifi_bridge_brightness(level),
+            "31 00 00 00 02 {} 00 00 00".format(old_percentage_to_hex(clamped)),
+        )
+
+
+def test_fractional_levels_match_the_old_encoders():
+    for level in (0.5, 12.3, 49.99, 99.9):
+        assert_same(
+            Payloads.brightness(level),
+            Commands.brightness(level),
+            "31 00 00 08 03 {} 00 00 00".format(old_percentage_to_hex(level)),
+        )
+
+
+def test_kelvin_matches_the_old_encoder():
+    for temp in range(2700, 6501):
+        assert_same(
+            Payloads.kelvin(temp), Commands.kelvin(temp), "31 00 00 08 05 {} 00 00 00".format(old_KV_to_hex(temp))
+        )
+    assert bytes(Payloads.kelvin(5000.5)) == bytes.fromhex("31 00 00 08 05 {} 00 00 00".format(old_KV_to_hex(5000.5)))
+
+
+def test_kelvin_out_of_range_is_clamped():
+    assert Payloads.kelvin(1000) == Payloads.kelvin(2700)
+    assert Payloads.kelvin(10000) == Payloads.kelvin(6500)
+
+
+@pytest.mark.parametrize("color", COLORS)
+def test_colors_match_the_old_encoder(color):
+    hue = old_hex_to_hue(color)
+    assert_same(
+        Payloads.set_color(color), Commands.set_color(color), "31 00 00 08 01 {0} {0} {0} {0}".format(hue)
+    )
+    assert_same(
+        Payloads.wifi_bridge_set_color(color),
+        Commands.wifi_bridge_set_color(color),
+        "31 00 00 00 01 {0} {0} {0} {0}".format(hue),
+    )
+
+
+def test_modes_match_the_old_encoders():
+    for mode in range(1, 10):
+        assert_same(
+            Payloads.mode_number(mode), Commands.mode_number(mode), "31 00 00 08 06 {:02X} 00 00 00".format(mode)
+        )
+        assert_same(
+            Payloads.wifi_bridge_mode_number(mode),
+            Commands.wifi_bridge_mode_number(mode),
+            "31 00 00 00 04 {:02X} 00 00 00".format(mode),
+        )
+
+
+def test_payloads_are_immutable_and_parse_both_formats():
+    payload = Payloads.brightness(50)
+    assert Payload.parse("31 00 00 08 03 32 00 00 00") == payload
+    assert Payload.parse(bytes(payload)) == payload
+    assert str(payload) == "31 00 00 08 03 32 00 00 00"
+    with pytest.raises(TypeError):
+        payload[5] = 0
+
+
+def test_many_encoders_match_the_scalar_encoders():
+    numpy = pytest.importorskip("numpy")
+
+    levels = numpy.arange(-5, 106)
+    for many, scalar in (
+        (Payloads.brightness_many, Payloads.brightness),
+        (Payloads.saturation_many, Payloads.saturation),
+    ):
+        rows = many(levels)
+        assert rows.shape == (len(levels), Payload.LENGTH) and rows.dtype == numpy.uint8
+        for level, row in zip(levels, rows):
+            assert bytes(row) == bytes(scalar(int(level)))
+
+    temps = numpy.arange(2000, 7001, 7)
+    for temp, row in zip(temps, Payloads.kelvin_many(temps)):
+        assert bytes(row) == bytes(Payloads.kelvin(int(temp)))
+
+
+def test_colors_many_match_the_scalar_encoder():
+    numpy = pytest.importorskip("numpy")
+
+    rgb = numpy.random.default_rng(7).integers(0, 256, size=(500, 3))
+    rgb[:3] = [(255, 0, 0), (0, 0, 0), (128, 128, 128)]
+    colors = ["{:02X}{:02X}{:02X}".format(*color) for color in rgb]
+
+    hues = Payloads.hues(rgb)
+    assert [int(hue) for hue in hues] == [int(old_hex_to_hue(color), 16) for color in colors]
+    for color, row in zip(colors, Payloads.set_color_many(rgb)):
+        assert Payload(row) == Payloads.set_color(color)
+    assert numpy.array_equal(Payloads.hue_many(hues), Payloads.set_color_many(rgb))
+    assert bytes(Payloads.hue_many([256 + 3])[0]) == bytes(Payloads.hue_many([3])[0])
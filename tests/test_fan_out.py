@@ -0,0 +1,69 @@
+import time
+
+from MilightController import BridgeEmulator, MilightController, Payloads, Zone
+
+
+def start_emulators(count: int, **options) -> list[BridgeEmulator]:
+    return [BridgeEmulator(host=f"127.0.0.{index}", port=0, **options).start() for index in range(2, 2 + count)]
+
+
+def stop_emulators(emulators: list[BridgeEmulator]) -> None:
+    for emulator in emulators:
+        emulator.stop()
+
+
+def test_a_batch_is_sent_to_all_devices_concurrently():
+    emulators: list[BridgeEmulator] = start_emulators(8, latency=0.05)
+    batch = [(Payloads.light_on(), Zone.ZONE_1), (Payloads.brightness(30), Zone.ZONE_1)]
+    try:
+        with MilightController(timeout=1000, pacing=False, workers=8) as controller:
+            started: float = time.monotonic()
+            results: dict = controller.fan_out([emulator.device for emulator in emulators], batch, window=1)
+            elapsed: float = time.monotonic() - started
+    finally:
+        stop_emulators(emulators)
+
+    assert sorted(results) == sorted(emulator.device.address for emulator in emulators)
+    for emulator in emulators:
+        result: dict = results[emulator.device.address]
+        assert result["error"] is None
+        assert len(result["responses"]) == 2 and None not in result["responses"]
+        assert result["elapsed"] > 0
+        assert emulator.zones[Zone.ZONE_1]["brightness"] == Payloads.brightness(30)[5]
+    # One after the other, 8 devices take 8 handshakes and 16 commands of 50 ms each
+    assert elapsed < 8 * 3 * 0.05 / 2
+
+
+def test_every_device_gets_its_own_batch():
+    emulators: list[BridgeEmulator] = start_emulators(3)
+    batches: dict = {
+        emulator.device.address: [(Payloads.light_on(), Zone.ZONE_2), (Payloads.brightness(10 * index), Zone.ZONE_2)]
+        for index, emulator in enumerate(emulators)
+    }
+    try:
+        with MilightController(timeout=1000, pacing=False) as controller:
+            results: dict = controller.fan_out([emulator.device for emulator in emulators], batches)
+    finally:
+        stop_emulators(emulators)
+
+    for index, emulator in enumerate(emulators):
+        assert results[emulator.device.address]["error"] is None
+        assert emulator.zones[Zone.ZONE_2]["brightness"] == Payloads.brightness(10 * index)[5]
+        assert emulator.zones[Zone.ZONE_1]["on"] is False
+
+
+def test_a_dead_bridge_is_reported_without_failing_the_others():
+    emulators: list[BridgeEmulator] = start_emulators(3)
+    emulators[1].loss = 1.0
+    batch = [(Payloads.light_on(), Zone.ZONE_1), (Payloads.light_off(), Zone.ZONE_1)]
+    try:
+        with MilightController(timeout=100, retries=1, pacing=False) as controller:
+            results: dict = controller.fan_out([emulator.device for emulator in emulators], batch)
+    finally:
+        stop_emulators(emulators)
+
+    assert isinstance(results[emulators[1].device.address]["error"], TimeoutError)
+    assert results[emulators[1].device.address]["responses"] is None
+    for emulator in (emulators[0], emulators[2]):
+        assert results[emulator.device.address]["error"] is None
+        assert None not in results[emulator.device.address]["responses"]
@@ -0,0 +1,116 @@
+import pytest
+
+from MilightController import BridgeEmulator, Device, FrameRenderer, MilightController, Payloads, Zone
+
+numpy = pytest.importorskip("numpy")
+
+RED: tuple[int, int, int] = (255, 0, 0)
+DIM_GREEN: tuple[int, int, int] = (0, 128, 0)
+BLACK: tuple[int, int, int] = (0, 0, 0)
+
+
+def renderer(count: int) -> FrameRenderer:
+    devices: list[Device] = [Device(f"10.0.0.{index}") for index in range(1, count + 1)]
+    return FrameRenderer(devices, controller=object())
+
+
+def frame(*bridges: list[tuple[int, int, int]]) -> "numpy.ndarray":
+    return numpy.array(bridges, dtype=numpy.uint8)
+
+
+def test_frames_are_encoded_into_on_hue_and_brightness():
+    encoded = FrameRenderer.encode(frame([RED, DIM_GREEN, BLACK, (255, 255, 255)]))
+    assert encoded.shape == (3, 1, 4)
+    assert encoded[FrameRenderer.ON].tolist() == [[1, 1, 0, 1]]
+    hues: list[int] = [Payloads.set_color("#FF0000")[5], Payloads.set_color("#00FF00")[5]]
+    assert encoded[FrameRenderer.HUE, 0, :2].tolist() == hues
+    assert encoded[FrameRenderer.BRIGHTNESS].tolist() == [[100, 50, 0, 100]]
+
+    with pytest.raises(ValueError):
+        FrameRenderer.encode(numpy.zeros((2, 3, 3)))
+
+
+def test_zones_agreeing_are_addressed_with_a_single_packet():
+    lamps: FrameRenderer = renderer(2)
+    commands: dict = lamps.render(frame([RED] * 4, [RED, RED, DIM_GREEN, RED]))
+
+    assert commands[("10.0.0.1", 5987)] == [
+        (Payloads.light_on(), Zone.ALL),
+        (Payloads.set_color("#FF0000"), Zone.ALL),
+        (Payloads.brightness(100), Zone.ALL),
+    ]
+    # The on/off state agrees, hue and brightness do not
+    assert commands[("10.0.0.2", 5987)] == [
+        (Payloads.light_on(), Zone.ALL),
+        (Payloads.set_color("#FF0000"), Zone.ZONE_1),
+        (Payloads.set_color("#FF0000"), Zone.ZONE_2),
+        (Payloads.set_color("#00FF00"), Zone.ZONE_3),
+        (Payloads.set_color("#FF0000"), Zone.ZONE_4),
+        (Payloads.brightness(100), Zone.ZONE_1),
+        (Payloads.brightness(100), Zone.ZONE_2),
+        (Payloads.brightness(50), Zone.ZONE_3),
+        (Payloads.brightness(100), Zone.ZONE_4),
+    ]
+
+
+def test_only_changes_are_sent():
+    lamps: FrameRenderer = renderer(2)
+    lamps.render(frame([RED] * 4, [RED] * 4))
+    assert lamps.render(frame([RED] * 4, [RED] * 4)) == {}
+
+    assert lamps.render(frame([RED] * 4, [RED, (128, 0, 0), RED, RED])) == {
+        ("10.0.0.2", 5987): [(Payloads.brightness(50), Zone.ZONE_2)]
+    }
+
+    lamps.reset()
+    assert len(lamps.render(frame([RED] * 4, [RED] * 4))[("10.0.0.1", 5987)]) == 3
+
+
+def test_black_zones_are_turned_off_last_and_keep_their_color():
+    lamps: FrameRenderer = renderer(1)
+    lamps.render(frame([RED] * 4))
+
+    assert lamps.render(frame([BLACK, BLACK, DIM_GREEN, DIM_GREEN])) == {
+        ("10.0.0.1", 5987): [
+            (Payloads.set_color("#00FF00"), Zone.ZONE_3),
+            (Payloads.set_color("#00FF00"), Zone.ZONE_4),
+            (Payloads.brightness(50), Zone.ZONE_3),
+            (Payloads.brightness(50), Zone.ZONE_4),
+            (Payloads.light_off(), Zone.ZONE_1),
+            (Payloads.light_off(), Zone.ZONE_2),
+        ]
+    }
+    # Turning a zone on again only sends what changed while it was off
+    assert lamps.render(frame([RED, BLACK, DIM_GREEN, DIM_GREEN])) == {
+        ("10.0.0.1", 5987): [(Payloads.light_on(), Zone.ZONE_1)]
+    }
+
+
+def test_frames_must_hold_every_bridge():
+    with pytest.raises(ValueError):
+        renderer(2).render(frame([RED] * 4))
+
+
+def test_frames_are_sent_and_values_not_acknowledged_are_sent_again():
+    emulators: list[BridgeEmulator] = [BridgeEmulator(host=f"127.0.0.{index}", port=0).start() for index in (2, 3)]
+    emulators[1].loss = 1.0
+    try:
+        with MilightController(timeout=100, retries=1, pacing=False) as controller:
+            lamps: FrameRenderer = FrameRenderer([emulator.device for emulator in emulators], controller)
+            results: dict = lamps.send(frame([RED, RED, DIM_GREEN, RED], [RED] * 4))
+            assert results[emulators[0].device.address]["error"] is None
+            assert results[emulators[1].device.address]["error"] is not None
+
+            emulators[1].loss = 0.0
+            results = lamps.send(frame([RED, RED, DIM_GREEN, RED], [RED] * 4))
+            assert list(results) == [emulators[1].device.address]
+            assert len(results[emulators[1].device.address]["responses"]) == 3
+    finally:
+        for emulator in emulators:
+            emulator.stop()
+
+    states: list[dict] = list(emulators[0].zones.values())
+    colors: tuple[str, ...] = ("#FF0000", "#FF0000", "#00FF00", "#FF0000")
+    assert [state["color"] for state in states] == [Payloads.set_color(color)[5] for color in colors]
+    assert [state["brightness"] for state in states] == [100, 100, 50, 100]
+    assert all(state["on"] and state["brightness"] == 100 for state in emulators[1].zones.values())
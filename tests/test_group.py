@@ -0,0 +1,63 @@
+from MilightController import BridgeEmulator, Commands, Device, Group, MilightController, Payloads, Zone
+
+FIRST: Device = Device("10.0.0.1")
+SECOND: Device = Device("10.0.0.2")
+
+
+def test_bridges_covered_by_the_group_get_a_single_packet():
+    group: Group = Group([SECOND, (FIRST, Zone.ZONE_3), (FIRST, Zone.ZONE_1)], name="Kitchen")
+    assert group.plan == ((FIRST, (Zone.ZONE_1, Zone.ZONE_3)), (SECOND, (Zone.ALL,)))
+    assert group.devices == [FIRST, SECOND]
+    assert len(group) == 3
+    assert repr(group) == "Group('Kitchen', 2 bridges, 3 packets per command)"
+
+    # Four single zones collapse as well
+    zones: Group = Group([(FIRST, zone) for zone in (Zone.ZONE_4, Zone.ZONE_2, Zone.ZONE_3, Zone.ZONE_1)])
+    assert zones.plan == ((FIRST, (Zone.ALL,)),)
+
+
+def test_groups_and_dictionaries_can_be_members():
+    kitchen: Group = Group([(FIRST, Zone.ZONE_1)])
+    house: Group = Group([kitchen, ({"ip": "10.0.0.1", "port": 5987}, Zone.ZONE_2), {"ip": "10.0.0.2"}])
+    assert house.plan == ((FIRST, (Zone.ZONE_1, Zone.ZONE_2)), (SECOND, (Zone.ALL,)))
+
+
+def test_plans_are_shared_by_groups_with_the_same_members():
+    Group.optimize.cache_clear()
+    first: Group = Group([(FIRST, Zone.ZONE_1), (SECOND, Zone.ALL)])
+    second: Group = Group([SECOND, (FIRST, Zone.ZONE_1)])
+    assert second.plan is first.plan
+    assert Group.optimize.cache_info().hits == 1
+
+
+def test_every_command_reaches_all_zones_before_the_next_one():
+    group: Group = Group([(FIRST, Zone.ZONE_1), (FIRST, Zone.ZONE_2), SECOND])
+    assert group.commands([Commands.light_on(), Payloads.brightness(20)]) == {
+        FIRST.address: [
+            (Payloads.light_on(), Zone.ZONE_1),
+            (Payloads.light_on(), Zone.ZONE_2),
+            (Payloads.brightness(20), Zone.ZONE_1),
+            (Payloads.brightness(20), Zone.ZONE_2),
+        ],
+        SECOND.address: [(Payloads.light_on(), Zone.ALL), (Payloads.brightness(20), Zone.ALL)],
+    }
+    assert group.commands(Commands.light_off()) == {
+        FIRST.address: [(Payloads.light_off(), Zone.ZONE_1), (Payloads.light_off(), Zone.ZONE_2)],
+        SECOND.address: [(Payloads.light_off(), Zone.ALL)],
+    }
+
+
+def test_a_group_is_sent_to_all_of_its_bridges():
+    emulators: list[BridgeEmulator] = [BridgeEmulator(host=f"127.0.0.{index}", port=0).start() for index in (2, 3)]
+    group: Group = Group([(emulators[0].device, Zone.ZONE_2), emulators[1].device])
+    try:
+        with MilightController(timeout=1000, pacing=False) as controller:
+            results: dict = group.send(controller, [Payloads.light_on(), Payloads.brightness(30)])
+    finally:
+        for emulator in emulators:
+            emulator.stop()
+
+    assert all(result["error"] is None for result in results.values())
+    assert [state["brightness"] for state in emulators[0].zones.values()] == [None, 30, None, None]
+    assert all(state["brightness"] == 30 for state in emulators[1].zones.values())
+    assert emulators[0].stats["acknowledged"] == 2 and emulators[1].stats["acknowledged"] == 2
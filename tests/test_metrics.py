@@ -0,0 +1,69 @@
+import pytest
+
+from MilightController import Metrics, MilightController, Payloads, Zone
+from MilightController.Metrics import Histogram
+
+
+def parse(text: str) -> dict[str, float]:
+    samples: dict[str, float] = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_histograms_count_values_in_their_buckets():
+    histogram: Histogram = Histogram((0.1, 0.2, 0.4))
+    for value in (0.05, 0.1, 0.15, 0.3, 1.0):
+        histogram.observe(value)
+
+    # A value equal to a bound is counted in its bucket, like "le" in Prometheus
+    assert histogram.counts == [2, 1, 1, 1]
+    assert histogram.count == 5 and histogram.sum == pytest.approx(1.6)
+    assert histogram.quantile(0.2) == pytest.approx(0.05)
+    assert histogram.quantile(0.5) == pytest.approx(0.15)
+    assert histogram.quantile(1.0) == 0.4
+    assert Histogram().quantile(0.5) is None
+
+
+def test_metrics_are_exported_in_the_prometheus_format():
+    metrics: Metrics = Metrics(buckets=(0.01, 0.1))
+    metrics.set_mac("10.0.0.1", "AC:CF:23:00:00:01")
+    metrics.increment("commands_total", "10.0.0.1", 3)
+    metrics.increment("drops_total", "10.0.0.2")
+    for value in (0.005, 0.05, 0.5):
+        metrics.observe("command_latency_seconds", "10.0.0.1", value)
+
+    text: str = metrics.export_prometheus()
+    assert "# TYPE milight_commands_total counter" in text
+    assert "# TYPE milight_command_latency_seconds histogram" in text
+
+    samples: dict[str, float] = parse(text)
+    first: str = 'bridge="10.0.0.1",mac="AC:CF:23:00:00:01"'
+    assert samples[f"milight_commands_total{{{first}}}"] == 3
+    assert samples['milight_drops_total{bridge="10.0.0.2"}'] == 1
+    assert samples['milight_commands_total{bridge="10.0.0.2"}'] == 0
+    # Buckets are cumulative
+    assert samples[f'milight_command_latency_seconds_bucket{{{first},le="0.01"}}'] == 1
+    assert samples[f'milight_command_latency_seconds_bucket{{{first},le="0.1"}}'] == 2
+    assert samples[f'milight_command_latency_seconds_bucket{{{first},le="+Inf"}}'] == 3
+    assert samples[f"milight_command_latency_seconds_sum{{{first}}}"] == pytest.approx(0.555)
+    assert samples[f"milight_command_latency_seconds_count{{{first}}}"] == 3
+
+
+def test_the_controller_records_its_commands(emulator):
+    metrics: Metrics = Metrics(namespace="lights")
+    with MilightController(timeout=1000, pacing=False, metrics=metrics) as controller:
+        batch = [(Payloads.light_on(), Zone.ZONE_1)] + [(Payloads.brightness(level), Zone.ZONE_1) for level in range(9)]
+        controller.send_commands(emulator.device, batch)
+
+    stats: dict = metrics.stats()[emulator.device.ip]
+    assert stats["counters"]["commands_total"] == 10
+    assert stats["counters"]["acks_total"] == 10
+    assert stats["histograms"]["command_latency_seconds"]["count"] == 10
+    assert stats["histograms"]["session_establish_seconds"]["count"] == 1
+    assert stats["histograms"]["command_latency_seconds"]["p99"] > 0
+
+    samples: dict[str, float] = parse(metrics.export_prometheus())
+    assert samples[f'lights_acks_total{{bridge="{emulator.device.ip}"}}'] == 10
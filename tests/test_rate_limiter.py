@@ -0,0 +1,64 @@
+import time
+
+from MilightController import BridgeEmulator, MilightController, Payloads, RateLimiter, Zone
+
+
+def test_the_rate_ramps_up_until_the_first_loss():
+    limiter: RateLimiter = RateLimiter(rate=100, ramp=1.5, max_rate=1000)
+    limiter.on_ack()
+    limiter.on_ack()
+    assert limiter.rate == 100 * 1.5 * 1.5
+
+    for _ in range(20):
+        limiter.on_ack()
+    assert limiter.rate == 1000
+
+
+def test_the_rate_is_tuned_additively_and_decreased_multiplicatively():
+    limiter: RateLimiter = RateLimiter(rate=100, increase=2, decrease=0.5, min_rate=40)
+    limiter.on_loss()
+    assert limiter.rate == 50
+    assert limiter.ramping is False
+
+    limiter.on_ack()
+    limiter.on_ack()
+    assert limiter.rate == 54
+
+    # A burst of losses only counts once per second
+    limiter.on_loss()
+    assert limiter.rate == 54
+    limiter.decreased -= 1.0
+    limiter.on_loss()
+    assert limiter.rate == 40
+
+
+def test_a_burst_is_sent_back_to_back_and_paced_afterwards():
+    limiter: RateLimiter = RateLimiter(rate=100, burst=4)
+    assert [limiter.try_acquire() for _ in range(4)] == [0.0] * 4
+
+    delay: float = limiter.try_acquire()
+    assert 0 < delay <= 0.01
+    assert limiter.reserve() > 0
+
+    started: float = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - started >= 0.01
+
+
+def test_senders_share_the_limiter_of_a_bridge():
+    limiter: RateLimiter = RateLimiter.for_bridge(("192.0.2.9", 5987), rate=50)
+    assert RateLimiter.for_bridge(("192.0.2.9", 5987)) is limiter
+    assert limiter.rate == 50
+    assert RateLimiter.for_bridge(("192.0.2.9", 5988)) is not limiter
+
+
+def test_a_rate_limited_bridge_acknowledges_every_command():
+    with BridgeEmulator(port=0, rate=400, burst=16) as emulator:
+        with MilightController(timeout=1000, retries=10) as controller:
+            batch = [(Payloads.light_on(), Zone.ZONE_1)] + [
+                (Payloads.brightness(index % 101), Zone.ZONE_1) for index in range(200)
+            ]
+            responses: list[str] = controller.send_commands(emulator.device, batch)
+
+    assert None not in responses
+    assert emulator.stats["acknowledged"] >= len(batch)
@@ -0,0 +1,87 @@
+import pytest
+
+from MilightController import MilightController, Payloads, Reconciler, Zone
+
+
+# Acknowledges nothing, like a bridge that is out of reach
+class UnreachableController:
+    def send_commands(self, device: dict, commands: list, window: int = 16) -> list:
+        return [None] * len(commands)
+
+
+def test_only_changed_attributes_are_sent(emulator):
+    with MilightController(timeout=1000, pacing=False) as controller:
+        reconciler: Reconciler = Reconciler(controller)
+        target: dict = {"on": True, "color": "#FF0000", "brightness": 50}
+
+        assert reconciler.apply(emulator.device, target) == [
+            (Payloads.light_on(), Zone.ALL),
+            (Payloads.set_color("#FF0000"), Zone.ALL),
+            (Payloads.brightness(50), Zone.ALL),
+        ]
+        assert reconciler.apply(emulator.device, target) == []
+        assert reconciler.apply(emulator.device, dict(target, brightness=60)) == [(Payloads.brightness(60), Zone.ALL)]
+
+    assert emulator.stats["acknowledged"] == 4
+    for state in emulator.zones.values():
+        assert state["on"] is True
+        assert state["color"] == Payloads.set_color("#FF0000")[5]
+        assert state["brightness"] == 60
+
+
+def test_a_single_differing_zone_is_addressed_directly(emulator):
+    with MilightController(timeout=1000, pacing=False) as controller:
+        reconciler: Reconciler = Reconciler(controller)
+        reconciler.apply(emulator.device, {"on": True, "brightness": 50})
+        reconciler.apply(emulator.device, {"brightness": 20}, Zone.ZONE_3)
+
+        assert reconciler.plan(emulator.device, {"on": True, "brightness": 50}) == [(Payloads.brightness(50), Zone.ZONE_3)]
+        reconciler.apply(emulator.device, {"brightness": 20}, Zone.ZONE_1)
+        assert reconciler.plan(emulator.device, {"brightness": 50}) == [(Payloads.brightness(50), Zone.ALL)]
+
+    assert reconciler.state(emulator.device, Zone.ZONE_3) == {
+        "on": Payloads.light_on(), "brightness": Payloads.brightness(20)
+    }
+
+
+def test_lamps_turned_off_only_get_the_command_turning_them_off():
+    reconciler: Reconciler = Reconciler(UnreachableController())
+    device: dict = {"ip": "10.0.0.1", "port": 5987}
+    assert reconciler.plan(device, {"on": False, "brightness": 10}) == [(Payloads.light_off(), Zone.ALL)]
+
+
+def test_a_color_replaces_the_white_temperature():
+    reconciler: Reconciler = Reconciler(UnreachableController())
+    device: dict = {"ip": "10.0.0.1", "port": 5987}
+    reconciler.record(device, Payloads.kelvin(3000), Zone.ZONE_1)
+    reconciler.record(device, Payloads.set_color("#00FF00"), Zone.ZONE_1)
+    assert reconciler.state(device, Zone.ZONE_1) == {"color": Payloads.set_color("#00FF00")}
+    assert reconciler.plan(device, {"kelvin": 3000}, Zone.ZONE_1) == [(Payloads.kelvin(3000), Zone.ZONE_1)]
+
+
+def test_unacknowledged_commands_are_sent_again():
+    reconciler: Reconciler = Reconciler(UnreachableController())
+    device: dict = {"ip": "10.0.0.1", "port": 5987}
+    assert reconciler.apply(device, {"on": True}) == [(Payloads.light_on(), Zone.ALL)]
+    assert reconciler.apply(device, {"on": True}) == [(Payloads.light_on(), Zone.ALL)]
+    assert reconciler.state(device, Zone.ZONE_1) == {}
+
+
+def test_old_states_are_sent_again_and_states_can_be_forgotten():
+    device: dict = {"ip": "10.0.0.1", "port": 5987}
+    reconciler: Reconciler = Reconciler(UnreachableController(), max_age=0)
+    reconciler.record(device, Payloads.light_on(), Zone.ALL)
+    assert reconciler.plan(device, {"on": True}) == [(Payloads.light_on(), Zone.ALL)]
+
+    reconciler = Reconciler(UnreachableController())
+    reconciler.record(device, Payloads.light_on(), Zone.ALL)
+    assert reconciler.plan(device, {"on": True}) == []
+    reconciler.forget(device)
+    assert reconciler.plan(device, {"on": True}) == [(Payloads.light_on(), Zone.ALL)]
+
+
+def test_invalid_states_are_rejected():
+    with pytest.raises(ValueError):
+        Reconciler.encode({"on": True, "hue": 3})
+    with pytest.raises(ValueError):
+        Reconciler.encode({"color": "#FF0000", "kelvin": 3000})
@@ -0,0 +1,79 @@
+import pytest
+
+from MilightController import BridgeEmulator, Metrics, MilightController, Payloads, Zone
+from MilightController.RttEstimator import RttEstimator
+
+
+# Acknowledges every packet twice, like a bridge whose acknowledgments are duplicated on the way back
+class DuplicatingEmulator(BridgeEmulator):
+    def reply(self, transport, data: bytes, address: tuple[str, int]) -> None:
+        super().reply(transport, data, address)
+        super().reply(transport, data, address)
+
+
+def test_the_timeout_follows_the_round_trip_time():
+    rtt: RttEstimator = RttEstimator(initial=1.0, minimum=0.01, maximum=3.0)
+    assert rtt.rto == 1.0
+
+    rtt.sample(0.1)
+    assert rtt.srtt == pytest.approx(0.1)
+    assert rtt.rto == pytest.approx(0.1 + 4 * 0.05)
+    for _ in range(50):
+        rtt.sample(0.02)
+    assert rtt.srtt == pytest.approx(0.02, rel=0.05)
+    assert rtt.rto < 0.05
+
+
+def test_the_timeout_backs_off_within_its_bounds():
+    rtt: RttEstimator = RttEstimator(initial=0.5, minimum=0.2, maximum=3.0)
+    rtt.sample(0.001)
+    assert rtt.rto == 0.2
+
+    for _ in range(10):
+        rtt.backoff()
+    assert rtt.rto == 3.0
+
+    rtt.restore()
+    assert rtt.rto == 0.2
+
+
+def test_lost_packets_are_retransmitted():
+    metrics: Metrics = Metrics()
+    with BridgeEmulator(port=0, loss=0.3, seed=3) as emulator:
+        with MilightController(timeout=500, retries=10, pacing=False, metrics=metrics) as controller:
+            batch = [(Payloads.light_on(), Zone.ZONE_2)] + [
+                (Payloads.brightness(index % 101), Zone.ZONE_2) for index in range(100)
+            ]
+            responses: list[str] = controller.send_commands(emulator.device, batch)
+
+    assert None not in responses
+    assert emulator.stats["lost"] > 0
+    counters: dict = metrics.stats()[emulator.device.ip]["counters"]
+    assert counters["retransmissions_total"] > 0
+    assert counters["acks_total"] == 101
+
+
+def test_commands_are_given_up_once_the_bridge_stops_answering(emulator):
+    metrics: Metrics = Metrics()
+    with MilightController(timeout=200, retries=2, pacing=False, metrics=metrics) as controller:
+        controller.send_command(emulator.device, Payloads.light_on())
+        emulator.loss = 1.0
+        with pytest.raises(TimeoutError):
+            controller.send_command(emulator.device, Payloads.light_off())
+
+    assert metrics.stats()[emulator.device.ip]["counters"]["drops_total"] >= 1
+    assert emulator.zones[Zone.ZONE_1]["on"] is True
+
+
+def test_duplicate_acknowledgments_are_ignored():
+    with DuplicatingEmulator(port=0, latency=0.005) as emulator:
+        with MilightController(timeout=1000, pacing=False) as controller:
+            batch = [(Payloads.light_on(), Zone.ZONE_4)] + [
+                (Payloads.brightness(index % 101), Zone.ZONE_4) for index in range(299)
+            ]
+            responses: list[str] = controller.send_commands(emulator.device, batch, window=8)
+
+    assert None not in responses
+    # Every packet is acknowledged once, although the batch wraps the sequence numbers around
+    assert emulator.stats["acknowledged"] == 300
+    assert [bytes.fromhex(response)[6] for response in responses] == [index % 256 for index in range(300)]
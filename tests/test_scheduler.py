@@ -0,0 +1,118 @@
+import threading
+
+import pytest
+
+from MilightController import CommandScheduler, MilightController, Payloads, Zone
+
+DEVICE: dict = {"ip": "127.0.0.1", "port": 5987}
+
+
+# Records the commands instead of sending them. Nothing is sent until `gate` is set, so that the
+# commands submitted in the meantime are all pending at once.
+class RecordingController:
+    def __init__(self) -> None:
+        self.sent: list[tuple[bytes, Zone]] = []
+        self.gate: threading.Event = threading.Event()
+
+    def send_command(self, device: dict, command: bytes, zone: Zone) -> None:
+        self.gate.wait()
+        self.sent.append((bytes(command), zone))
+
+
+def schedule(commands: list[tuple[bytes, Zone]], max_pending: int = 64) -> list[tuple[bytes, Zone]]:
+    controller: RecordingController = RecordingController()
+    with CommandScheduler(controller, rate=1000, max_pending=max_pending) as scheduler:
+        # Holds the sender thread, it is never coalesced with the commands under test
+        scheduler.submit(DEVICE, Payloads.mode_speed_increase(), Zone.ZONE_4)
+        for command, zone in commands:
+            scheduler.submit(DEVICE, command, zone)
+        controller.gate.set()
+        assert scheduler.flush(5.0)
+    assert controller.sent[0] == (bytes(Payloads.mode_speed_increase()), Zone.ZONE_4)
+    return controller.sent[1:]
+
+
+def expected(commands: list[tuple[bytes, Zone]]) -> list[tuple[bytes, Zone]]:
+    return [(bytes(command), zone) for command, zone in commands]
+
+
+def test_commands_are_not_moved_past_commands_to_the_same_zone():
+    on, off, dim = Payloads.light_on(), Payloads.light_off(), Payloads.brightness(50)
+    sent = schedule([(on, Zone.ZONE_1), (dim, Zone.ZONE_1), (off, Zone.ZONE_1), (on, Zone.ZONE_1)])
+    # The last command replaces "off", which shares its kind, in place
+    assert sent == expected([(on, Zone.ZONE_1), (dim, Zone.ZONE_1), (on, Zone.ZONE_1)])
+
+
+def test_superseded_commands_are_replaced_in_place():
+    sent = schedule(
+        [
+            (Payloads.brightness(10), Zone.ZONE_1),
+            (Payloads.brightness(20), Zone.ZONE_2),
+            (Payloads.brightness(30), Zone.ZONE_1),
+            (Payloads.kelvin(3000), Zone.ZONE_2),
+        ]
+    )
+    assert sent == expected(
+        [
+            (Payloads.brightness(30), Zone.ZONE_1),
+            (Payloads.brightness(20), Zone.ZONE_2),
+            (Payloads.kelvin(3000), Zone.ZONE_2),
+        ]
+    )
+
+
+def test_all_zones_replace_the_commands_of_the_single_zones():
+    sent = schedule(
+        [
+            (Payloads.brightness(10), Zone.ZONE_1),
+            (Payloads.brightness(20), Zone.ZONE_2),
+            (Payloads.brightness(30), Zone.ALL),
+        ]
+    )
+    assert sent == expected([(Payloads.brightness(30), Zone.ALL)])
+
+
+def test_all_zones_do_not_replace_commands_followed_by_others_to_their_zone():
+    commands = [
+        (Payloads.brightness(10), Zone.ZONE_1),
+        (Payloads.light_off(), Zone.ZONE_1),
+        (Payloads.brightness(30), Zone.ALL),
+    ]
+    assert schedule(commands) == expected(commands)
+
+
+def test_relative_commands_are_never_dropped():
+    increase = Payloads.mode_speed_increase()
+    sent = schedule(
+        [
+            (Payloads.brightness(10), Zone.ZONE_1),
+            (Payloads.brightness(20), Zone.ZONE_2),
+            (increase, Zone.ZONE_3),
+            (increase, Zone.ZONE_3),
+            (increase, Zone.ZONE_3),
+        ],
+        max_pending=2,
+    )
+    assert sent == expected([(increase, Zone.ZONE_3)] * 3)
+
+
+def test_commands_are_refused_once_closed():
+    scheduler: CommandScheduler = CommandScheduler(RecordingController())
+    scheduler.close()
+    with pytest.raises(RuntimeError):
+        scheduler.submit(DEVICE, Payloads.light_on())
+    assert scheduler.bridges == {}
+
+
+def test_the_lamps_reach_the_submitted_state(emulator):
+    with MilightController(timeout=1000, pacing=False) as controller:
+        with CommandScheduler(controller, rate=200) as scheduler:
+            for command in (Payloads.light_on(), Payloads.brightness(50), Payloads.light_off(), Payloads.light_on()):
+                scheduler.submit(emulator.device, command, Zone.ZONE_1)
+            for level in range(0, 101, 10):
+                scheduler.submit(emulator.device, Payloads.brightness(level), Zone.ZONE_2)
+            assert scheduler.flush(5.0)
+
+    assert emulator.zones[Zone.ZONE_1]["on"] is True
+    assert emulator.zones[Zone.ZONE_1]["brightness"] == Payloads.brightness(50)[5]
+    assert emulator.zones[Zone.ZONE_2]["on"] is False
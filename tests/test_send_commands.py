@@ -0,0 +1,35 @@
+import time
+
+from MilightController import BridgeEmulator, MilightController, Payloads, Zone
+
+
+def test_responses_are_returned_in_the_order_of_the_commands(emulator):
+    with MilightController(timeout=1000, pacing=False) as controller:
+        batch = [(Payloads.light_on(), Zone.ZONE_1)] + [(Payloads.brightness(level), Zone.ZONE_1) for level in range(40)]
+        responses: list[str] = controller.send_commands(emulator.device, batch, window=1)
+
+    assert len(responses) == len(batch)
+    # With a window of 1, every packet takes the next sequence number
+    assert [bytes.fromhex(response)[6] for response in responses] == list(range(len(batch)))
+    assert emulator.zones[Zone.ZONE_1]["brightness"] == Payloads.brightness(39)[5]
+
+
+def test_commands_are_pipelined():
+    with BridgeEmulator(port=0, latency=0.02) as emulator:
+        with MilightController(timeout=1000, pacing=False) as controller:
+            controller.send_command(emulator.device, Payloads.light_on())
+            batch = [(Payloads.brightness(level), Zone.ZONE_2) for level in range(64)]
+            started: float = time.monotonic()
+            responses: list[str] = controller.send_commands(emulator.device, batch, window=16)
+            elapsed: float = time.monotonic() - started
+
+    assert None not in responses
+    # One round trip per command would take 64 * 20 ms
+    assert elapsed < 0.64 / 2
+    assert len({bytes.fromhex(response)[6] for response in responses}) == 64
+
+
+def test_an_empty_batch_sends_nothing(emulator):
+    with MilightController(timeout=1000, pacing=False) as controller:
+        assert controller.send_commands(emulator.device, []) == []
+    assert emulator.stats["acknowledged"] == 0
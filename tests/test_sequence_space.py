@@ -0,0 +1,66 @@
+import threading
+import time
+
+from MilightController import MilightController, Payloads, SequenceSpace, Zone
+
+
+def sequence_number(response: str) -> int:
+    # Acknowledgment: 88 00 00 00 03 00 {SequenceNumber} 00
+    return bytes.fromhex(response)[6]
+
+
+def test_numbers_are_used_in_turn_and_skipped_while_in_flight():
+    space: SequenceSpace = SequenceSpace()
+    assert [space.reserve("a") for _ in range(3)] == [0, 1, 2]
+    space.release(1)
+    assert len(space) == 2
+
+    # Released numbers are only reused after every other free number
+    numbers: list[int] = [space.reserve("b") for _ in range(SequenceSpace.SIZE - 2)]
+    assert numbers == list(range(3, SequenceSpace.SIZE)) + [1]
+    assert space.reserve("c", block=False) is None
+    assert len(space) == SequenceSpace.SIZE
+
+
+def test_owners_are_kept_until_the_number_is_released():
+    space: SequenceSpace = SequenceSpace()
+    first: int = space.reserve("mailbox")
+    second: int = space.reserve("mailbox")
+    assert space.owner(first) == space.owner(second) == "mailbox"
+    assert space.owners() == ["mailbox", "mailbox"]
+
+    space.release(first)
+    space.release(first)
+    assert space.owner(first) is None
+    assert space.owners() == ["mailbox"]
+
+
+def test_reserving_blocks_until_a_number_is_released():
+    space: SequenceSpace = SequenceSpace()
+    for _ in range(SequenceSpace.SIZE):
+        space.reserve("full")
+
+    start: float = time.monotonic()
+    assert space.reserve("late", timeout=0.1) is None
+    assert time.monotonic() - start >= 0.1
+
+    releaser: threading.Timer = threading.Timer(0.05, space.release, (42,))
+    releaser.start()
+    assert space.reserve("late", timeout=2.0) == 42
+    assert space.owner(42) == "late"
+    releaser.join()
+
+
+def test_sequence_numbers_wrap_around(emulator):
+    with MilightController(timeout=2000, pacing=False) as controller:
+        batch = [(Payloads.light_on(), Zone.ZONE_3)]
+        batch += [(Payloads.brightness(index % 101), Zone.ZONE_3) for index in range(600)]
+        responses = controller.send_commands(emulator.device, batch, window=64)
+        single = [
+            controller.send_command(emulator.device, Payloads.kelvin(index % 101), Zone.ZONE_3) for index in range(300)
+        ]
+
+    assert None not in responses
+    assert {sequence_number(response) for response in responses} == set(range(256))
+    assert {sequence_number(response) for response in single} == set(range(256))
+    assert emulator.zones[Zone.ZONE_3]["kelvin"] == Payloads.kelvin(299 % 101)[5]
@@ -0,0 +1,44 @@
+import socket
+import time
+
+import pytest
+
+from MilightController import BridgeEmulator, MilightController, Payloads, Zone
+
+
+def test_commands_reuse_the_session_of_the_bridge(emulator):
+    with MilightController(timeout=1000, pacing=False) as controller:
+        for level in range(20):
+            controller.send_command(emulator.device, Payloads.brightness(level), Zone.ZONE_1)
+        assert controller.get_session(emulator.device) is controller.get_session(emulator.device)
+
+    assert emulator.stats["sessions"] == 1
+    assert emulator.stats["acknowledged"] == 20
+
+
+def test_expired_sessions_are_established_again(emulator):
+    with MilightController(timeout=1000, session_lifetime=50, pacing=False) as controller:
+        controller.send_command(emulator.device, Payloads.light_on())
+        time.sleep(0.1)
+        controller.send_command(emulator.device, Payloads.light_off())
+
+    assert emulator.stats["sessions"] == 2
+
+
+def test_establish_session_returns_the_session_id_of_the_cached_session(emulator):
+    with MilightController(timeout=1000) as controller:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as unused:
+            wb1, wb2 = controller.establish_session(unused, emulator.device)
+            assert controller.establish_session(unused, emulator.device) == (wb1, wb2)
+        assert controller.get_session(emulator.device).is_valid()
+
+    assert (int(wb1, 16), int(wb2, 16)) == (emulator.wb1, emulator.wb2)
+    assert emulator.stats["sessions"] == 1
+
+
+def test_establish_session_times_out_instead_of_hanging():
+    with BridgeEmulator(port=0, loss=1.0) as emulator:
+        with MilightController(timeout=200) as controller:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as unused:
+                with pytest.raises(TimeoutError):
+                    controller.establish_session(unused, emulator.device)
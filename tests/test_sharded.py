@@ -0,0 +1,85 @@
+import socket
+
+import pytest
+
+from MilightController import BridgeEmulator, Device, Metrics, PacketCapture, Payloads, ShardedController, Zone
+
+
+@pytest.fixture(scope="module")
+def emulators():
+    emulators: list[BridgeEmulator] = [BridgeEmulator(host=f"127.0.0.{index}", port=0).start() for index in range(2, 8)]
+    yield emulators
+    for emulator in emulators:
+        emulator.stop()
+
+
+@pytest.fixture(scope="module")
+def sharded():
+    # Spawned workers do not inherit the threads of the emulators
+    controller: ShardedController = ShardedController(
+        processes=2, start_method="spawn", timeout=200, retries=1, pacing=False,
+        metrics=Metrics(), capture=PacketCapture(),
+    )
+    yield controller
+    controller.close()
+
+
+def test_bridges_are_spread_over_the_workers(sharded, emulators):
+    shards: list[int] = [sharded.shard(emulator.device) for emulator in emulators]
+    assert set(shards) == {0, 1}
+    # The assignment only depends on the IP address
+    assert shards == [sharded.shard({"ip": emulator.device.ip, "port": 1}) for emulator in emulators]
+    assert all(process.is_alive() for process in sharded.worker_processes)
+
+
+def test_commands_are_sent_through_the_workers(sharded, emulators):
+    first: BridgeEmulator = emulators[0]
+    assert sharded.send_command(first.device, Payloads.light_on(), Zone.ZONE_1)[:7] == "8800000"
+    responses: list[str] = sharded.send_commands(
+        first.device, [(Payloads.brightness(40), Zone.ZONE_1), (Payloads.kelvin(30), Zone.ZONE_1)]
+    )
+    assert None not in responses
+    assert first.zones[Zone.ZONE_1]["brightness"] == 40
+
+    devices: list[dict] = [dict(emulator.device) for emulator in emulators]
+    results: dict = sharded.fan_out(devices, [(Payloads.light_on(), Zone.ALL), (Payloads.brightness(70), Zone.ALL)])
+    for device, emulator in zip(devices, emulators):
+        result: dict = results[emulator.device.address]
+        assert result["error"] is None and None not in result["responses"]
+        # The results hold the devices of the caller
+        assert result["device"] is device
+        assert all(state["brightness"] == 70 for state in emulator.zones.values())
+
+
+def test_sessions_stay_with_the_workers(sharded, emulators):
+    emulator: BridgeEmulator = emulators[1]
+    with pytest.raises(NotImplementedError):
+        sharded.get_session(emulator.device)
+
+    assert sharded.establish_session(None, emulator.device) == ("%02x" % emulator.wb1, "%02x" % emulator.wb2)
+    sessions: int = emulator.stats["sessions"]
+    sharded.send_command(emulator.device, Payloads.light_on())
+    assert emulator.stats["sessions"] == sessions
+    assert sharded.sessions == {}
+
+
+def test_errors_of_the_workers_are_raised_to_the_caller(sharded):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as unused:
+        unused.bind(("127.0.0.1", 0))
+        device: Device = Device("127.0.0.1", unused.getsockname()[1])
+        with pytest.raises(socket.timeout):
+            sharded.send_command(device, Payloads.light_on())
+
+
+def test_metrics_and_packets_of_the_workers_are_merged(sharded, emulators):
+    sharded.metrics.drain()
+    sharded.capture.drain()
+    sharded.fan_out([emulator.device for emulator in emulators[2:]], Payloads.light_on())
+
+    stats: dict = sharded.metrics.stats()
+    for emulator in emulators[2:]:
+        assert stats[emulator.device.ip]["counters"]["commands_total"] == 1
+        assert stats[emulator.device.ip]["counters"]["acks_total"] == 1
+    # The command sent to every bridge was captured by its worker
+    packets: bytes = sharded.capture.drain()
+    assert packets.count(bytes(Payloads.light_on())) == 4
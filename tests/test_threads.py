@@ -0,0 +1,85 @@
+import threading
+from collections import deque
+
+from MilightController import MilightController, Payloads, Session, Zone
+
+
+def test_acknowledgments_reach_the_thread_owning_their_sequence_number(emulator):
+    session: Session = Session(emulator.device.address, timeout=5000)
+    wb1, wb2 = session.ensure()
+    errors: list[str] = []
+
+    def run(thread: int) -> None:
+        mailbox: deque = deque()
+        for index in range(100):
+            # Every thread keeps a few packets in flight, so acknowledgments of all threads interleave
+            numbers: list[int] = [session.reserve(mailbox) for _ in range(4)]
+            packets: list[bytes] = [
+                MilightController.build_packet(wb1, wb2, number, Payloads.brightness((thread + index) % 101), Zone.ZONE_1)
+                for number in numbers
+            ]
+            session.transport.send(session.socket, packets, session.address)
+            received: set[int] = set()
+            for _ in numbers:
+                response: bytes = session.receive(mailbox, 5.0)
+                if response is None:
+                    errors.append(f"thread {thread} timed out")
+                    return
+                received.add(response[6])
+            if received != set(numbers):
+                errors.append(f"thread {thread} received {sorted(received)} for {sorted(numbers)}")
+            for number in numbers:
+                session.release(number)
+
+    threads: list[threading.Thread] = [threading.Thread(target=run, args=(thread,)) for thread in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    session.close()
+
+    assert errors == []
+    assert emulator.stats["acknowledged"] == 8 * 100 * 4
+
+
+def test_threads_sharing_a_controller_get_their_own_responses(emulator):
+    with MilightController(timeout=5000, pacing=False) as controller:
+        results: dict[int, list[str]] = {}
+
+        def run(thread: int) -> None:
+            batch = [(Payloads.light_on(), Zone.ZONE_1)] + [
+                (Payloads.brightness(index % 101), Zone.ZONE_1) for index in range(49)
+            ]
+            results[thread] = controller.send_commands(emulator.device, batch, window=8)
+
+        threads: list[threading.Thread] = [threading.Thread(target=run, args=(thread,)) for thread in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert sorted(results) == list(range(6))
+    for responses in results.values():
+        assert len(responses) == 50
+        assert None not in responses
+
+
+def test_threads_share_a_single_session_per_bridge(emulator):
+    with MilightController(timeout=1000, pacing=False) as controller:
+        barrier: threading.Barrier = threading.Barrier(8)
+        sessions: list[Session] = []
+
+        def run() -> None:
+            barrier.wait()
+            sessions.append(controller.get_session(emulator.device))
+            controller.send_command(emulator.device, Payloads.light_on())
+
+        threads: list[threading.Thread] = [threading.Thread(target=run) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert len(sessions) == 8 and all(session is sessions[0] for session in sessions)
+    assert emulator.stats["sessions"] == 1
+    assert emulator.stats["acknowledged"] == 8
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from MilightController import AsyncMilightController, BridgeEmulator, Payloads, TransitionEngine, Zone
+from MilightController.TransitionEngine import EASINGS
+
+pytest.importorskip("numpy")
+
+
+def run(scenario) -> BridgeEmulator:
+    async def main() -> BridgeEmulator:
+        emulator: BridgeEmulator = await BridgeEmulator(port=0).serve()
+        try:
+            async with AsyncMilightController(timeout=1000, pacing=False) as controller:
+                await controller.send(emulator.device, Payloads.light_on())
+                await scenario(TransitionEngine(controller, rate=50), emulator.device)
+        finally:
+            emulator.stop()
+        return emulator
+
+    return asyncio.run(main())
+
+
+def brightness(emulator: BridgeEmulator) -> list[int]:
+    return [state["brightness"] for state in emulator.zones.values()]
+
+
+def test_frames_end_in_the_end_state():
+    offsets, payloads = TransitionEngine.frames("brightness", 0, 100, 1.0, EASINGS["linear"], 10)
+    assert offsets == pytest.approx([0.1 * frame for frame in range(1, 11)])
+    assert payloads == [Payloads.brightness(level) for level in range(10, 101, 10)]
+
+    offsets, payloads = TransitionEngine.frames("kelvin", 2700, 6500, 0.5, EASINGS["ease_in_out"], 20)
+    assert payloads[-1] == Payloads.kelvin(6500)
+    assert offsets[-1] == pytest.approx(0.5)
+
+
+def test_frames_encoding_to_the_same_payload_are_dropped():
+    offsets, payloads = TransitionEngine.frames("brightness", 10, 12, 2.0, EASINGS["linear"], 10)
+    assert payloads == [Payloads.brightness(11), Payloads.brightness(12)]
+    assert offsets == pytest.approx([1.0, 2.0])
+
+
+def test_colors_take_the_shorter_way_around_the_color_wheel():
+    _, payloads = TransitionEngine.frames("color", "#FF0040", "#FF4000", 1.0, EASINGS["linear"], 10)
+    hues: list[int] = [payload[5] for payload in payloads]
+    first: int = Payloads.set_color("#FF0040")[5]
+    assert first > 200 and hues[-1] == Payloads.set_color("#FF4000")[5] < 20
+    # Every step is small, across the wraparound from 255 to 0
+    steps: list[int] = [(hue - previous) % 256 for previous, hue in zip([first] + hues, hues)]
+    assert all(0 < step < 10 for step in steps)
+
+
+def test_a_transition_reaches_its_end_state():
+    async def scenario(engine: TransitionEngine, device) -> None:
+        await asyncio.wait_for(engine.add(device, {"brightness": 0}, {"brightness": 80}, 0.2, Zone.ZONE_1), 2.0)
+
+    emulator: BridgeEmulator = run(scenario)
+    assert brightness(emulator)[0] == Payloads.brightness(80)[5]
+    assert emulator.stats["acknowledged"] > 2
+
+
+def test_a_transition_of_all_zones_replaces_those_of_single_zones():
+    async def scenario(engine: TransitionEngine, device) -> None:
+        single: asyncio.Future = engine.add(device, {"brightness": 0}, {"brightness": 100}, 10.0, Zone.ZONE_1)
+        await asyncio.sleep(0.05)
+        every: asyncio.Future = engine.add(device, {"brightness": 50}, {"brightness": 20}, 0.2)
+        # The replaced transition is finished right away
+        assert single.done()
+        assert list(engine.bridges.values())[0]["transitions"].keys() == {(Zone.ALL, "brightness")}
+        await asyncio.wait_for(every, 2.0)
+
+    emulator: BridgeEmulator = run(scenario)
+    assert brightness(emulator) == [20, 20, 20, 20]
+
+
+def test_a_transition_of_a_single_zone_splits_it_out_of_all_zones():
+    async def scenario(engine: TransitionEngine, device) -> None:
+        every: asyncio.Future = engine.add(device, {"brightness": 0}, {"brightness": 100}, 0.4)
+        await asyncio.sleep(0.05)
+        single: asyncio.Future = engine.add(device, {"brightness": 30}, {"brightness": 10}, 0.1, Zone.ZONE_2)
+        assert not every.done()
+        await asyncio.wait_for(single, 2.0)
+        await asyncio.wait_for(every, 2.0)
+        await engine.wait()
+
+    emulator: BridgeEmulator = run(scenario)
+    assert brightness(emulator) == [100, 10, 100, 100]
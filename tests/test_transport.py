@@ -0,0 +1,119 @@
+import socket
+import threading
+from collections import deque
+
+import pytest
+
+from MilightController import (
+    BridgeEmulator, FanOut, MilightController, MmsgTransport, Payloads, RateLimiter, SequenceSpace, Session, Transport,
+    Zone,
+)
+
+TRANSPORTS: list = [
+    Transport,
+    pytest.param(
+        MmsgTransport,
+        marks=pytest.mark.skipif(not MmsgTransport.available(), reason="sendmmsg and recvmmsg are not available"),
+    ),
+]
+
+
+def bound() -> socket.socket:
+    sock: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    return sock
+
+
+@pytest.mark.parametrize("transport_class", TRANSPORTS)
+def test_datagrams_are_sent_and_received_in_order(transport_class):
+    transport: Transport = transport_class()
+    with bound() as sender, bound() as receiver:
+        datagrams: list[bytes] = [bytes([index]) * 22 for index in range(40)]
+        transport.send(sender, datagrams, receiver.getsockname())
+
+        received: list[bytes] = []
+        while len(received) < len(datagrams):
+            batch: list[bytes] = transport.receive(receiver, 1.0)
+            assert batch
+            received += batch
+        assert received == datagrams
+        assert transport.receive(receiver, 0.01) == []
+
+
+@pytest.mark.parametrize("transport_class", TRANSPORTS)
+def test_datagrams_are_sent_to_and_received_from_many_addresses(transport_class):
+    transport: Transport = transport_class()
+    receivers: list[socket.socket] = [bound() for _ in range(3)]
+    try:
+        with bound() as hub:
+            messages: list = [(bytes([index]), receiver.getsockname()) for index, receiver in enumerate(receivers)]
+            transport.send_each(hub, messages)
+            for index, receiver in enumerate(receivers):
+                receiver.settimeout(1.0)
+                data, address = receiver.recvfrom(1024)
+                assert data == bytes([index]) and address == hub.getsockname()
+                receiver.sendto(data * 2, address)
+
+            received: list[tuple[bytes, tuple[str, int]]] = []
+            while len(received) < len(receivers):
+                received += transport.receive_from(hub, 1.0)
+        assert sorted(received) == sorted(
+            (bytes([index]) * 2, receiver.getsockname()) for index, receiver in enumerate(receivers)
+        )
+    finally:
+        for receiver in receivers:
+            receiver.close()
+
+
+@pytest.mark.parametrize("transport_class", TRANSPORTS)
+def test_the_controller_sends_through_its_transport(emulator, transport_class):
+    with MilightController(timeout=1000, pacing=False, transport=transport_class) as controller:
+        batch = [(Payloads.light_on(), Zone.ZONE_1)]
+        batch += [(Payloads.brightness(level), Zone.ZONE_1) for level in range(50)]
+        responses: list[str] = controller.send_commands(emulator.device, batch, window=32)
+        assert isinstance(controller.get_session(emulator.device).transport, transport_class)
+
+    assert None not in responses
+    assert emulator.zones[Zone.ZONE_1]["brightness"] == 49
+
+
+def test_a_command_is_fanned_out_through_the_shared_socket():
+    emulators: list[BridgeEmulator] = [
+        BridgeEmulator(host=f"127.0.0.{index}", port=0, loss=0.1, seed=index).start() for index in range(2, 8)
+    ]
+    try:
+        with MilightController(timeout=500, retries=10) as controller:
+            results: dict = controller.fan_out([emulator.device for emulator in emulators], Payloads.light_on())
+            assert controller.shared is not None
+    finally:
+        for emulator in emulators:
+            emulator.stop()
+
+    for emulator in emulators:
+        result: dict = results[emulator.device.address]
+        assert result["error"] is None
+        assert result["responses"][0] is not None
+        assert all(state["on"] for state in emulator.zones.values())
+
+
+def test_bridges_without_a_free_sequence_number_take_no_tokens(emulator):
+    limiter: RateLimiter = RateLimiter(rate=1, burst=3, min_rate=1)
+    session: Session = Session(emulator.device.address, timeout=1000, limiter=limiter)
+    fan_out: FanOut = FanOut()
+    try:
+        session.ensure()
+        tokens: float = limiter.tokens
+        for _ in range(SequenceSpace.SIZE):
+            session.reserve(deque(), block=False)
+        # The bridge is polled for a free sequence number until one is released
+        releaser: threading.Timer = threading.Timer(0.1, session.release, (0,))
+        releaser.start()
+        responses: dict = fan_out.send([session], Payloads.light_on())
+        releaser.join()
+    finally:
+        fan_out.close()
+        session.close()
+
+    assert responses[session.address] is not None
+    # Only the packet that was sent took a token
+    assert limiter.tokens >= tokens - 1